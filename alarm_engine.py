@@ -0,0 +1,66 @@
+# Vectorized out-of-range engine for the aquaponic sensor data.
+# Checks every parameter against its min/max limits column by column instead of
+# walking the rows one at a time, and returns the same adjustment records the
+# original iterrows loop produced (same columns, same row/parameter order).
+import numpy as np
+import pandas as pd
+
+from sensor_schema import float64_values
+
+ADJUSTMENT_COLUMNS = ['marca_de_tiempo', 'parameter', 'current_value', 'target_value', 'adjustment']
+
+# Rows compared per step; keeps the temporary (rows, parameters) matrices small
+BLOCK_ROWS = 1 << 18
+
+
+def compile_ranges(parameter_ranges):
+    """Turn a ``{parameter: {min, max, target, adjustment}}`` dict into flat arrays."""
+    parameters = list(parameter_ranges)
+    return {
+        'parameters': np.array(parameters, dtype=object),
+        'min': np.array([parameter_ranges[p]['min'] for p in parameters], dtype=np.float64),
+        'max': np.array([parameter_ranges[p]['max'] for p in parameters], dtype=np.float64),
+        'target': np.array([parameter_ranges[p]['target'] for p in parameters], dtype=np.float64),
+        'adjustment': np.array([parameter_ranges[p]['adjustment'] for p in parameters], dtype=object),
+    }
+
+
+def find_violations(data, compiled, block_rows=BLOCK_ROWS):
+    """Return ``(rows, cols, values)`` for every out-of-range reading, in row-major order."""
+    columns = [float64_values(data[p]) for p in compiled['parameters']]
+    num_rows = len(data)
+    rows, cols, values = [], [], []
+    for start in range(0, num_rows, block_rows):
+        block = np.column_stack([column[start:start + block_rows] for column in columns])
+        # NaN compares False on both sides, so missing readings never raise an alarm
+        mask = (block < compiled['min']) | (block > compiled['max'])
+        # nonzero on a C-ordered (rows, parameters) mask already yields the
+        # row-first, parameter-second order of the original loop
+        block_rows_idx, block_cols = np.nonzero(mask)
+        rows.append(block_rows_idx + start)
+        cols.append(block_cols)
+        values.append(block[block_rows_idx, block_cols])
+
+    if not rows:
+        return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.intp), np.empty(0, dtype=np.float64)
+    return np.concatenate(rows), np.concatenate(cols), np.concatenate(values)
+
+
+def detect_adjustments(data, parameter_ranges):
+    """Vectorized replacement for the ``data.iterrows()`` adjustment scan.
+
+    ``parameter_ranges`` can also be a ``parameter_rules.RuleSet``, whose arrays
+    are already compiled.
+    """
+    compiled = getattr(parameter_ranges, 'compiled', None)
+    if compiled is None:
+        compiled = compile_ranges(parameter_ranges)
+    rows, cols, values = find_violations(data, compiled)
+
+    return pd.DataFrame({
+        'marca_de_tiempo': data['marca_de_tiempo'].take(rows).to_numpy(),
+        'parameter': compiled['parameters'][cols],
+        'current_value': values,
+        'target_value': compiled['target'][cols],
+        'adjustment': compiled['adjustment'][cols],
+    }, columns=ADJUSTMENT_COLUMNS)
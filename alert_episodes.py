@@ -0,0 +1,291 @@
+# Episode-based alerts: one record per out-of-range episode instead of one row per
+# out-of-range sample.
+# For every (tank, parameter) an episode opens when a reading crosses a limit and
+# stays open while readings remain beyond the hysteresis band (the limit pulled
+# back into the range by ``hysteresis``), so noise around a limit does not open
+# and close episodes over and over. It closes on the first reading back inside
+# the band, with its duration, peak and mean; episodes shorter than
+# ``min_duration_s`` are dropped (debouncing). Missing readings never change the
+# state.
+#
+# The same state machine runs in two modes that give identical results:
+#   - ``update``: one reading at a time, O(1) per parameter (live streams)
+#   - ``update_frame``: vectorized over a whole chunk (historical CSV/Parquet),
+#     carrying the open episodes from one chunk to the next
+import numpy as np
+import pandas as pd
+
+from history_scan import DEFAULT_TANK, ffill, history_chunks, to_ms
+from parameter_rules import load_rules
+from sensor_schema import float64_values
+
+EPISODE_COLUMNS = ['id_tanque', 'parameter', 'side', 'start', 'end', 'duration_s', 'peak_value',
+                   'mean_value', 'samples', 'limit', 'target_value', 'adjustment']
+
+# Default hysteresis: this fraction of each parameter's (max - min) range
+HYSTERESIS_FRACTION = 0.05
+MIN_DURATION_S = 60.0
+
+HIGH, LOW = 1, -1
+SIDE_NAMES = {HIGH: 'high', LOW: 'low'}
+
+
+def _running_total(total, values):
+    """``total`` plus ``values`` added one at a time, in the order ``update`` adds them.
+
+    ``np.sum`` and ``np.add.reduceat`` add pairwise, so their means would differ
+    from the stream mode's in the last bits; ``np.add.accumulate`` does not.
+    """
+    if not len(values):
+        return total
+    return float(np.add.accumulate(np.concatenate([[total], values]))[-1])
+
+
+class _TankState:
+    """Open episode of every parameter of one tank (plain lists: cheap scalar access)."""
+
+    def __init__(self, num_parameters):
+        self.side = [0] * num_parameters
+        self.start = [0] * num_parameters      # epoch ms
+        self.peak = [0.0] * num_parameters
+        self.total = [0.0] * num_parameters
+        self.count = [0] * num_parameters
+        self.last_time = None
+
+
+class AlertEvaluator:
+    """Incremental episode detection for every alarm rule, per tank."""
+
+    def __init__(self, rules=None, hysteresis=None, min_duration_s=MIN_DURATION_S):
+        # ``hysteresis`` maps parameters to absolute band widths; the others use
+        # HYSTERESIS_FRACTION of their range
+        rules = load_rules() if rules is None else rules
+        self.parameters = list(rules)
+        self.low = np.array([rules[p]['min'] for p in self.parameters], dtype=np.float64)
+        self.high = np.array([rules[p]['max'] for p in self.parameters], dtype=np.float64)
+        self.target = [rules[p]['target'] for p in self.parameters]
+        self.adjustment = [rules[p]['adjustment'] for p in self.parameters]
+        band = (self.high - self.low) * HYSTERESIS_FRACTION
+        for i, parameter in enumerate(self.parameters):
+            if hysteresis and parameter in hysteresis:
+                band[i] = hysteresis[parameter]
+        # The two release thresholds must not cross
+        band = np.clip(band, 0.0, (self.high - self.low) / 2)
+        self.low_release = self.low + band
+        self.high_release = self.high - band
+        self.min_duration_ms = min_duration_s * 1000.0
+        self.tanks = {}
+        # Python floats for the scalar path
+        self._limits = list(zip(self.low.tolist(), self.high.tolist(),
+                                self.low_release.tolist(), self.high_release.tolist()))
+
+    def _state(self, tank):
+        state = self.tanks.get(tank)
+        if state is None:
+            state = self.tanks[tank] = _TankState(len(self.parameters))
+        return state
+
+    def _record(self, tank, p, side, start, end, peak, total, count):
+        """Episode record, or ``None`` when it is shorter than the minimum duration."""
+        if end - start < self.min_duration_ms:
+            return None
+        return {
+            'id_tanque': tank,
+            'parameter': self.parameters[p],
+            'side': SIDE_NAMES[side],
+            'start': np.datetime64(int(start), 'ms'),
+            'end': np.datetime64(int(end), 'ms'),
+            'duration_s': (end - start) / 1000.0,
+            'peak_value': peak,
+            'mean_value': total / count if count else np.nan,
+            'samples': int(count),
+            'limit': float(self.high[p] if side == HIGH else self.low[p]),
+            'target_value': self.target[p],
+            'adjustment': self.adjustment[p],
+        }
+
+    def update(self, timestamp, readings, tank=DEFAULT_TANK):
+        """Feed one reading (``{parameter: value}``); returns the episodes it closed."""
+        now = int(to_ms(timestamp))
+        state = self._state(tank)
+        state.last_time = now
+        closed = []
+        for p, parameter in enumerate(self.parameters):
+            value = readings.get(parameter)
+            if value is None or value != value:
+                continue
+            low, high, low_release, high_release = self._limits[p]
+            side = state.side[p]
+            if value > high:
+                new = HIGH
+            elif value < low:
+                new = LOW
+            elif (side == HIGH and value > high_release) or (side == LOW and value < low_release):
+                new = side
+            else:
+                new = 0
+
+            if new == side:
+                if side:
+                    state.total[p] += value
+                    state.count[p] += 1
+                    state.peak[p] = max(state.peak[p], value) if side == HIGH else min(state.peak[p], value)
+                continue
+            if side:
+                record = self._record(tank, p, side, state.start[p], now,
+                                      state.peak[p], state.total[p], state.count[p])
+                if record is not None:
+                    closed.append(record)
+            state.side[p] = new
+            if new:
+                state.start[p], state.peak[p], state.total[p], state.count[p] = now, value, value, 1
+        return closed
+
+    def update_frame(self, frame):
+        """Feed a chunk of readings (vectorized); returns the episodes it closed as a DataFrame.
+
+        Rows are evaluated in time order within each tank; chunks must follow each
+        other in time.
+        """
+        records = []
+        if 'id_tanque' in frame.columns:
+            for tank, positions in frame.groupby('id_tanque', sort=True, observed=True).indices.items():
+                records += self._update_block(int(tank), frame.iloc[positions])
+        elif len(frame):
+            records += self._update_block(DEFAULT_TANK, frame)
+        return episodes_frame(records)
+
+    def _update_block(self, tank, frame):
+        times = to_ms(pd.to_datetime(frame['marca_de_tiempo']).to_numpy())
+        values = np.column_stack([
+            float64_values(frame[p]) if p in frame.columns else np.full(len(frame), np.nan)
+            for p in self.parameters
+        ])
+        if np.any(np.diff(times) < 0):
+            order = np.argsort(times, kind='stable')
+            times, values = times[order], values[order]
+
+        state = self._state(tank)
+        initial = np.array(state.side, dtype=np.float64)
+        with np.errstate(invalid='ignore'):
+            above, below = values > self.high, values < self.low
+            high_band = (values > self.high_release) & ~above
+            low_band = (values < self.low_release) & ~below
+            raw = np.where(above, HIGH, np.where(below, LOW, np.where(high_band | low_band, np.nan, 0.0)))
+            raw[np.isnan(values)] = np.nan
+            # Band readings keep an episode of their own side open but end one of the other side
+            previous = ffill(raw, initial)
+            raw[(high_band & (previous == LOW)) | (low_band & (previous == HIGH))] = 0.0
+            sides = ffill(raw, initial).astype(np.int8)
+
+        records = []
+        for p in range(len(self.parameters)):
+            records += self._close_runs(tank, p, state, times, values[:, p], sides[:, p])
+        state.last_time = int(times[-1])
+        return records
+
+    def _close_runs(self, tank, p, state, times, values, sides):
+        carried = state.side[p]
+        boundaries = np.flatnonzero(np.diff(sides, prepend=np.int8(carried)))
+        records = []
+        if carried and (not len(boundaries) or boundaries[0] != 0):
+            # The open episode continues into this chunk: merge its first run
+            run_end = boundaries[0] if len(boundaries) else len(sides)
+            run = values[:run_end]
+            valid = run[~np.isnan(run)]
+            if len(valid):
+                state.peak[p] = max(state.peak[p], valid.max()) if carried == HIGH else min(state.peak[p], valid.min())
+                state.total[p] = _running_total(state.total[p], valid)
+                state.count[p] += len(valid)
+        if not len(boundaries):
+            return records
+        if carried:
+            record = self._record(tank, p, carried, state.start[p], times[boundaries[0]],
+                                  state.peak[p], state.total[p], state.count[p])
+            if record is not None:
+                records.append(record)
+
+        run_sides = sides[boundaries]
+        present = ~np.isnan(values)
+        counts = np.add.reduceat(present.astype(np.int64), boundaries)
+        highs = np.fmax.reduceat(values, boundaries)
+        lows = np.fmin.reduceat(values, boundaries)
+        ends = [*boundaries[1:], len(values)]
+        for i in np.flatnonzero(run_sides):
+            side = int(run_sides[i])
+            peak = float(highs[i] if side == HIGH else lows[i])
+            run = values[boundaries[i]:ends[i]]
+            # A run starts with a reading: missing ones only carry the side forward
+            total = _running_total(0.0, run[present[boundaries[i]:ends[i]]])
+            if i + 1 < len(boundaries):
+                record = self._record(tank, p, side, times[boundaries[i]], times[boundaries[i + 1]],
+                                      peak, total, int(counts[i]))
+                if record is not None:
+                    records.append(record)
+            else:
+                # Still open at the end of the chunk
+                state.start[p], state.peak[p] = int(times[boundaries[i]]), peak
+                state.total[p], state.count[p] = total, int(counts[i])
+        state.side[p] = int(run_sides[-1])
+        return records
+
+    def open_episodes(self):
+        """Episodes still open, with ``end`` unset and the duration up to the last reading."""
+        records = []
+        for tank, state in self.tanks.items():
+            for p, side in enumerate(state.side):
+                if not side:
+                    continue
+                record = self._record(tank, p, side, state.start[p], state.last_time,
+                                      state.peak[p], state.total[p], state.count[p])
+                if record is not None:
+                    record['end'] = np.datetime64('NaT', 'ms')
+                    records.append(record)
+        return episodes_frame(records)
+
+
+EPISODE_DTYPES = {'id_tanque': np.int64, 'start': 'datetime64[ms]', 'end': 'datetime64[ms]',
+                  'duration_s': np.float64, 'peak_value': np.float64, 'mean_value': np.float64,
+                  'samples': np.int64, 'limit': np.float64, 'target_value': np.float64}
+
+
+def episodes_frame(records):
+    frame = pd.DataFrame.from_records(records, columns=EPISODE_COLUMNS).astype(EPISODE_DTYPES)
+    return frame.sort_values(['start', 'id_tanque', 'parameter'], kind='stable', ignore_index=True)
+
+
+def _concat(frames):
+    frames = [frame for frame in frames if len(frame)]
+    if not frames:
+        return episodes_frame([])
+    return pd.concat(frames).sort_values(['start', 'id_tanque', 'parameter'], kind='stable', ignore_index=True)
+
+
+def detect_episodes(data, rules=None, hysteresis=None, min_duration_s=MIN_DURATION_S, include_open=True):
+    """Every episode in a historical frame, ordered by start; open ones have no ``end``."""
+    evaluator = AlertEvaluator(rules, hysteresis, min_duration_s)
+    episodes = [evaluator.update_frame(data)]
+    if include_open:
+        episodes.append(evaluator.open_episodes())
+    return _concat(episodes)
+
+
+def detect_episodes_in_chunks(chunks, rules=None, hysteresis=None, min_duration_s=MIN_DURATION_S,
+                              include_open=True):
+    """``detect_episodes`` over consecutive chunks (e.g. ``pd.read_csv(..., chunksize=...)``).
+
+    Memory stays proportional to one chunk plus the episodes found.
+    """
+    evaluator = AlertEvaluator(rules, hysteresis, min_duration_s)
+    episodes = [evaluator.update_frame(chunk) for chunk in chunks]
+    if include_open:
+        episodes.append(evaluator.open_episodes())
+    return _concat(episodes)
+
+
+def detect_episodes_in_history(root, rules=None, start=None, end=None, hysteresis=None,
+                               min_duration_s=MIN_DURATION_S, include_open=True):
+    """``detect_episodes`` over the Parquet sensor store, read one day partition at a time."""
+    rules = load_rules() if rules is None else rules
+    chunks = history_chunks(root, list(rules), start, end)
+    return detect_episodes_in_chunks(chunks, rules, hysteresis, min_duration_s, include_open)
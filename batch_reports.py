@@ -0,0 +1,194 @@
+# Nightly reports for many systems at once.
+# Every input is a job: a sensor CSV export, or one tank of the Parquet sensor
+# store (all of it when it has no tank ids). Jobs fan out over a process pool;
+# each worker streams its input a chunk at a time, checks it against the rule
+# registry and writes that input's adjustments and episodes workbooks, the same
+# two reports getInfoRMDesition.py writes for the bundled CSV. Only a small summary (row, violation and episode counts, timings)
+# travels back, and the parent merges the summaries into one workbook. Jobs are
+# submitted largest first so no worker is left with a big file at the end.
+import argparse
+import glob
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+
+from alert_episodes import detect_episodes_in_chunks
+from excel_export import write_frame
+from history_scan import history_chunks
+from parameter_rules import DEFAULT_RULES_PATH, load_rules
+from streaming_report import EPISODE_WIDTHS, XlsxSink, checked_chunks, iter_sensor_chunks
+
+ADJUSTMENTS_FILE = 'ajustes.xlsx'
+EPISODES_FILE = 'episodios.xlsx'
+SUMMARY_FILE = 'resumen_reportes.xlsx'
+
+SUMMARY_COLUMNS = ['job', 'source', 'rows', 'violations', 'episodes', 'read_s', 'check_s', 'write_s', 'seconds']
+
+
+def csv_jobs(patterns):
+    """One job per sensor CSV matched by ``patterns`` (paths, globs or folders): ``[(name, path, None)]``."""
+    paths = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            pattern = os.path.join(pattern, '*.csv')
+        paths.extend(sorted(glob.glob(pattern)) or [pattern])
+    jobs, names = [], set()
+    for path in dict.fromkeys(paths):
+        name = base = os.path.splitext(os.path.basename(path))[0]
+        suffix = 1
+        while name in names:
+            suffix += 1
+            name = f'{base}_{suffix}'
+        names.add(name)
+        jobs.append((name, path, None))
+    return jobs
+
+
+def history_jobs(root, tanks=None):
+    """One job per tank of the Parquet sensor store: ``[(name, root, tank)]``.
+
+    A store without tank ids (a single-tank installation) is one job over all of
+    it: ``[(name, root, None)]``.
+    """
+    if tanks is None:
+        from sensor_store import TANK_COLUMN
+
+        tanks = set()
+        for chunk in history_chunks(root, []):
+            if TANK_COLUMN in chunk:
+                tanks.update(chunk[TANK_COLUMN].dropna().astype(int))
+        if not tanks:
+            return [(os.path.basename(os.path.normpath(root)), root, None)]
+    return [(f'tanque_{tank}', root, int(tank)) for tank in sorted(tanks)]
+
+
+def _job_size(job):
+    _, source, tank = job
+    return os.path.getsize(source) if tank is None and os.path.isfile(source) else 0
+
+
+def _history_chunks(root, tank, columns):
+    from sensor_store import history_days, read_history
+
+    for day in history_days(root):
+        start = pd.Timestamp(day)
+        yield read_history(root, columns, start, start + pd.Timedelta(days=1), tanks=[tank])
+
+
+def run_report(job, output_dir, rules_path=DEFAULT_RULES_PATH):
+    """Write the adjustments and episodes workbooks of one job; returns its summary."""
+    started = time.perf_counter()
+    name, source, tank = job
+    rules = load_rules(rules_path)
+    job_dir = os.path.join(output_dir, name)
+    os.makedirs(job_dir, exist_ok=True)
+    from_csv = tank is None and not os.path.isdir(source)
+    if from_csv:
+        chunks = iter_sensor_chunks(source, list(rules))
+    elif tank is None:
+        chunks = history_chunks(source, list(rules))
+    else:
+        chunks = _history_chunks(source, tank, list(rules))
+    summary = {'job': name, 'source': source if tank is None else f'{source} (tanque {tank})'}
+
+    # CSV exports keep their timestamps as text, the history's are dates
+    with XlsxSink(os.path.join(job_dir, ADJUSTMENTS_FILE), text_timestamps=from_csv) as sink:
+        clock = time.perf_counter()
+        # Adjustments are written as each chunk goes by on its way to the episode detector
+        episodes = detect_episodes_in_chunks(checked_chunks(chunks, rules, sink, summary), rules)
+        # Episodes are detected interleaved with the chunks: checking is all but reading and writing
+        summary['check_s'] = time.perf_counter() - clock - summary['read_s'] - summary['write_s']
+        clock = time.perf_counter()
+    write_frame(os.path.join(job_dir, EPISODES_FILE), episodes, sheet_name='Episodios', widths=EPISODE_WIDTHS)
+    summary['write_s'] += time.perf_counter() - clock
+    summary['episodes'] = len(episodes)
+    summary['seconds'] = time.perf_counter() - started
+    return summary
+
+
+def iter_reports(jobs, output_dir, workers=None, rules_path=DEFAULT_RULES_PATH):
+    """Run every job, yielding each summary as its job finishes.
+
+    ``workers`` defaults to the number of cores; with one worker the jobs run in
+    this process, one after the other.
+    """
+    jobs = sorted(jobs, key=_job_size, reverse=True)
+    workers = min(workers or os.cpu_count() or 1, len(jobs))
+    if workers <= 1:
+        for job in jobs:
+            yield run_report(job, output_dir, rules_path)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(run_report, job, output_dir, rules_path) for job in jobs]
+        for future in as_completed(futures):
+            yield future.result()
+
+
+def merge_summaries(summaries):
+    """One row per job (violations per parameter included) plus a TOTAL row, in job order."""
+    summaries = sorted(summaries, key=lambda summary: summary['job'])
+    parameters = list(dict.fromkeys(parameter for summary in summaries for parameter in summary['by_parameter']))
+    frame = pd.DataFrame(
+        [{**{column: summary[column] for column in SUMMARY_COLUMNS}, **summary['by_parameter']} for summary in summaries],
+        columns=SUMMARY_COLUMNS + parameters)
+    totals = {column: frame[column].sum() for column in frame.columns[2:]}
+    frame.loc[len(frame)] = {'job': 'TOTAL', 'source': f'{len(summaries)} reportes', **totals}
+    return frame
+
+
+def run_batch(jobs, output_dir, workers=None, rules_path=DEFAULT_RULES_PATH, progress=None):
+    """Run every job and write the merged summary workbook; returns ``(summary_df, wall_seconds)``.
+
+    ``progress(summary)`` is called as each job finishes.
+    """
+    started = time.perf_counter()
+    os.makedirs(output_dir, exist_ok=True)
+    summaries = []
+    for summary in iter_reports(jobs, output_dir, workers, rules_path):
+        summaries.append(summary)
+        if progress is not None:
+            progress(summary)
+    summary_df = merge_summaries(summaries)
+    write_frame(os.path.join(output_dir, SUMMARY_FILE), summary_df, sheet_name='Resumen',
+                widths={'job': 25, 'source': 45})
+    return summary_df, time.perf_counter() - started
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Reportes de ajustes y episodios para muchos sistemas en paralelo")
+    parser.add_argument("csv", nargs="*", help="exportaciones CSV de los sensores (rutas, patrones o carpetas)")
+    parser.add_argument("--historial",
+                        help="carpeta del historial Parquet: un reporte por tanque (uno solo si no guarda tanques)")
+    parser.add_argument("--tanques", type=int, nargs="+", help="tanques del historial (por defecto todos)")
+    parser.add_argument("--destino", default=os.path.join("data", "reportes"),
+                        help="carpeta de salida: una subcarpeta por reporte y el resumen")
+    parser.add_argument("--procesos", type=int, help="procesos en paralelo (por defecto uno por núcleo)")
+    parser.add_argument("--reglas", default=DEFAULT_RULES_PATH, help="archivo de reglas de los parámetros")
+    args = parser.parse_args(argv)
+    if not args.csv and not args.historial:
+        parser.error("indique archivos CSV o --historial")
+    return args
+
+
+def print_summary(summary):
+    print(f"{summary['job']:<30} {summary['rows']:>12,} lecturas {summary['violations']:>11,} ajustes "
+          f"{summary['episodes']:>7,} episodios {summary['seconds']:>8.2f} s "
+          f"(lectura {summary['read_s']:.2f}, revisión {summary['check_s']:.2f}, escritura {summary['write_s']:.2f})",
+          flush=True)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    jobs = csv_jobs(args.csv)
+    if args.historial:
+        jobs += history_jobs(args.historial, args.tanques)
+    summary_df, seconds = run_batch(jobs, args.destino, args.procesos, args.reglas, progress=print_summary)
+    total = summary_df.iloc[-1]
+    print(f"{len(jobs)} reportes, {total['rows']:,} lecturas en {seconds:.2f} s "
+          f"(suma por reporte {total['seconds']:.2f} s); resumen en {os.path.join(args.destino, SUMMARY_FILE)}")
+
+
+if __name__ == "__main__":
+    main()
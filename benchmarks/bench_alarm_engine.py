@@ -0,0 +1,65 @@
+# Benchmark of the vectorized alarm engine against the original iterrows loop.
+#
+#   python benchmarks/bench_alarm_engine.py            # 1e4 .. 1e7 rows
+#   python benchmarks/bench_alarm_engine.py 3e7 5e7    # custom sizes (memory permitting)
+import sys
+
+import pandas as pd
+
+from common import parse_sizes, synthetic_sensor_frame, timed
+
+from alarm_engine import detect_adjustments, find_violations
+from parameter_rules import load_rules
+
+# The thresholds the report scripts use
+parameter_ranges = load_rules()
+
+# Above this size the iterrows baseline takes too long to be worth running
+LEGACY_MAX_ROWS = 20_000
+# The uniform synthetic data trips ~60% of the checks, so the record frame (object
+# columns) grows ~6x faster than the input; past this size only the scan is timed
+RECORDS_MAX_ROWS = 2_000_000
+
+
+def legacy_detect_adjustments(data, parameter_ranges):
+    adjustments = []
+    for index, row in data.iterrows():
+        for parameter, limits in parameter_ranges.items():
+            if row[parameter] < limits['min'] or row[parameter] > limits['max']:
+                adjustments.append({
+                    'marca_de_tiempo': row['marca_de_tiempo'],
+                    'parameter': parameter,
+                    'current_value': row[parameter],
+                    'target_value': limits['target'],
+                    'adjustment': limits['adjustment']
+                })
+    return pd.DataFrame(adjustments)
+
+
+def main(argv):
+    sizes = parse_sizes(argv, [10_000, 100_000, 1_000_000, 10_000_000])
+    compiled = parameter_ranges.compiled
+    print(f"{'rows':>12} {'violations':>12} {'scan s':>8} {'scan rows/s':>14} {'records s':>10} {'iterrows s':>11}")
+    for size in sizes:
+        data = synthetic_sensor_frame(size)
+        repeat = 3 if size <= 1_000_000 else 1
+        scan_seconds, (rows, cols, values) = timed(find_violations, data, compiled, repeat=repeat)
+        violations = rows.size
+        del rows, cols, values
+
+        records = legacy = ''
+        if size <= RECORDS_MAX_ROWS:
+            records_seconds, result = timed(detect_adjustments, data, parameter_ranges, repeat=repeat)
+            records = f"{records_seconds:.3f}"
+            if size <= LEGACY_MAX_ROWS:
+                legacy_seconds, expected = timed(legacy_detect_adjustments, data, parameter_ranges)
+                pd.testing.assert_frame_equal(result, expected)
+                legacy = f"{legacy_seconds:.3f}"
+            del result
+
+        print(f"{size:>12,} {violations:>12,} {scan_seconds:>8.3f} {size / scan_seconds:>14,.0f} {records:>10} {legacy:>11}")
+        del data
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,50 @@
+# Episode alerts vs one adjustment row per out-of-range sample, on noisy 1 Hz
+# readings from the physical tank model (4 tanks).
+#
+#   python benchmarks/bench_alert_episodes.py           # 1e5 .. 3e6 readings
+#   python benchmarks/bench_alert_episodes.py 1e7
+import sys
+import time
+
+import numpy as np
+
+from common import parse_sizes, timed
+
+from alarm_engine import find_violations
+from alert_episodes import AlertEvaluator, detect_episodes
+from parameter_rules import load_rules
+from tank_model import TankSimulator
+
+NUM_TANKS = 4
+STREAM_READINGS = 50_000
+
+
+def streaming_us_per_reading(data, rules):
+    evaluator = AlertEvaluator(rules)
+    sample = data.iloc[:STREAM_READINGS]
+    times = sample['marca_de_tiempo'].to_numpy()
+    tanks = sample['id_tanque'].to_numpy()
+    columns = {parameter: sample[parameter].to_numpy().tolist() for parameter in evaluator.parameters}
+    start = time.perf_counter()
+    for row in range(len(sample)):
+        evaluator.update(times[row], {parameter: values[row] for parameter, values in columns.items()}, int(tanks[row]))
+    return (time.perf_counter() - start) / len(sample) * 1e6
+
+
+def main(argv):
+    sizes = parse_sizes(argv, [100_000, 1_000_000, 3_000_000])
+    rules = load_rules()
+    print(f"{'readings':>12} {'sample rows':>12} {'episodes':>9} {'batch s':>8} {'batch rows/s':>13} {'stream us/reading':>18}")
+    for size in sizes:
+        data = TankSimulator(NUM_TANKS, interval_s=1.0, start_time=np.datetime64('2024-10-01T00:00:00'),
+                             seed=0).run(size // NUM_TANKS)
+        sample_rows = find_violations(data, rules.compiled)[0].size
+        seconds, episodes = timed(detect_episodes, data, rules)
+        stream = streaming_us_per_reading(data, rules)
+        print(f"{len(data):>12,} {sample_rows:>12,} {len(episodes):>9,} {seconds:>8.2f} "
+              f"{len(data) / seconds:>13,.0f} {stream:>18.1f}")
+        del data
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
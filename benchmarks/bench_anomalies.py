@@ -0,0 +1,54 @@
+# Statistical anomaly detection on noisy 1 Hz readings from the physical tank model:
+# vectorized detection over the whole history, and the incremental detector of the
+# live path one reading at a time. "series at 1 Hz" is how many (tank, sensor)
+# series one core keeps up with at the streaming cost.
+#
+#   python benchmarks/bench_anomalies.py           # 1e5 .. 3e6 readings, 4 tanks
+#   python benchmarks/bench_anomalies.py 1e6 --tanks 250
+import argparse
+import time
+
+import numpy as np
+
+from common import parse_sizes, timed
+
+from ingest_protocol import NUMERIC_FIELDS
+from sensor_anomalies import AnomalyDetector, detect_anomalies
+from tank_model import TankSimulator
+
+STREAM_READINGS = 20_000
+
+
+def streaming_us_per_reading(data):
+    detector = AnomalyDetector()
+    sample = data.iloc[:STREAM_READINGS]
+    times = sample['marca_de_tiempo'].to_numpy()
+    tanks = sample['id_tanque'].to_numpy()
+    columns = {sensor: sample[sensor].to_numpy().tolist() for sensor in NUMERIC_FIELDS}
+    start = time.perf_counter()
+    for row in range(len(sample)):
+        detector.update(times[row], {sensor: values[row] for sensor, values in columns.items()}, int(tanks[row]))
+    return (time.perf_counter() - start) / len(sample) * 1e6
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument('sizes', nargs='*')
+    parser.add_argument('--tanks', type=int, default=4)
+    args = parser.parse_args(argv)
+    sizes = parse_sizes(args.sizes, [100_000, 1_000_000, 3_000_000])
+    print(f"{'readings':>12} {'series':>7} {'anomalies':>10} {'batch s':>8} {'batch rows/s':>13} "
+          f"{'stream us/reading':>18} {'series at 1 Hz':>15}")
+    for size in sizes:
+        data = TankSimulator(args.tanks, interval_s=1.0, start_time=np.datetime64('2024-10-01T00:00:00'),
+                             seed=0).run(max(1, size // args.tanks))
+        seconds, anomalies = timed(detect_anomalies, data)
+        stream = streaming_us_per_reading(data)
+        series_per_core = 1e6 / (stream / len(NUMERIC_FIELDS))
+        print(f"{len(data):>12,} {args.tanks * len(NUMERIC_FIELDS):>7,} {len(anomalies):>10,} {seconds:>8.2f} "
+              f"{len(data) / seconds:>13,.0f} {stream:>18.1f} {series_per_core:>15,.0f}")
+        del data
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+# Batch reports: wall time of the same set of sensor CSVs (one per system) with
+# 1, 2, 4... worker processes up to the core count, and the speedup over one
+# worker. Inputs are noisy 1 Hz readings from the physical tank model.
+#
+#   python benchmarks/bench_batch_reports.py           # 16 files of 2e5 readings
+#   python benchmarks/bench_batch_reports.py 1e6 --files 32
+import argparse
+import os
+import tempfile
+
+import numpy as np
+
+from common import parse_sizes
+
+from batch_reports import csv_jobs, run_batch
+from tank_model import TankSimulator
+
+NUM_TANKS = 4
+
+
+def worker_counts():
+    cores = os.cpu_count() or 1
+    counts = [1]
+    while counts[-1] * 2 < cores:
+        counts.append(counts[-1] * 2)
+    return counts + [cores] if cores > 1 else counts
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument('sizes', nargs='*')
+    parser.add_argument('--files', type=int, default=16)
+    args = parser.parse_args(argv)
+    sizes = parse_sizes(args.sizes, [200_000])
+    print(f"{'files':>6} {'readings/file':>14} {'workers':>8} {'wall s':>8} {'sum of jobs s':>14} "
+          f"{'readings/s':>12} {'speedup':>8}")
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            for index in range(args.files):
+                data = TankSimulator(NUM_TANKS, interval_s=1.0, start_time=np.datetime64('2024-10-01T00:00:00'),
+                                     seed=index).run(max(1, size // NUM_TANKS))
+                data.to_csv(os.path.join(tmp, f'sistema_{index}.csv'), index=False)
+            jobs = csv_jobs([tmp])
+            single = None
+            for workers in worker_counts():
+                summary_df, seconds = run_batch(jobs, os.path.join(tmp, f'reportes_{workers}'), workers)
+                total = summary_df.iloc[-1]
+                single = single or seconds
+                print(f"{args.files:>6} {size:>14,} {workers:>8} {seconds:>8.2f} {total['seconds']:>14.2f} "
+                      f"{total['rows'] / seconds:>12,.0f} {single / seconds:>8.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+# Per-tick server CPU and payload of the realtime figure, per rendering mode:
+#   rebuild      make_subplots + seven add_trace calls every tick (previous behaviour)
+#   incremental  one figure per session, only the trace arrays are replaced
+#   lttb         incremental, each trace downsampled to MAX_POINTS with LTTB
+# The payload is the JSON spec Streamlit sends (plotly.io.to_json, validate=False).
+#
+#   python benchmarks/bench_chart_render.py            # windows of 100 .. 100k points
+#   python benchmarks/bench_chart_render.py 1e6        # custom window sizes
+import sys
+import time
+
+import numpy as np
+import plotly.io
+
+from common import parse_sizes
+
+from chart_render import TRACE_SENSORS, RealtimeFigure, build_realtime_figure, lttb
+from ring_buffer import SensorHistory
+
+MAX_POINTS = 1_000
+TICKS = 10
+
+
+def filled_history(window, rng):
+    history = SensorHistory(sorted(set(TRACE_SENSORS)), window)
+    start = np.datetime64('2024-10-01T00:00:00', 'ms')
+    timestamps = start + np.arange(window) * np.timedelta64(3, 's')
+    history.timestamps.extend(timestamps)
+    for sensor, buffer in history.series.items():
+        buffer.extend(np.cumsum(rng.normal(0, 0.1, window)) + 20)
+    return history
+
+
+def measure(history, render, rng):
+    cpu = payload = 0
+    for _ in range(TICKS):
+        history.append(history.timestamps.last() + np.timedelta64(3, 's'),
+                       {sensor: 20 + rng.normal() for sensor in history.sensors})
+        start = time.process_time()
+        timestamps, data = history.window()
+        spec = plotly.io.to_json(render(timestamps, data), validate=False)
+        cpu += time.process_time() - start
+        payload += len(spec)
+    return cpu / TICKS, payload / TICKS
+
+
+def main(argv):
+    windows = parse_sizes(argv, [100, 10_000, 100_000])
+    rng = np.random.default_rng(0)
+    print(f"{'window':>9} {'mode':>12} {'cpu ms/tick':>12} {'payload KB':>11}")
+    for window in windows:
+        history = filled_history(window, rng)
+        incremental, downsampled = RealtimeFigure(), RealtimeFigure()
+        modes = {
+            'rebuild': build_realtime_figure,
+            'incremental': incremental.update,
+            'lttb': lambda timestamps, data: downsampled.update(timestamps, data, max_points=MAX_POINTS),
+        }
+        for mode, render in modes.items():
+            cpu, payload = measure(history, render, rng)
+            print(f"{window:>9,} {mode:>12} {cpu * 1000:>12.1f} {payload / 1024:>11,.0f}")
+
+    x = np.arange(100_000)
+    for series in (1, 6):
+        y = rng.normal(size=(series, x.size))
+        start = time.perf_counter()
+        lttb(x, y, MAX_POINTS)
+        print(f"lttb {series} x 100k -> {MAX_POINTS:,} points: {(time.perf_counter() - start) * 1000:.1f} ms")
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
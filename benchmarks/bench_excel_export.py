@@ -0,0 +1,111 @@
+# xlsx export of an adjustments report: the previous pandas ``to_excel`` path vs the
+# constant-memory ``TableWriter``. Every run is a fresh subprocess; "extra MB" is the
+# peak RSS during the export (peak reset once the report frame is built) minus the
+# RSS held at that point.
+# ``to_excel`` cannot write more rows than fit in one sheet.
+#
+#   python benchmarks/bench_excel_export.py            # 1e5 and 1e6 rows
+#   python benchmarks/bench_excel_export.py 1.5e6
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from common import REPO_ROOT, parse_sizes
+
+from alarm_engine import ADJUSTMENT_COLUMNS
+from excel_export import EXCEL_MAX_DATA_ROWS
+
+METHODS = ['to_excel', 'TableWriter']
+
+
+def adjustments_frame(num_rows, seed=0):
+    """Report rows shaped like ``detect_adjustments`` output read from the sensor CSV."""
+    rng = np.random.default_rng(seed)
+    parameters = np.array(['nivel_de_ph', 'temperatura_agua_C', 'nivel_de_nitratos_ppm', 'humedad_ambiente_%'])
+    adjustments = np.array(['Add acid to lower pH, base to increase', 'Use heaters or coolers to maintain',
+                            'Adjust feeding or filtration to regulate', 'Use humidifiers or dehumidifiers'])
+    which = rng.integers(0, len(parameters), num_rows)
+    timestamps = np.datetime64('2024-10-01T00:00:00') + np.arange(num_rows).astype('timedelta64[s]')
+    return pd.DataFrame({
+        'marca_de_tiempo': pd.Series(timestamps).dt.strftime('%Y-%m-%d %H:%M:%S'),
+        'parameter': parameters[which],
+        'current_value': np.round(rng.uniform(0, 100, num_rows), 2),
+        'target_value': np.round(rng.uniform(0, 100, num_rows), 2),
+        'adjustment': adjustments[which],
+    }, columns=ADJUSTMENT_COLUMNS)
+
+
+def export_to_excel(frame, output_path):
+    """The export getInfoRMDesition.py used before: one in-memory workbook."""
+    with pd.ExcelWriter(output_path, engine='xlsxwriter') as writer:
+        frame.to_excel(writer, sheet_name='Ajustes', index=False)
+        worksheet = writer.sheets['Ajustes']
+        worksheet.autofilter(0, 0, frame.shape[0], frame.shape[1] - 1)
+        worksheet.set_column('A:A', 20)
+        worksheet.set_column('B:B', 25)
+        worksheet.set_column('C:D', 15)
+        worksheet.set_column('E:E', 30)
+
+
+def export_table_writer(frame, output_path):
+    from streaming_report import XlsxSink
+
+    with XlsxSink(output_path) as sink:
+        sink.append(frame)
+
+
+def reset_peak_rss():
+    """Restart the kernel's peak RSS count (VmHWM) from the current RSS."""
+    with open('/proc/self/clear_refs', 'w') as f:
+        f.write('5')
+
+
+def rss_mb(field):
+    """``VmRSS`` or ``VmHWM`` (peak) of this process, in MB."""
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith(field + ':'):
+                return int(line.split()[1]) / 1024
+
+
+def run_export(method, num_rows, output_path):
+    """Child process: print seconds and peak RSS above the baseline (MB)."""
+    frame = adjustments_frame(num_rows)
+    reset_peak_rss()
+    baseline_mb = rss_mb('VmRSS')
+    export = export_to_excel if method == 'to_excel' else export_table_writer
+    start = time.perf_counter()
+    export(frame, output_path)
+    seconds = time.perf_counter() - start
+    print(seconds, rss_mb('VmHWM') - baseline_mb)
+
+
+def main(argv):
+    sizes = parse_sizes(argv, [100_000, 1_000_000])
+    print(f"{'rows':>12} {'method':>12} {'seconds':>8} {'rows/s':>10} {'extra MB':>9} {'file MB':>8}")
+    with tempfile.TemporaryDirectory() as tmp:
+        output_path = os.path.join(tmp, 'ajustes.xlsx')
+        for size in sizes:
+            for method in METHODS:
+                if method == 'to_excel' and size > EXCEL_MAX_DATA_ROWS:
+                    print(f"{size:>12,} {method:>12} {'does not fit in one sheet':>40}")
+                    continue
+                output = subprocess.run(
+                    [sys.executable, __file__, '--child', method, str(size), output_path],
+                    check=True, capture_output=True, text=True, cwd=REPO_ROOT,
+                ).stdout.split()
+                seconds, extra_mb = float(output[0]), float(output[1])
+                file_mb = os.path.getsize(output_path) / 1e6
+                print(f"{size:>12,} {method:>12} {seconds:>8.2f} {size / seconds:>10,.0f} {extra_mb:>9.0f} {file_mb:>8.1f}")
+
+
+if __name__ == '__main__':
+    if sys.argv[1:2] == ['--child']:
+        run_export(sys.argv[2], int(sys.argv[3]), sys.argv[4])
+    else:
+        main(sys.argv[1:])
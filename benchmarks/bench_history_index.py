@@ -0,0 +1,79 @@
+# Time-window reads from the sensor history as the store grows: the 2 hours before
+# the latest reading (all tanks, and one tank) through the block index vs the
+# previous pyarrow dataset scan with the same filter. One store grows through all
+# the sizes; readings are 1 Hz from 4 tanks, appended in batches as the ingestion
+# server does.
+#
+#   python benchmarks/bench_history_index.py           # 1e3 .. 1e7 readings
+#   python benchmarks/bench_history_index.py 1e3 1e6 1e8
+import sys
+import tempfile
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+
+from common import parse_sizes, synthetic_sensor_frame, timed
+
+from sensor_store import (PARTITION_COLUMN, SENSOR_SCHEMA, TANK_COLUMN, TIMESTAMP_COLUMN, load_index, open_history,
+                          read_window, write_history)
+
+NUM_TANKS = 4
+BATCH_ROWS = 2_000_000
+WINDOW = pd.Timedelta(hours=2)
+COLUMNS = ['marca_de_tiempo', 'nivel_de_ph', 'temperatura_agua_C']
+START = np.datetime64('2024-10-01T00:00:00', 'ns')
+
+
+def append_readings(root, first, count):
+    """Write readings ``first .. first + count`` of the 1 Hz, 4-tank sequence."""
+    for offset in range(first, first + count, BATCH_ROWS):
+        rows = min(BATCH_ROWS, first + count - offset)
+        frame = synthetic_sensor_frame(rows, seed=offset)
+        position = np.arange(offset, offset + rows)
+        frame['marca_de_tiempo'] = START + (position // NUM_TANKS).astype('timedelta64[s]')
+        frame['id_tanque'] = (position % NUM_TANKS + 1).astype(np.int32)
+        write_history(frame, root)
+
+
+def scan_filter(start, end, tanks=None):
+    """Arrow filter expression for ``start <= marca_de_tiempo < end`` (and tank ids)."""
+    time_type = SENSOR_SCHEMA.field(TIMESTAMP_COLUMN).type
+    # The partition conditions prune whole directories before any file is opened
+    expression = ((ds.field(PARTITION_COLUMN) >= start.date()) & (ds.field(PARTITION_COLUMN) <= end.date())
+                  & (ds.field(TIMESTAMP_COLUMN) >= pa.scalar(start.to_pydatetime(), time_type))
+                  & (ds.field(TIMESTAMP_COLUMN) < pa.scalar(end.to_pydatetime(), time_type)))
+    if tanks is not None:
+        expression &= ds.field(TANK_COLUMN).isin(list(tanks))
+    return expression
+
+
+def scan_window(root, start, end, tanks=None):
+    """The read before the index: dataset discovery plus partition and row-group pruning."""
+    table = open_history(root).to_table(columns=COLUMNS, filter=scan_filter(start, end, tanks))
+    return table.to_pandas().sort_values('marca_de_tiempo', kind='stable', ignore_index=True)
+
+
+def main(argv):
+    sizes = sorted(parse_sizes(argv, [1_000, 100_000, 1_000_000, 10_000_000]))
+    print(f"{'readings':>12} {'blocks':>7} {'window rows':>12} {'scan ms':>8} {'index ms':>9} "
+          f"{'tank scan ms':>13} {'tank index ms':>14}")
+    with tempfile.TemporaryDirectory() as root:
+        stored = 0
+        for size in sizes:
+            append_readings(root, stored, size - stored)
+            stored = size
+            end = pd.Timestamp(START + np.timedelta64((size - 1) // NUM_TANKS + 1, 's'))
+            start = end - WINDOW
+            scan_seconds, expected = timed(scan_window, root, start, end, repeat=5)
+            index_seconds, frame = timed(read_window, root, start, end, columns=COLUMNS, repeat=5)
+            assert len(frame) == len(expected)
+            tank_scan_seconds, _ = timed(scan_window, root, start, end, [2], repeat=5)
+            tank_index_seconds, _ = timed(read_window, root, start, end, [2], COLUMNS, repeat=5)
+            print(f"{size:>12,} {len(load_index(root)):>7,} {len(frame):>12,} {scan_seconds * 1e3:>8.1f} "
+                  f"{index_seconds * 1e3:>9.1f} {tank_scan_seconds * 1e3:>13.1f} {tank_index_seconds * 1e3:>14.1f}")
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,64 @@
+# Sustained ingestion throughput per protocol, with and without Parquet storage.
+# The server runs in its own process (pinned to one core when the machine has more
+# than one); the load generator keeps a bounded window of unacknowledged batches,
+# so the figures are the rates the server sustains under back-pressure.
+#
+#   python benchmarks/bench_ingest.py            # 1M readings per run
+#   python benchmarks/bench_ingest.py 5e6
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+from common import REPO_ROOT, parse_sizes
+
+from ingest_loadgen import run_load
+
+PROTOCOLS = ["mqtt", "json", "http"]
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(port, history):
+    args = [sys.executable, str(REPO_ROOT / "ingest_server.py"), "--puerto", str(port)]
+    args += ["--historial", history] if history else ["--sin-historial"]
+    cores = sorted(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else []
+    # Server on the first core, load generator on the others
+    preexec = (lambda: os.sched_setaffinity(0, {cores[0]})) if len(cores) > 1 else None
+    server = subprocess.Popen(args, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, preexec_fn=preexec)
+    server.stdout.readline()  # "Escuchando en ..."
+    if len(cores) > 1:
+        os.sched_setaffinity(0, set(cores[1:]))
+    return server
+
+
+def main(argv):
+    readings = parse_sizes(argv, [1_000_000])[0]
+    cores = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count()
+    if cores < 2:
+        print("1 core: server and load generator share it, the server's own rate is higher")
+    print(f"{'protocol':>8} {'storage':>8} {'readings/s':>12} {'p50 ms':>8} {'p99 ms':>8}")
+    for protocol in PROTOCOLS:
+        for storage in (False, True):
+            with tempfile.TemporaryDirectory() as tmp:
+                port = free_port()
+                server = start_server(port, os.path.join(tmp, "historial") if storage else None)
+                try:
+                    time.sleep(0.5)
+                    result = asyncio.run(run_load(port=port, protocol=protocol, readings=readings))
+                finally:
+                    server.terminate()
+                    server.wait()
+            print(f"{protocol:>8} {'parquet' if storage else 'none':>8} {result['lecturas_por_s']:>12,.0f} "
+                  f"{result['latencia_p50_ms']:>8.1f} {result['latencia_p99_ms']:>8.1f}")
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,61 @@
+# Overhead of the perf_metrics instrumentation: cost of one timed stage with
+# metrics disabled and enabled, and the share of a realtime panel tick (feed
+# snapshot, LTTB figure update, JSON spec) it takes with the panel's eight stages.
+#
+#   python benchmarks/bench_metrics.py           # windows of 100 and 10k points
+#   python benchmarks/bench_metrics.py 1e5
+import sys
+import time
+
+import numpy as np
+import plotly.io
+
+from common import parse_sizes
+
+from chart_render import TRACE_SENSORS, RealtimeFigure
+from perf_metrics import Metrics
+from shared_feed import SharedFeed
+
+STAGE_CALLS = 200_000
+TICKS = 30
+MAX_POINTS = 1_000
+PANEL_STAGES = 8
+
+
+def stage_cost_us(metrics):
+    start = time.perf_counter()
+    for _ in range(STAGE_CALLS):
+        with metrics.stage('stage'):
+            pass
+    return (time.perf_counter() - start) / STAGE_CALLS * 1e6
+
+
+def tick_ms(window):
+    sensors = sorted(set(TRACE_SENSORS))
+    feed = SharedFeed(None, sensors, window)
+    rng = np.random.default_rng(0)
+    timestamps = np.datetime64('2024-10-01T00:00:00', 'ms') + np.arange(window) * np.timedelta64(3, 's')
+    feed.push(timestamps, {sensor: np.cumsum(rng.normal(0, 0.1, window)) + 20 for sensor in sensors})
+    figure = RealtimeFigure()
+    best = float('inf')
+    for _ in range(TICKS):
+        start = time.perf_counter()
+        _, timestamps, data = feed.snapshot()
+        plotly.io.to_json(figure.update(timestamps, data, max_points=MAX_POINTS), validate=False)
+        best = min(best, time.perf_counter() - start)
+    return best * 1e3
+
+
+def main(argv):
+    windows = parse_sizes(argv, [100, 10_000])
+    disabled, enabled = stage_cost_us(Metrics(enabled=False)), stage_cost_us(Metrics(enabled=True))
+    print(f"one stage: disabled {disabled:.2f} us, enabled {enabled:.2f} us")
+    print(f"{'window':>9} {'tick ms':>8} {'overhead enabled':>17} {'overhead disabled':>18}")
+    for window in windows:
+        tick = tick_ms(window)
+        print(f"{window:>9,} {tick:>8.2f} {PANEL_STAGES * enabled / 1e3 / tick:>17.3%} "
+              f"{PANEL_STAGES * disabled / 1e3 / tick:>18.3%}")
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
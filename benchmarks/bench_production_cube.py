@@ -0,0 +1,53 @@
+# Cost of one filter change on the historical page: masks over every production
+# row (old code) vs a lookup in the pre-aggregated cube. The bundled workbook is
+# replicated as extra production lots of the same years, months and tipos.
+#
+#   python benchmarks/bench_production_cube.py          # 240 .. 2.4M rows
+#   python benchmarks/bench_production_cube.py 1e7      # custom row counts
+import sys
+
+import numpy as np
+import pandas as pd
+
+from common import REPO_ROOT, parse_sizes, timed
+
+from production_cube import ProductionCube
+from production_loader import load_production
+
+QUERIES = 50
+
+
+def replicated(base, num_rows):
+    copies = -(-num_rows // len(base))
+    return pd.concat([base] * copies, ignore_index=True).iloc[:num_rows]
+
+
+def mask_query(frame, year, month, tipos):
+    filtered = frame[(frame['fecha_año'] == year) & (frame['fecha_mes'] == month) & (frame['tipo'].isin(tipos))]
+    return (filtered['cantidad_produccion'].sum(), filtered['ingreso_produccion'].sum(),
+            filtered['ganancia'].sum(), filtered['Peso_produccion'].mean(),
+            filtered['mortalidad_produccion'].mean(), filtered['venta_kg'].sum())
+
+
+def cube_query(cube, year, month, tipos):
+    return ProductionCube.totals(cube.select(year, month, tipos))
+
+
+def main(argv):
+    base = load_production(str(REPO_ROOT / 'proceso_de_produccion.xlsx'), sidecar=False)
+    sizes = parse_sizes(argv, [240, 24_000, 240_000, 2_400_000])
+    print(f"{'rows':>10} {'build s':>9} {'mask ms/query':>14} {'cube ms/query':>14} {'speedup':>8}")
+    for num_rows in sizes:
+        frame = replicated(base, num_rows)
+        build, cube = timed(ProductionCube.from_frame, frame)
+        rng = np.random.default_rng(0)
+        queries = [(cube.years[i], cube.months[j], cube.tipos)
+                   for i, j in zip(rng.integers(len(cube.years), size=QUERIES), rng.integers(len(cube.months), size=QUERIES))]
+        mask, _ = timed(lambda: [mask_query(frame, *query) for query in queries])
+        lookup, _ = timed(lambda: [cube_query(cube, *query) for query in queries])
+        print(f"{num_rows:>10,} {build:>9.3f} {mask / QUERIES * 1e3:>14.3f} "
+              f"{lookup / QUERIES * 1e3:>14.3f} {mask / lookup:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
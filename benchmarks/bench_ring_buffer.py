@@ -0,0 +1,62 @@
+# Per-tick cost of the realtime history: ring buffers vs the old list-of-dicts.
+# One tick = append a reading, take the window for the charts and read the deltas.
+#
+#   python benchmarks/bench_ring_buffer.py             # windows of 100 .. 100k points
+#   python benchmarks/bench_ring_buffer.py 1e6         # custom window sizes
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from common import parse_sizes
+
+from ring_buffer import SensorHistory
+
+SENSORS = [
+    "nivel_de_ph", "nivel_de_oxigeno_agua_mg_L", "temperatura_agua_C", "temperatura_ambiente_C",
+    "humedad_ambiente_%", "cantidad_alimento_g", "nivel_de_agua_cm",
+]
+TICKS = 200
+
+
+def reading(rng):
+    return {sensor: rng.random() for sensor in SENSORS}
+
+
+def legacy_ticks(window, ticks, rng):
+    history = [{**reading(rng), 'timestamp': np.datetime64('now')} for _ in range(window)]
+    start = time.perf_counter()
+    for _ in range(ticks):
+        history.append({**reading(rng), 'timestamp': np.datetime64('now')})
+        if len(history) > window:
+            history = history[-window:]
+        data = pd.DataFrame(history)
+        deltas = {sensor: history[-1][sensor] - history[-2][sensor] for sensor in SENSORS}
+    return (time.perf_counter() - start) / ticks
+
+
+def ring_buffer_ticks(window, ticks, rng):
+    history = SensorHistory(SENSORS, window)
+    for _ in range(window):
+        history.append(np.datetime64('now'), reading(rng))
+    start = time.perf_counter()
+    for _ in range(ticks):
+        history.append(np.datetime64('now'), reading(rng))
+        timestamps, data = history.window()
+        deltas = {sensor: history.series[sensor].last() - history.series[sensor].previous() for sensor in SENSORS}
+    return (time.perf_counter() - start) / ticks
+
+
+def main(argv):
+    windows = parse_sizes(argv, [100, 1_000, 10_000, 100_000])
+    rng = np.random.default_rng(0)
+    print(f"{'window':>9} {'list+DataFrame us/tick':>23} {'ring buffer us/tick':>20}")
+    for window in windows:
+        legacy = legacy_ticks(window, max(5, TICKS * 100 // window), rng)
+        ring = ring_buffer_ticks(window, TICKS, rng)
+        print(f"{window:>9,} {legacy * 1e6:>23,.1f} {ring * 1e6:>20,.1f}")
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,72 @@
+# Sensor rollups: time to build every tier from the history, cost of folding a new
+# batch of readings into the stored tiers, and a 30-day chart query answered from
+# the raw Parquet history vs from the rollup tier with at most 1,000 buckets.
+# Readings are 1 Hz, 4 tanks.
+#
+#   python benchmarks/bench_rollups.py           # 1e6 and 1e7 readings
+#   python benchmarks/bench_rollups.py 3e7
+import sys
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from common import synthetic_sensor_frame, parse_sizes, timed
+
+from sensor_rollups import RollupStore, rebuild_from_history
+from sensor_store import read_history, write_history
+
+NUM_TANKS = 4
+BATCH_ROWS = 1_000
+CHART_DAYS = 30
+CHART_POINTS = 1_000
+CHART_SENSORS = ['nivel_de_ph', 'temperatura_agua_C']
+
+
+def readings(num_readings, seed=0):
+    """``num_readings`` sensor rows at 1 Hz per tank, every tank reporting each second."""
+    frame = synthetic_sensor_frame(num_readings, seed)
+    seconds = np.arange(num_readings) // NUM_TANKS
+    frame['marca_de_tiempo'] = np.datetime64('2024-10-01T00:00:00', 'ns') + seconds.astype('timedelta64[s]')
+    frame['id_tanque'] = (np.arange(num_readings) % NUM_TANKS + 1).astype(np.int32)
+    return frame
+
+
+def raw_chart(history_root, start, end):
+    """The chart without rollups: every reading of the tank, then a mean per hour."""
+    frame = read_history(history_root, columns=CHART_SENSORS, start=start, end=end, tanks=[1])
+    return frame.set_index('marca_de_tiempo')[CHART_SENSORS].resample('1h').mean()
+
+
+def main(argv):
+    sizes = parse_sizes(argv, [1_000_000, 10_000_000])
+    print(f"{'readings':>12} {'build s':>8} {'build rows/s':>13} {'update ms':>10} {'memory update ms':>17} "
+          f"{'raw query ms':>13} {'rollup query ms':>16} {'tier':>6}")
+    for size in sizes:
+        data = readings(size)
+        with tempfile.TemporaryDirectory() as tmp:
+            history_root, rollup_root = f'{tmp}/historial', f'{tmp}/rollups'
+            write_history(data, history_root)
+            build_seconds, _ = timed(rebuild_from_history, history_root, rollup_root)
+
+            # A new batch arriving right after the stored history
+            batch = readings(BATCH_ROWS, seed=1)
+            batch['marca_de_tiempo'] += data['marca_de_tiempo'].iloc[-1] - batch['marca_de_tiempo'].iloc[0]
+            store = RollupStore(rollup_root)
+            update_seconds, _ = timed(store.update, batch)
+            memory = RollupStore(max_buckets=10_000)
+            memory.update(data.iloc[-200_000:])
+            memory_seconds, _ = timed(memory.update, batch, repeat=5)
+
+            end = data['marca_de_tiempo'].iloc[-1]
+            start = max(data['marca_de_tiempo'].iloc[0], end - pd.Timedelta(days=CHART_DAYS))
+            raw_seconds, _ = timed(raw_chart, history_root, start, end, repeat=3)
+            rollup_seconds, (tier, _) = timed(store.query, start, end, CHART_POINTS, tanks=[1],
+                                              sensors=CHART_SENSORS, repeat=3)
+        print(f"{size:>12,} {build_seconds:>8.2f} {size / build_seconds:>13,.0f} {update_seconds * 1e3:>10.1f} "
+              f"{memory_seconds * 1e3:>17.2f} {raw_seconds * 1e3:>13.1f} {rollup_seconds * 1e3:>16.1f} {tier:>6}")
+        del data
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,76 @@
+# Memory of loaded sensor frames: default dtypes (float64 readings, object strings
+# for the timestamp and the filter state, int64 or int32 tank ids) vs the compact
+# schema of sensor_schema (categoricals, datetime64, and float32 readings for the
+# CSV export only; the history keeps them float64), for a CSV export and for the
+# Parquet history. Readings are 1 Hz from 16 tanks, so 1.4M rows are one day.
+# Each size also checks that the adjustments report is the same for both loads.
+#
+#   python benchmarks/bench_sensor_memory.py           # 1e5 and 1.4e6 rows
+#   python benchmarks/bench_sensor_memory.py 1e7
+import os
+import sys
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from common import parse_sizes, synthetic_sensor_frame, timed
+
+from alarm_engine import detect_adjustments
+from parameter_rules import load_rules
+from sensor_schema import read_sensor_csv
+from sensor_store import open_history, read_history, write_history
+
+NUM_TANKS = 16
+
+
+def sensor_frame(size):
+    frame = synthetic_sensor_frame(size)
+    frame.insert(1, 'id_tanque', (np.arange(size) % NUM_TANKS + 1).astype(np.int32))
+    return frame
+
+
+def same_adjustments(default, compact, rules):
+    expected, found = detect_adjustments(default, rules), detect_adjustments(compact, rules)
+    # The CSV timestamps stay strings in the default load
+    expected['marca_de_tiempo'] = pd.to_datetime(expected['marca_de_tiempo'])
+    return expected.equals(found)
+
+
+def megabytes(frame):
+    return frame.memory_usage(deep=True).sum() / 1e6
+
+
+def main(argv):
+    sizes = parse_sizes(argv, [100_000, 1_382_400])
+    rules = load_rules()
+    print(f"{'rows':>12} {'source':>8} {'default MB':>11} {'compact MB':>11} {'ratio':>6} "
+          f"{'default s':>10} {'compact s':>10} {'same report':>12}")
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            frame = sensor_frame(size)
+            csv_path, history_root = os.path.join(tmp, 'sensores.csv'), os.path.join(tmp, 'historial')
+            frame.to_csv(csv_path, index=False, date_format='%Y-%m-%d %H:%M:%S')
+            write_history(frame, history_root)
+            del frame
+            loads = {
+                'csv': (lambda: pd.read_csv(csv_path), lambda: read_sensor_csv(csv_path)),
+                # Before the compact schema the history came straight from Arrow's to_pandas
+                'history': (lambda: open_history(history_root).to_table().drop(['fecha']).to_pandas(),
+                            lambda: read_history(history_root)),
+            }
+            for source, (load_default, load_compact) in loads.items():
+                default_seconds, default = timed(load_default, repeat=3)
+                compact_seconds, compact = timed(load_compact, repeat=3)
+                if source == 'history':
+                    default = default.sort_values('marca_de_tiempo', kind='stable', ignore_index=True)
+                default_mb, compact_mb = megabytes(default), megabytes(compact)
+                same = same_adjustments(default, compact, rules)
+                print(f"{size:>12,} {source:>8} {default_mb:>11.1f} {compact_mb:>11.1f} "
+                      f"{default_mb / compact_mb:>5.1f}x {default_seconds:>10.2f} {compact_seconds:>10.2f} "
+                      f"{'yes' if same else 'NO':>12}")
+                del default, compact
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
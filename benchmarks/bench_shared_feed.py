@@ -0,0 +1,91 @@
+# Server CPU per viewer refresh, and the sessions-per-core figure it implies.
+#
+#   legacy    every session steps its own simulator, rebuilds the figure and
+#             re-runs the whole script (figure construction + serialization timed)
+#   fragment  sessions snapshot the shared feed and refresh only the live
+#             fragment: window copy, metric deltas, incremental LTTB figure update
+#             (skipped when no new reading arrived) and serialization
+#
+# Sessions per core = refresh interval / CPU per refresh. Streamlit's own
+# per-message overhead (protobuf, websocket) is not included.
+#
+#   python benchmarks/bench_shared_feed.py             # windows of 100 .. 10k points
+import sys
+import time
+
+import numpy as np
+import plotly.io
+
+from common import parse_sizes
+
+from chart_render import RealtimeFigure, build_realtime_figure
+from shared_feed import SharedFeed
+from tank_model import TankSimulator
+
+SENSORS = [
+    "nivel_de_ph", "nivel_de_oxigeno_agua_mg_L", "temperatura_agua_C", "temperatura_ambiente_C",
+    "humedad_ambiente_%", "cantidad_alimento_g", "nivel_de_agua_cm",
+]
+REFRESH_S = 3
+TICKS = 20
+
+
+def reading_source(simulator):
+    def source():
+        timestamp, readings = simulator.step()
+        return timestamp, {sensor: float(readings[sensor][0]) for sensor in SENSORS}
+    return source
+
+
+def legacy_refresh(simulator, history, window):
+    timestamp, readings = simulator.step()
+    history.append((timestamp, readings))
+    del history[:-window]
+    timestamps = np.array([t for t, _ in history])
+    data = {sensor: np.array([r[sensor][0] for _, r in history]) for sensor in SENSORS}
+    plotly.io.to_json(build_realtime_figure(timestamps, data), validate=False)
+
+
+def fragment_refresh(feed, figure, window, state):
+    version, timestamps, data = feed.snapshot(window)
+    deltas = {sensor: f"{data[sensor][-1] - data[sensor][-2]:.2f}" for sensor in SENSORS}
+    if state.get('version') != version:
+        figure.update(timestamps, data, max_points=1_000)
+        state['version'] = version
+    plotly.io.to_json(figure.figure, validate=False)
+    return deltas
+
+
+def cpu_per_call(func, *args):
+    start = time.process_time()
+    for _ in range(TICKS):
+        func(*args)
+    return (time.process_time() - start) / TICKS
+
+
+def main(argv):
+    windows = parse_sizes(argv, [100, 1_000, 10_000])
+    print(f"refresh every {REFRESH_S}s")
+    print(f"{'window':>8} {'mode':>9} {'cpu ms/refresh':>15} {'sessions/core':>14}")
+    for window in windows:
+        simulator = TankSimulator(num_tanks=1, interval_s=60, seed=1)
+        history = []
+        for _ in range(window):
+            history.append(simulator.step())
+        legacy = cpu_per_call(legacy_refresh, simulator, history, window)
+
+        feed = SharedFeed(reading_source(TankSimulator(num_tanks=1, interval_s=60, seed=1)), SENSORS, capacity=100_000)
+        for _ in range(window):
+            feed.tick()
+        figure, state = RealtimeFigure(), {}
+        # A new reading every tick is the worst case (refresh interval = feed interval)
+        def refresh_with_new_data():
+            feed.tick()
+            fragment_refresh(feed, figure, window, state)
+        fragment = cpu_per_call(refresh_with_new_data)
+        for mode, cpu in (('legacy', legacy), ('fragment', fragment)):
+            print(f"{window:>8,} {mode:>9} {cpu * 1000:>15.1f} {REFRESH_S / cpu:>14,.0f}")
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
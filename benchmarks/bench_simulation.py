@@ -0,0 +1,57 @@
+# Throughput of the vectorized simulator: generation alone, CSV and Parquet output.
+# The last line extrapolates the time for a billion-row dataset from the largest size.
+#
+#   python benchmarks/bench_simulation.py              # 1e4 .. 1e7 rows
+#   python benchmarks/bench_simulation.py 1e8          # custom sizes
+import os
+import random
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+from common import parse_sizes, timed
+
+from simulation_iot import generate_dataset, write_dataset
+
+LEGACY_ROWS = 10_000
+
+
+def legacy_generate(num_records):
+    # Original per-row generator (list comprehensions + strftime), two columns are enough
+    return {
+        "marca_de_tiempo": [(datetime.now() - timedelta(minutes=random.randint(0, 10000))).strftime('%Y-%m-%d %H:%M:%S') for _ in range(num_records)],
+        "nivel_de_oxigeno_agua_mg_L": [round(random.uniform(4, 12), 2) for _ in range(num_records)],
+    }
+
+
+def consume(chunks):
+    return sum(len(chunk) for chunk in chunks)
+
+
+def main(argv):
+    sizes = parse_sizes(argv, [10_000, 100_000, 1_000_000, 10_000_000])
+
+    legacy_seconds, _ = timed(legacy_generate, LEGACY_ROWS)
+    # 13 columns in the original script, extrapolated from the two timed above
+    legacy_rate = LEGACY_ROWS / (legacy_seconds * 13 / 2)
+    print(f"legacy list comprehensions: ~{legacy_rate:,.0f} rows/s")
+
+    print(f"{'rows':>12} {'generate rows/s':>16} {'csv rows/s':>12} {'parquet rows/s':>15}")
+    rates = None
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in sizes:
+            gen_seconds, _ = timed(consume, generate_dataset(size, num_tanks=16, interval_s=1, seed=1))
+            csv_seconds, _ = timed(write_dataset, generate_dataset(size, num_tanks=16, interval_s=1, seed=1),
+                                   csv_path=os.path.join(tmp, f'{size}.csv'))
+            parquet_seconds, _ = timed(write_dataset, generate_dataset(size, num_tanks=16, interval_s=1, seed=1),
+                                       history_path=os.path.join(tmp, f'historial_{size}'))
+            rates = (size / gen_seconds, size / csv_seconds, size / parquet_seconds)
+            print(f"{size:>12,} {rates[0]:>16,.0f} {rates[1]:>12,.0f} {rates[2]:>15,.0f}")
+
+    billion = 1_000_000_000
+    print(f"1e9 rows (extrapolated): generate {billion / rates[0] / 60:.1f} min, "
+          f"csv {billion / rates[1] / 60:.1f} min, parquet {billion / rates[2] / 60:.1f} min")
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,57 @@
+# Peak memory of the streaming adjustments report as the input CSV grows.
+# Every size runs in a fresh subprocess so ru_maxrss reflects only that run.
+#
+#   python benchmarks/bench_streaming_report.py            # 1e5 .. 3e6 rows
+#   python benchmarks/bench_streaming_report.py 2e7        # custom sizes
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+from common import REPO_ROOT, parse_sizes, synthetic_sensor_frame
+
+from bench_alarm_engine import parameter_ranges
+
+
+def write_input(path, num_records, chunk=1_000_000):
+    for start in range(0, num_records, chunk):
+        frame = synthetic_sensor_frame(min(chunk, num_records - start), seed=start)
+        frame.to_csv(path, mode='a' if start else 'w', header=not start, index=False,
+                     date_format='%Y-%m-%d %H:%M:%S')
+
+
+def run_report(csv_path, output_path):
+    """Child process: stream the report and print seconds and peak RSS (MB)."""
+    from streaming_report import write_adjustments_report
+
+    start = time.perf_counter()
+    summary = write_adjustments_report(csv_path, parameter_ranges, output_path)
+    seconds = time.perf_counter() - start
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(summary['rows_read'], summary['violations'], seconds, peak_mb)
+
+
+def main(argv):
+    sizes = parse_sizes(argv, [100_000, 1_000_000, 3_000_000])
+    print(f"{'rows':>12} {'input MB':>9} {'violations':>12} {'seconds':>8} {'rows/s':>12} {'peak RSS MB':>12}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in sizes:
+            csv_path = os.path.join(tmp, 'sensores.csv')
+            write_input(csv_path, size)
+            output = subprocess.run(
+                [sys.executable, __file__, '--child', csv_path, os.path.join(tmp, 'ajustes.csv')],
+                check=True, capture_output=True, text=True, cwd=REPO_ROOT,
+            ).stdout.split()
+            rows, violations, seconds, peak_mb = int(output[0]), int(output[1]), float(output[2]), float(output[3])
+            input_mb = os.path.getsize(csv_path) / 1e6
+            print(f"{rows:>12,} {input_mb:>9.0f} {violations:>12,} {seconds:>8.2f} {rows / seconds:>12,.0f} {peak_mb:>12.0f}")
+            os.remove(csv_path)
+
+
+if __name__ == '__main__':
+    if sys.argv[1:2] == ['--child']:
+        run_report(*sys.argv[2:4])
+    else:
+        main(sys.argv[1:])
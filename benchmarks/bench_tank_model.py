@@ -0,0 +1,33 @@
+# Speed of the physical multi-tank model: simulated seconds per wall-clock second.
+# At 1 Hz sampling a real-time factor above 1 means the model keeps up with live data.
+#
+#   python benchmarks/bench_tank_model.py              # 100 .. 10k tanks
+#   python benchmarks/bench_tank_model.py 50000        # custom tank counts
+import sys
+
+from common import parse_sizes, timed
+
+from tank_model import TankSimulator
+
+STEPS = 300
+
+
+def run_steps(simulator, steps):
+    for _ in range(steps):
+        simulator.step()
+
+
+def main(argv):
+    tank_counts = parse_sizes(argv, [100, 1_000, 10_000])
+    print(f"{'tanks':>8} {'ms/step':>9} {'readings/s':>13} {'x real time @1Hz':>17} {'run() ms/step':>14}")
+    for tanks in tank_counts:
+        simulator = TankSimulator(num_tanks=tanks, interval_s=1, seed=1)
+        seconds, _ = timed(run_steps, simulator, STEPS)
+        run_seconds, _ = timed(simulator.run, STEPS)
+        per_step = seconds / STEPS
+        print(f"{tanks:>8,} {per_step * 1000:>9.3f} {tanks / per_step:>13,.0f} {1 / per_step:>17,.0f} "
+              f"{run_seconds / STEPS * 1000:>14.3f}")
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
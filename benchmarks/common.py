@@ -0,0 +1,42 @@
+# Shared helpers for the benchmark scripts in this folder.
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# Allow running the scripts directly (python benchmarks/bench_x.py) from any folder
+REPO_ROOT = Path(__file__).resolve().parent.parent
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+from simulation_iot import SENSOR_RANGES  # noqa: E402
+
+
+def synthetic_sensor_frame(num_records, seed=0):
+    """Random sensor readings with the same columns as the bundled CSV."""
+    rng = np.random.default_rng(seed)
+    start = np.datetime64('2024-10-01T00:00:00')
+    data = {"marca_de_tiempo": (start + np.arange(num_records).astype('timedelta64[s]')).astype('datetime64[ns]')}
+    for column, (low, high) in SENSOR_RANGES.items():
+        data[column] = np.round(rng.uniform(low, high, num_records), 2)
+    data["estado_filtro"] = pd.Categorical.from_codes(
+        (rng.random(num_records) < 0.5).astype(np.int8), ["Clean", "Needs Cleaning"])
+    data["consumo_energia_kWh"] = np.round(rng.uniform(0, 10, num_records), 2)
+    return pd.DataFrame(data)
+
+
+def timed(func, *args, repeat=1, **kwargs):
+    """Run ``func`` ``repeat`` times and return ``(best_seconds, last_result)``."""
+    best, result = float('inf'), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args, **kwargs)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def parse_sizes(argv, default):
+    """Row counts from the command line (``1e6`` style accepted) or the default list."""
+    return [int(float(arg)) for arg in argv] if argv else default
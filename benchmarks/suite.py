@@ -0,0 +1,377 @@
+# Benchmark suite for regression tracking between versions: the simulator, both
+# report scripts and the dashboard's data preparation at several dataset sizes.
+# Every (case, size) runs in a fresh subprocess and records
+#   - latency percentiles (p50, p90, p99, min, max, mean) over repeated runs
+#   - throughput: input rows per second at the median latency
+#   - peak memory: the largest Python/numpy allocation during one run (tracemalloc,
+#     which does not see Arrow's buffers) and the peak RSS of the process, setup
+#     included
+# and the results go to a JSON file with the commit and library versions. With
+# --compare, the run is checked against an earlier JSON file: a case whose median
+# latency (by more than MIN_DELTA_MS) or peak allocation grew more than
+# --threshold is reported as a regression and the exit status is 1.
+#
+#   python benchmarks/suite.py                              # every case, 1e4 .. 1e6 rows
+#   python benchmarks/suite.py --cases report dashboard.figure --sizes 1e5 1e7
+#   python benchmarks/suite.py --compare data/benchmarks/1a2b3c4.json
+#   python benchmarks/suite.py --list
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+from common import REPO_ROOT, parse_sizes, synthetic_sensor_frame
+
+DEFAULT_SIZES = [10_000, 100_000, 1_000_000]
+MIN_REPEATS = 5
+MAX_REPEATS = 50
+# Repeats stop after this many seconds once MIN_REPEATS are done
+MIN_SECONDS = 2.0
+THRESHOLD = 0.10
+# Latency changes smaller than this are timer noise, whatever the ratio
+MIN_DELTA_MS = 0.5
+# Points per trace in the dashboard's incremental charts
+MAX_CHART_POINTS = 1_000
+CUBE_QUERIES = 50
+
+
+# Each case takes ``(size, tmp)``, does its setup and returns the callable timed
+# on every repeat; ``size`` is the number of input rows (window points for the
+# realtime charts). Cases marked fixed ignore the size and run once.
+
+def simulation_generate(size, tmp):
+    from simulation_iot import generate_dataset
+
+    return lambda: sum(len(chunk) for chunk in generate_dataset(size, num_tanks=16, interval_s=1, seed=1))
+
+
+def simulation_generate_physical(size, tmp):
+    from simulation_iot import generate_dataset
+
+    return lambda: sum(len(chunk) for chunk in generate_dataset(size, num_tanks=16, interval_s=1, seed=1,
+                                                                 model='fisico'))
+
+
+def simulation_write_csv(size, tmp):
+    from simulation_iot import generate_dataset, write_dataset
+
+    chunks = list(generate_dataset(size, num_tanks=16, interval_s=1, seed=1))
+    return lambda: write_dataset(chunks, csv_path=os.path.join(tmp, 'simulacion.csv'))
+
+
+def _sensor_csv(size, tmp):
+    path = os.path.join(tmp, f'sensores_{size}.csv')
+    synthetic_sensor_frame(size).to_csv(path, index=False, date_format='%Y-%m-%d %H:%M:%S')
+    return path
+
+
+def report_read_csv(size, tmp):
+    from sensor_schema import read_sensor_csv
+
+    path = _sensor_csv(size, tmp)
+    return lambda: read_sensor_csv(path)
+
+
+def report_adjustments(size, tmp):
+    from alarm_engine import detect_adjustments
+    from parameter_rules import load_rules
+
+    data, rules = synthetic_sensor_frame(size), load_rules()
+    return lambda: detect_adjustments(data, rules)
+
+
+def report_episodes(size, tmp):
+    from alert_episodes import detect_episodes
+    from parameter_rules import load_rules
+
+    data, rules = synthetic_sensor_frame(size), load_rules()
+    return lambda: detect_episodes(data, rules)
+
+
+def report_xlsx(size, tmp):
+    from alarm_engine import detect_adjustments
+    from parameter_rules import load_rules
+    from streaming_report import XlsxSink
+
+    adjustments = detect_adjustments(synthetic_sensor_frame(size), load_rules())
+
+    def run():
+        with XlsxSink(os.path.join(tmp, 'ajustes.xlsx'), logo_path=None) as sink:
+            sink.append(adjustments)
+    return run
+
+
+def report_write_reports(size, tmp):
+    from getInfoRMDesition import write_reports
+    from parameter_rules import load_rules
+
+    path, rules = _sensor_csv(size, tmp), load_rules()
+    return lambda: write_reports(path, os.path.join(tmp, 'reportes'), rules)
+
+
+def report_write_reports_streaming(size, tmp):
+    import getInfoRMDesition
+
+    # The chunked branch the script takes for exports over STREAMING_THRESHOLD_BYTES
+    getInfoRMDesition.STREAMING_THRESHOLD_BYTES = 0
+    return report_write_reports(size, tmp)
+
+
+def report_decision_table(size, tmp):
+    from getinfopro2 import write_decision_table
+    from parameter_rules import load_rules
+
+    rules = load_rules()
+    return lambda: write_decision_table(os.path.join(tmp, 'decisiones.xlsx'), rules)
+
+
+def _filled_feed(size, rollups=False):
+    from chart_render import TRACE_SENSORS
+    from sensor_rollups import RollupStore
+    from shared_feed import SharedFeed
+
+    sensors = sorted(set(TRACE_SENSORS))
+    store = RollupStore(sensors=sensors, max_buckets=10_000) if rollups else None
+    feed = SharedFeed(None, sensors, size, rollups=store)
+    rng = np.random.default_rng(0)
+    timestamps = np.datetime64('2024-10-01T00:00:00', 'ms') + np.arange(size) * np.timedelta64(3, 's')
+    feed.push(timestamps, {sensor: np.cumsum(rng.normal(0, 0.1, size)) + 20 for sensor in sensors})
+    return feed
+
+
+def dashboard_snapshot(size, tmp):
+    feed = _filled_feed(size)
+    return feed.snapshot
+
+
+def dashboard_figure_rebuild(size, tmp):
+    import plotly.io
+
+    from chart_render import build_realtime_figure
+
+    feed = _filled_feed(size)
+
+    def run():
+        _, timestamps, data = feed.snapshot()
+        return plotly.io.to_json(build_realtime_figure(timestamps, data), validate=False)
+    return run
+
+
+def dashboard_figure_lttb(size, tmp):
+    import plotly.io
+
+    from chart_render import RealtimeFigure
+
+    feed, figure = _filled_feed(size), RealtimeFigure()
+
+    def run():
+        _, timestamps, data = feed.snapshot()
+        return plotly.io.to_json(figure.update(timestamps, data, max_points=MAX_CHART_POINTS), validate=False)
+    return run
+
+
+def dashboard_rollup_window(size, tmp):
+    feed = _filled_feed(size, rollups=True)
+    return lambda: feed.rollup_window(size, MAX_CHART_POINTS)
+
+
+def dashboard_production_cube(size, tmp):
+    from production_cube import ProductionCube
+    from production_loader import load_production
+
+    base = load_production(str(REPO_ROOT / 'proceso_de_produccion.xlsx'), sidecar=False)
+    frame = pd.concat([base] * -(-size // len(base)), ignore_index=True).iloc[:size]
+
+    def run():
+        cube = ProductionCube.from_frame(frame)
+        return [ProductionCube.totals(cube.select(cube.years[i % len(cube.years)], cube.months[i % len(cube.months)],
+                                                  cube.tipos)) for i in range(CUBE_QUERIES)]
+    return run
+
+
+# name -> (setup, fixed size)
+CASES = {
+    'simulation.generate': (simulation_generate, False),
+    'simulation.generate_physical': (simulation_generate_physical, False),
+    'simulation.write_csv': (simulation_write_csv, False),
+    'report.read_csv': (report_read_csv, False),
+    'report.adjustments': (report_adjustments, False),
+    'report.episodes': (report_episodes, False),
+    'report.xlsx': (report_xlsx, False),
+    'report.write_reports': (report_write_reports, False),
+    'report.write_reports_streaming': (report_write_reports_streaming, False),
+    'report.decision_table': (report_decision_table, True),
+    'dashboard.snapshot': (dashboard_snapshot, False),
+    'dashboard.figure_rebuild': (dashboard_figure_rebuild, False),
+    'dashboard.figure_lttb': (dashboard_figure_lttb, False),
+    'dashboard.rollup_window': (dashboard_rollup_window, False),
+    'dashboard.production_cube': (dashboard_production_cube, False),
+}
+
+
+def measure(case, size):
+    """Worker side: set up one case, time it and measure its memory; returns the result record."""
+    setup, _ = CASES[case]
+    with tempfile.TemporaryDirectory() as tmp:
+        run = setup(size, tmp)
+        latencies = []
+        started = time.perf_counter()
+        while len(latencies) < MAX_REPEATS and (len(latencies) < MIN_REPEATS or
+                                                time.perf_counter() - started < MIN_SECONDS):
+            clock = time.perf_counter()
+            run()
+            latencies.append(time.perf_counter() - clock)
+        # One more run under tracemalloc: slower, so it is not timed
+        tracemalloc.start()
+        run()
+        _, peak_alloc = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    latencies_ms = np.array(latencies) * 1e3
+    p50, p90, p99 = np.percentile(latencies_ms, [50, 90, 99])
+    return {
+        'case': case, 'size': size, 'repeats': len(latencies),
+        'latency_ms': {'p50': p50, 'p90': p90, 'p99': p99, 'min': latencies_ms.min(), 'max': latencies_ms.max(),
+                       'mean': latencies_ms.mean()},
+        'rows_per_s': size / (p50 / 1e3) if size else None,
+        'peak_alloc_mb': peak_alloc / 2**20,
+        'peak_rss_mb': peak_rss_mb(),
+    }
+
+
+def peak_rss_mb():
+    """Peak resident memory of this process, None where ``resource`` is missing (Windows)."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes, except on macOS where getrusage reports bytes
+    return peak / 2**20 if sys.platform == 'darwin' else peak / 1024
+
+
+def run_case(case, size):
+    """Parent side: measure one (case, size) in a fresh interpreter."""
+    completed = subprocess.run([sys.executable, __file__, '--worker', case, str(size)],
+                               capture_output=True, text=True, cwd=REPO_ROOT)
+    if completed.returncode:
+        return {'case': case, 'size': size, 'error': completed.stderr.strip().splitlines()[-1:]}
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def select_cases(patterns):
+    """Cases whose name equals or starts with one of ``patterns`` (every case without patterns)."""
+    if not patterns:
+        return list(CASES)
+    return [case for case in CASES if any(case == pattern or case.startswith(pattern.rstrip('.') + '.')
+                                          for pattern in patterns)]
+
+
+def git_commit():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                cwd=REPO_ROOT, check=True).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], capture_output=True,
+                               text=True, cwd=REPO_ROOT).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return f'{commit}-dirty' if dirty else commit
+
+
+def environment():
+    import pyarrow
+
+    return {
+        'commit': git_commit(), 'date': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(), 'platform': platform.platform(), 'cpus': os.cpu_count(),
+        'numpy': np.__version__, 'pandas': pd.__version__, 'pyarrow': pyarrow.__version__,
+    }
+
+
+def compare(results, baseline, threshold):
+    """Print median latency and peak allocation against ``baseline``; returns the regressions."""
+    previous = {(result['case'], result['size']): result for result in baseline['results'] if 'error' not in result}
+    regressions = []
+    print(f"\ncompared with {baseline['environment'].get('commit')} ({baseline['environment'].get('date')})")
+    print(f"{'case':<32} {'size':>10} {'p50 ms':>10} {'before':>10} {'change':>8} {'alloc change':>13}")
+    for result in results:
+        before = previous.get((result['case'], result['size']))
+        if before is None or 'error' in result:
+            continue
+        latency = result['latency_ms']['p50'] / before['latency_ms']['p50'] - 1
+        slower = result['latency_ms']['p50'] - before['latency_ms']['p50'] > MIN_DELTA_MS
+        alloc = (result['peak_alloc_mb'] / before['peak_alloc_mb'] - 1) if before['peak_alloc_mb'] else 0.0
+        regressed = (latency > threshold and slower) or alloc > threshold
+        if regressed:
+            regressions.append(result)
+        print(f"{result['case']:<32} {result['size']:>10,} {result['latency_ms']['p50']:>10.2f} "
+              f"{before['latency_ms']['p50']:>10.2f} {latency:>+8.0%} {alloc:>+13.0%}"
+              f"{'  REGRESSION' if regressed else ''}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--cases', nargs='*', help='case names or prefixes (simulation, report, dashboard...)')
+    parser.add_argument('--sizes', nargs='*', default=[])
+    parser.add_argument('--output', help='JSON results (default data/benchmarks/<commit>.json)')
+    parser.add_argument('--compare', help='earlier JSON results to check for regressions')
+    parser.add_argument('--threshold', type=float, default=THRESHOLD)
+    parser.add_argument('--list', action='store_true')
+    parser.add_argument('--worker', nargs=2, metavar=('CASE', 'SIZE'), help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.worker:
+        print(json.dumps(measure(args.worker[0], int(args.worker[1]))))
+        return 0
+    cases = select_cases(args.cases)
+    if args.list or not cases:
+        print('\n'.join(CASES))
+        return 0 if args.list else 2
+
+    sizes = parse_sizes(args.sizes, DEFAULT_SIZES)
+    env = environment()
+    results = []
+    print(f"{'case':<32} {'size':>10} {'runs':>5} {'p50 ms':>10} {'p90 ms':>10} {'p99 ms':>10} "
+          f"{'rows/s':>13} {'alloc MB':>9} {'RSS MB':>8}")
+    for case in cases:
+        for size in sizes[:1] if CASES[case][1] else sizes:
+            size = 0 if CASES[case][1] else size
+            result = run_case(case, size)
+            results.append(result)
+            if 'error' in result:
+                print(f"{case:<32} {size:>10,} failed: {' '.join(result['error'])}")
+                continue
+            latency = result['latency_ms']
+            rate = f"{result['rows_per_s']:>13,.0f}" if result['rows_per_s'] else f"{'-':>13}"
+            rss = f"{result['peak_rss_mb']:>8.0f}" if result['peak_rss_mb'] is not None else f"{'-':>8}"
+            print(f"{case:<32} {size:>10,} {result['repeats']:>5} {latency['p50']:>10.2f} {latency['p90']:>10.2f} "
+                  f"{latency['p99']:>10.2f} {rate} {result['peak_alloc_mb']:>9.1f} {rss}",
+                  flush=True)
+
+    output = args.output or os.path.join(REPO_ROOT, 'data', 'benchmarks', f"{env['commit'] or 'local'}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump({'environment': env, 'results': results}, f, indent=2)
+    print(f"\nresults written to {output}")
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"{len(regressions)} regression(s) above {args.threshold:.0%}")
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,187 @@
+# Plotly figure for the realtime page, built once and updated in place.
+# Rebuilding the subplots and re-adding every trace on each refresh costs more
+# than the data itself; RealtimeFigure keeps one figure per session, swaps only
+# the trace arrays, and caps each trace at ``max_points`` with LTTB downsampling
+# so the payload sent to the browser stays bounded however long the window is.
+import numpy as np
+import plotly.graph_objects as go
+from plotly.subplots import make_subplots
+
+# Sensor plotted by each trace, in the order the traces are added to the figure
+TRACE_SENSORS = [
+    "nivel_de_oxigeno_agua_mg_L",
+    "temperatura_agua_C",
+    "temperatura_ambiente_C",
+    "humedad_ambiente_%",
+    "nivel_de_agua_cm",
+    "cantidad_alimento_g",
+    "cantidad_alimento_g",
+]
+WATER_LEVEL_TRACE = 4
+
+
+def lttb(x, y, max_points):
+    """Indices of ``max_points`` points chosen by Largest-Triangle-Three-Buckets.
+
+    ``x`` must be increasing (numeric or datetime64). ``y`` is one series or a
+    2-D ``(series, points)`` array sharing ``x``; the result has the same leading
+    shape. First and last points are always kept; every bucket in between
+    contributes the point that forms the largest triangle with the previously
+    kept point and the next bucket's mean. Buckets are laid out as a padded 2-D
+    block so each step is a handful of array operations over all series at once.
+    """
+    y = np.asarray(y, dtype=np.float64)
+    single = y.ndim == 1
+    y = np.atleast_2d(y)
+    n = y.shape[1]
+    if max_points is None or n <= max_points or max_points < 3:
+        keep = np.broadcast_to(np.arange(n), y.shape)
+        return keep[0] if single else keep
+
+    x = np.asarray(x).astype(np.float64)
+    # Bucket edges for the n - 2 inner points
+    edges = np.linspace(1, n - 1, max_points - 1).astype(np.intp)
+    starts, ends = edges[:-1], edges[1:]
+    width = int((ends - starts).max())
+    # (buckets, width) point indices; short buckets repeat their last point,
+    # which never changes the argmax
+    members = np.minimum(starts[:, None] + np.arange(width), ends[:, None] - 1)
+    bucket_x, bucket_y = x[members], y[:, members]
+
+    # Mean of each bucket, used as the third vertex for the previous bucket
+    counts = ends - starts
+    mean_x = np.append(np.add.reduceat(x[1:n - 1], starts - 1)[1:] / counts[1:], x[-1])
+    mean_y = np.add.reduceat(y[:, 1:n - 1], starts - 1, axis=1)[:, 1:] / counts[1:]
+    mean_y = np.concatenate([mean_y, y[:, -1:]], axis=1)
+
+    series = np.arange(y.shape[0])
+    selected = np.empty((y.shape[0], max_points), dtype=np.intp)
+    selected[:, 0], selected[:, -1] = 0, n - 1
+    previous = np.zeros(y.shape[0], dtype=np.intp)
+    for bucket in range(max_points - 2):
+        px, py = x[previous][:, None], y[series, previous][:, None]
+        area = np.abs((px - mean_x[bucket]) * (bucket_y[:, bucket] - py)
+                      - (px - bucket_x[bucket]) * (mean_y[:, bucket, None] - py))
+        previous = members[bucket, np.argmax(area, axis=1)]
+        selected[:, bucket + 1] = previous
+    return selected[0] if single else selected
+
+
+def build_realtime_figure(timestamps, data):
+    """Full figure for the given window (the original per-refresh construction)."""
+    # Crear gráficos con diferentes estilos
+    fig = make_subplots(
+        rows=2, cols=3,
+        subplot_titles=(
+            "Oxígeno Disuelto", "Temperaturas", 
+             "Nivel de Agua", "Humedad",
+            "Alimentación"
+        )
+    )
+
+    # 1. Area chart para oxígeno
+    fig.add_trace(
+        go.Scatter(
+            x=timestamps,
+            y=data["nivel_de_oxigeno_agua_mg_L"],
+            fill='tozeroy',
+            name="Oxígeno",
+            line_color='rgba(0,100,255,0.8)'
+        ),
+        row=1, col=1
+    )
+
+    # 2. Line chart para temperaturas
+    fig.add_trace(
+        go.Scatter(
+            x=timestamps,
+            y=data["temperatura_agua_C"],
+            name="Temp. Agua",
+            line=dict(color='blue', width=2)
+        ),
+        row=1, col=2
+    )
+    fig.add_trace(
+        go.Scatter(
+            x=timestamps,
+            y=data["temperatura_ambiente_C"],
+            name="Temp. Ambiente",
+            line=dict(color='red', width=2)
+        ),
+        row=1, col=2
+    )
+
+    # 3. Bar chart para humedad
+    fig.add_trace(
+        go.Bar(
+            x=timestamps,
+            y=data["humedad_ambiente_%"],
+            name="Humedad",
+            marker_color='rgba(0,255,100,0.6)'
+        ),
+        row=2, col=1
+
+    )
+
+    # 4. Scatter plot para nivel de agua
+    fig.add_trace(
+        go.Scatter(
+            x=timestamps,
+            y=data["nivel_de_agua_cm"],
+            mode='markers',
+            marker=dict(
+                size=10,
+                color=data["nivel_de_agua_cm"],
+                colorscale='Viridis',
+            ),
+            name="Nivel Agua"
+        ),
+        row=1, col=3
+    )
+
+    # 5. Combined line and bar para alimentación
+    fig.add_trace(
+        go.Scatter(
+            x=timestamps,
+            y=data["cantidad_alimento_g"],
+            name="Alimento (línea)",
+            line=dict(color='orange', width=2)
+        ),
+        row=2, col=2
+    )
+    fig.add_trace(
+        go.Bar(
+            x=timestamps,
+            y=data["cantidad_alimento_g"],
+            name="Alimento (barra)",
+            marker_color='rgba(255,165,0,0.3)'
+        ),
+        row=2, col=2
+    )
+
+    fig.update_layout(
+        height=800,
+        showlegend=False,
+        title_text="Monitoreo en Tiempo Real del Sistema Acuapónico"
+    )
+    return fig
+
+
+class RealtimeFigure:
+    """Figure built once per session whose trace data is replaced on each refresh."""
+
+    def __init__(self):
+        empty = np.empty(0)
+        self.figure = build_realtime_figure(empty.astype('datetime64[ms]'), {sensor: empty for sensor in TRACE_SENSORS})
+
+    def update(self, timestamps, data, max_points=None):
+        """Point every trace at the latest window, downsampled to ``max_points`` per trace."""
+        sensors = list(dict.fromkeys(TRACE_SENSORS))
+        keep = dict(zip(sensors, lttb(timestamps, np.vstack([data[sensor] for sensor in sensors]), max_points)))
+        with self.figure.batch_update():
+            for position, (trace, sensor) in enumerate(zip(self.figure.data, TRACE_SENSORS)):
+                trace.x = timestamps[keep[sensor]]
+                trace.y = np.round(data[sensor][keep[sensor]], 2)
+                if position == WATER_LEVEL_TRACE:
+                    trace.marker.color = trace.y
+        return self.figure
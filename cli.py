@@ -0,0 +1,60 @@
+# One command line for every tool of the aquaponic system.
+# Each subcommand is the ``main`` of its own module, imported only when that
+# subcommand runs: ``python cli.py --help`` loads nothing heavy, and a report run
+# never pays for the simulator, Arrow's CSV writer or the dashboard's libraries.
+#
+#   python cli.py simular --registros 100000 --modelo fisico
+#   python cli.py reportes --csv datos_simulados_sistema_acuaponico.csv
+#   python cli.py decisiones
+#   python cli.py lote data/sistemas --procesos 8
+#   python cli.py dashboard
+#   python cli.py reportes --help
+import importlib
+import os
+import subprocess
+import sys
+
+# subcommand -> (module, description)
+COMMANDS = {
+    "simular": ("simulation_iot", "genera lecturas simuladas (CSV y/o historial Parquet)"),
+    "reportes": ("getInfoRMDesition", "reporte de ajustes y episodios fuera de rango de un CSV"),
+    "decisiones": ("getinfopro2", "tabla de decisión de los parámetros"),
+    "lote": ("batch_reports", "reportes de muchos sistemas en paralelo"),
+    "rollups": ("sensor_rollups", "reconstruye los rollups de los sensores"),
+    "ingesta": ("ingest_server", "servidor de ingesta de lecturas"),
+    "carga": ("ingest_loadgen", "generador de carga para el servidor de ingesta"),
+    "dashboard": ("dashboardstream", "dashboard de Streamlit (argumentos para streamlit run)"),
+}
+
+
+def usage():
+    lines = ["uso: python cli.py <comando> [opciones]", "", "comandos:"]
+    lines += [f"  {command:<12} {description}" for command, (_, description) in COMMANDS.items()]
+    lines += ["", "python cli.py <comando> --help muestra las opciones de cada comando"]
+    return "\n".join(lines)
+
+
+def run_dashboard(argv):
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), "dashboardstream.py")
+    return subprocess.call([sys.executable, "-m", "streamlit", "run", script, *argv])
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else list(argv)
+    if not argv or argv[0] in ("-h", "--help"):
+        print(usage())
+        return 0
+    command, rest = argv[0], argv[1:]
+    if command not in COMMANDS:
+        print(f"comando desconocido: {command}\n\n{usage()}", file=sys.stderr)
+        return 2
+    if command == "dashboard":
+        return run_dashboard(rest)
+    module = importlib.import_module(COMMANDS[command][0])
+    # argparse shows the subcommand in usage and error messages
+    sys.argv[0] = f"cli.py {command}"
+    return module.main(rest)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,12 +1,15 @@
 import streamlit as st
 import pandas as pd
-import altair as alt
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
-import time
 import numpy as np
+import os
+import uuid
 from datetime import datetime, timedelta
 
+from perf_metrics import DEFAULT_METRICS_PORT, METRICS, serve_metrics
+
+# Los módulos de cada página (altair, plotly, el productor, la producción...) se
+# importan al abrirla, así el arranque solo carga lo que usa la primera página
+
 # Configuración de la página
 st.set_page_config(
     page_title="Sistema Acuapónico",
@@ -38,217 +41,276 @@ st.markdown("""
     </style>
 """, unsafe_allow_html=True)
 
-# Función para generar datos simulados en tiempo real
-def generate_real_time_data(base_values, noise_level=0.1):
-    return {
-        key: value + np.random.normal(0, noise_level * abs(value))
-        for key, value in base_values.items()
-    }
+# Sensores mostrados en la página de tiempo real
+REALTIME_SENSORS = [
+    "nivel_de_ph",
+    "nivel_de_oxigeno_agua_mg_L",
+    "temperatura_agua_C",
+    "temperatura_ambiente_C",
+    "humedad_ambiente_%",
+    "cantidad_alimento_g",
+    "nivel_de_agua_cm"
+]
+
+# Función para generar datos simulados en tiempo real a partir del modelo físico del tanque
+def generate_real_time_data(simulator, tank=0):
+    timestamp, readings = simulator.step()
+    return timestamp.astype(datetime), {key: float(readings[key][tank]) for key in REALTIME_SENSORS}
+
+# Tamaños de ventana disponibles para el historial en tiempo real (puntos por sensor)
+WINDOW_SIZES = [100, 1_000, 10_000, 100_000]
+
+# Puntos máximos por traza enviados al navegador en modo incremental
+MAX_CHART_POINTS = 1_000
+
+# Intervalos (buckets) que conserva en memoria cada nivel de rollup del productor
+ROLLUP_MAX_BUCKETS = 10_000
+
+# Rollups guardados por ingest_server.py / sensor_rollups.py y puntos máximos por
+# gráfico en la página de historial
+ROLLUPS_ROOT = os.environ.get("SENSORES_ROLLUPS", os.path.join("data", "rollups_sensores"))
+HISTORY_MAX_POINTS = 500
+TIER_LABELS = {"1min": "1 minuto", "15min": "15 minutos", "1h": "1 hora", "1D": "1 día"}
+
+# Anomalías estadísticas (sensor_anomalies.py) mostradas bajo las métricas
+ANOMALY_ROWS = 10
+ANOMALY_LABELS = {"zscore": "Lectura atípica", "ewma": "Deriva", "rate": "Cambio brusco",
+                  "stuck": "Sensor congelado"}
+
+# El productor compartido genera una lectura cada FEED_INTERVAL_S segundos
+FEED_INTERVAL_S = 3
+REFRESH_OPTIONS = [1, 2, 3, 5, 10, 30]
+
+# Endpoint local de métricas propias (perf_metrics.py): /metrics y /metrics.json
+METRICS_HOST = os.environ.get("SENSORES_METRICAS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.environ.get("SENSORES_METRICAS_PUERTO", DEFAULT_METRICS_PORT))
+
+# Fuentes de datos de la página en tiempo real
+DATA_SOURCES = ["Simulación", "Servidor de ingesta"]
+
+# Servidor de ingesta (ingest_server.py) y tanque mostrado cuando se usan lecturas reales
+INGEST_HOST = os.environ.get("INGESTA_HOST", "127.0.0.1")
+INGEST_PORT = int(os.environ.get("INGESTA_PUERTO", 1884))
+INGEST_TANK = int(os.environ.get("INGESTA_TANQUE", 1))
+
+# Pasa al historial compartido las lecturas del tanque mostrado
+def push_tank_readings(feed, readings, tank=INGEST_TANK):
+    if "id_tanque" in readings.columns:
+        readings = readings[readings["id_tanque"].to_numpy() == tank]
+    if len(readings):
+        feed.push(readings["marca_de_tiempo"].to_numpy(),
+                  {sensor: readings[sensor].to_numpy() for sensor in REALTIME_SENSORS})
+
+# Un único productor para todas las sesiones y fuentes. Simulación: el modelo físico
+# del tanque avanza un minuto simulado por lectura. Servidor de ingesta: un hilo
+# suscrito al servidor añade las lecturas reales a medida que llegan. En ambos casos
+# se guarda la ventana más grande que se puede pedir y cada lectura se agrega
+# también en intervalos de 1 min, 15 min, 1 h y 1 día para las ventanas largas y
+# pasa por los detectores de anomalías
+@st.cache_resource
+def get_shared_feed(source=DATA_SOURCES[0]):
+    from ingest_client import IngestSubscriber
+    from sensor_anomalies import AnomalyDetector
+    from sensor_rollups import RollupStore
+    from shared_feed import SharedFeed
+    from tank_model import TankSimulator
+
+    rollups = RollupStore(sensors=REALTIME_SENSORS, max_buckets=ROLLUP_MAX_BUCKETS)
+    anomalies = AnomalyDetector(REALTIME_SENSORS)
+    if source == "Servidor de ingesta":
+        feed = SharedFeed(None, REALTIME_SENSORS, capacity=WINDOW_SIZES[-1], rollups=rollups,
+                          anomalies=anomalies)
+        IngestSubscriber(INGEST_HOST, INGEST_PORT, lambda readings: push_tank_readings(feed, readings)).start()
+        return feed
+    simulator = TankSimulator(num_tanks=1, interval_s=60)
+    feed = SharedFeed(lambda: generate_real_time_data(simulator), REALTIME_SENSORS,
+                      capacity=WINDOW_SIZES[-1], interval_s=FEED_INTERVAL_S, rollups=rollups,
+                      anomalies=anomalies)
+    return feed.start()
+
+# Un solo servidor de métricas por proceso; None si el puerto está ocupado
+@st.cache_resource
+def start_metrics_endpoint():
+    try:
+        return serve_metrics(METRICS, METRICS_HOST, METRICS_PORT)
+    except OSError:
+        return None
+
+metrics_endpoint = start_metrics_endpoint()
+
+# Cada sesión se identifica para contar las sesiones activas
+if "session_id" not in st.session_state:
+    st.session_state.session_id = uuid.uuid4().hex
+METRICS.touch_session(st.session_state.session_id)
 
 # Configuración de la barra lateral para selección de página
 with st.sidebar:
     st.title("🌱 Sistema Acuapónico")
-    page = st.radio("Navegación:", ["📊 Monitoreo en Tiempo Real", "📈 Producción Histórica"])
+    page = st.radio("Navegación:", ["📊 Monitoreo en Tiempo Real", "📈 Producción Histórica",
+                                    "📉 Historial de Sensores", "🛠️ Administración"])
 
 # Página 1: Monitoreo en Tiempo Real
 if page == "📊 Monitoreo en Tiempo Real":
+    from chart_render import RealtimeFigure, build_realtime_figure
+    from parameter_rules import load_rules
+
     st.title("Dashboard en Tiempo Real - Sistema Acuapónico")
     
-    # Placeholder para datos en tiempo real
-    if 'historical_data' not in st.session_state:
-        st.session_state.historical_data = []
-    
-    # Valores base para simulación
-    base_values = {
-        "nivel_de_ph": 7.0,
-        "nivel_de_oxigeno_agua_mg_L": 6.5,
-        "temperatura_agua_C": 25.0,
-        "temperatura_ambiente_C": 22.0,
-        "humedad_ambiente_%": 65.0,
-        "cantidad_alimento_g": 100.0,
-        "nivel_de_agua_cm": 50.0
-    }
-    
-    # Generar nuevos datos
-    new_data = generate_real_time_data(base_values)
-    st.session_state.historical_data.append({**new_data, 'timestamp': datetime.now()})
-    
-    # Mantener solo los últimos 100 puntos de datos
-    if len(st.session_state.historical_data) > 100:
-        st.session_state.historical_data = st.session_state.historical_data[-100:]
-    
-    # Convertir a DataFrame
-    data = pd.DataFrame(st.session_state.historical_data)
-    
-    # Crear métricas en tiempo real
-    col1, col2, col3 = st.columns(3)
-    
-    with col1:
-        current_ph = new_data["nivel_de_ph"]
-        previous_ph = st.session_state.historical_data[-2]["nivel_de_ph"] if len(st.session_state.historical_data) > 1 else current_ph
-        st.metric(
-            label="Nivel de pH",
-            value=f"{current_ph:.2f}",
-            delta=f"{current_ph - previous_ph:.2f}"
-        )
-
-        current_oxigen = new_data["nivel_de_oxigeno_agua_mg_L"]
-        previous_oxigen = st.session_state.historical_data[-2]["nivel_de_oxigeno_agua_mg_L"] if len(st.session_state.historical_data) > 1 else current_oxigen
-        st.metric(
-            label="Oxígeno (mg/L)",
-            value=f"{current_oxigen:.2f}",
-            delta=f"{current_oxigen - previous_oxigen:.2f}"
-        )
+    with st.sidebar:
+        window_size = st.select_slider("Ventana (puntos)", options=WINDOW_SIZES, value=WINDOW_SIZES[0])
+        render_mode = st.radio("Gráficos", ["Incremental", "Completo"], horizontal=True,
+                               help="Incremental: reutiliza la figura y reduce cada serie a "
+                                    f"{MAX_CHART_POINTS:,} puntos (LTTB); las ventanas más largas usan las "
+                                    "medias por intervalo de los rollups. Completo: reconstruye todo.")
+        refresh_s = st.select_slider("Actualizar cada (s)", options=REFRESH_OPTIONS, value=FEED_INTERVAL_S)
+        data_source = st.radio("Fuente de datos", DATA_SOURCES,
+                               help=f"Servidor de ingesta: lecturas reales del tanque {INGEST_TANK} "
+                                    f"recibidas por {INGEST_HOST}:{INGEST_PORT}")
 
-    with col2:
-        current_temp_amb = new_data["temperatura_ambiente_C"]
-        previous_temp_amb = st.session_state.historical_data[-2]["temperatura_ambiente_C"] if len(st.session_state.historical_data) > 1 else current_temp_amb
-        st.metric(
-            label="Temperatura Ambiente (°C)",
-            value=f"{current_temp_amb:.2f}",
-            delta=f"{current_temp_amb - previous_temp_amb:.2f}"
-        )
+    feed = get_shared_feed(data_source)
 
-        current_humidity = new_data["humedad_ambiente_%"]
-        previous_humidity = st.session_state.historical_data[-2]["humedad_ambiente_%"] if len(st.session_state.historical_data) > 1 else current_humidity
-        st.metric(
-            label="Humedad (%)",
-            value=f"{current_humidity:.1f}",
-            delta=f"{current_humidity - previous_humidity:.1f}"
-        )
+    # Cada etapa del panel se mide con perf_metrics cuando las métricas están activas
+    def render_realtime_panel():
+        # Copia de la ventana actual del productor compartido. Las ventanas largas en
+        # modo incremental se grafican con las medias por intervalo de los rollups,
+        # así que para las métricas basta con las dos últimas lecturas
+        use_rollups = render_mode == "Incremental" and window_size > MAX_CHART_POINTS
+        with METRICS.stage("panel.snapshot"):
+            version, timestamps, data = feed.snapshot(2 if use_rollups else window_size)
+        METRICS.set_gauge("feed_history_bytes", feed.history.nbytes)
+        METRICS.set_gauge("feed_readings", len(feed.history))
+        if not len(timestamps):
+            st.info(f"Esperando lecturas del servidor de ingesta en {INGEST_HOST}:{INGEST_PORT}...")
+            return
         
-    with col3:
-        current_temp = new_data["temperatura_agua_C"]
-        previous_temp = st.session_state.historical_data[-2]["temperatura_agua_C"] if len(st.session_state.historical_data) > 1 else current_temp
-        st.metric(
-            label="Temperatura Agua (°C)",
-            value=f"{current_temp:.1f}",
-            delta=f"{current_temp - previous_temp:.1f}"
-        )
+        # Crear métricas en tiempo real
+        with METRICS.stage("panel.metrics"):
+            col1, col2, col3 = st.columns(3)
 
-        current_eat = new_data["cantidad_alimento_g"]
-        previous_eat = st.session_state.historical_data[-2]["cantidad_alimento_g"] if len(st.session_state.historical_data) > 1 else current_eat
-        st.metric(
-            label="Cantidad de Alimento (g)",
-            value=f"{current_eat:.1f}",
-            delta=f"{current_eat - previous_eat:.1f}"
-        )
+            with col1:
+                current_ph = data["nivel_de_ph"][-1]
+                previous_ph = data["nivel_de_ph"][-2] if len(timestamps) > 1 else current_ph
+                st.metric(
+                    label="Nivel de pH",
+                    value=f"{current_ph:.2f}",
+                    delta=f"{current_ph - previous_ph:.2f}"
+                )
 
-    # Crear gráficos con diferentes estilos
-    fig = make_subplots(
-        rows=2, cols=3,
-        subplot_titles=(
-            "Oxígeno Disuelto", "Temperaturas", 
-             "Nivel de Agua", "Humedad",
-            "Alimentación"
-        )
-    )
-
-    # 1. Area chart para oxígeno
-    fig.add_trace(
-        go.Scatter(
-            x=data.index,
-            y=data["nivel_de_oxigeno_agua_mg_L"],
-            fill='tozeroy',
-            name="Oxígeno",
-            line_color='rgba(0,100,255,0.8)'
-        ),
-        row=1, col=1
-    )
-
-    # 2. Line chart para temperaturas
-    fig.add_trace(
-        go.Scatter(
-            x=data.index,
-            y=data["temperatura_agua_C"],
-            name="Temp. Agua",
-            line=dict(color='blue', width=2)
-        ),
-        row=1, col=2
-    )
-    fig.add_trace(
-        go.Scatter(
-            x=data.index,
-            y=data["temperatura_ambiente_C"],
-            name="Temp. Ambiente",
-            line=dict(color='red', width=2)
-        ),
-        row=1, col=2
-    )
-
-    # 3. Bar chart para humedad
-    fig.add_trace(
-        go.Bar(
-            x=data.index,
-            y=data["humedad_ambiente_%"],
-            name="Humedad",
-            marker_color='rgba(0,255,100,0.6)'
-        ),
-        row=2, col=1
-
-    )
-
-    # 4. Scatter plot para nivel de agua
-    fig.add_trace(
-        go.Scatter(
-            x=data.index,
-            y=data["nivel_de_agua_cm"],
-            mode='markers',
-            marker=dict(
-                size=10,
-                color=data["nivel_de_agua_cm"],
-                colorscale='Viridis',
-            ),
-            name="Nivel Agua"
-        ),
-        row=1, col=3
-    )
-
-    # 5. Combined line and bar para alimentación
-    fig.add_trace(
-        go.Scatter(
-            x=data.index,
-            y=data["cantidad_alimento_g"],
-            name="Alimento (línea)",
-            line=dict(color='orange', width=2)
-        ),
-        row=2, col=2
-    )
-    fig.add_trace(
-        go.Bar(
-            x=data.index,
-            y=data["cantidad_alimento_g"],
-            name="Alimento (barra)",
-            marker_color='rgba(255,165,0,0.3)'
-        ),
-        row=2, col=2
-    )
-
-    fig.update_layout(
-        height=800,
-        showlegend=False,
-        title_text="Monitoreo en Tiempo Real del Sistema Acuapónico"
-    )
-    st.plotly_chart(fig, use_container_width=True)
-
-    # Actualizar cada 3 segundos
-    time.sleep(3)
-    st.rerun()
+                current_oxigen = data["nivel_de_oxigeno_agua_mg_L"][-1]
+                previous_oxigen = data["nivel_de_oxigeno_agua_mg_L"][-2] if len(timestamps) > 1 else current_oxigen
+                st.metric(
+                    label="Oxígeno (mg/L)",
+                    value=f"{current_oxigen:.2f}",
+                    delta=f"{current_oxigen - previous_oxigen:.2f}"
+                )
+
+            with col2:
+                current_temp_amb = data["temperatura_ambiente_C"][-1]
+                previous_temp_amb = data["temperatura_ambiente_C"][-2] if len(timestamps) > 1 else current_temp_amb
+                st.metric(
+                    label="Temperatura Ambiente (°C)",
+                    value=f"{current_temp_amb:.2f}",
+                    delta=f"{current_temp_amb - previous_temp_amb:.2f}"
+                )
+
+                current_humidity = data["humedad_ambiente_%"][-1]
+                previous_humidity = data["humedad_ambiente_%"][-2] if len(timestamps) > 1 else current_humidity
+                st.metric(
+                    label="Humedad (%)",
+                    value=f"{current_humidity:.1f}",
+                    delta=f"{current_humidity - previous_humidity:.1f}"
+                )
+
+            with col3:
+                current_temp = data["temperatura_agua_C"][-1]
+                previous_temp = data["temperatura_agua_C"][-2] if len(timestamps) > 1 else current_temp
+                st.metric(
+                    label="Temperatura Agua (°C)",
+                    value=f"{current_temp:.1f}",
+                    delta=f"{current_temp - previous_temp:.1f}"
+                )
+
+                current_eat = data["cantidad_alimento_g"][-1]
+                previous_eat = data["cantidad_alimento_g"][-2] if len(timestamps) > 1 else current_eat
+                st.metric(
+                    label="Cantidad de Alimento (g)",
+                    value=f"{current_eat:.1f}",
+                    delta=f"{current_eat - previous_eat:.1f}"
+                )
+
+        # Resaltar los parámetros de la última lectura fuera de rango, con las mismas
+        # reglas que los reportes (parameter_rules.json se recarga si cambia)
+        with METRICS.stage("panel.rules"):
+            out_of_range = load_rules().out_of_range({sensor: values[-1] for sensor, values in data.items()})
+            if out_of_range:
+                st.warning("Fuera de rango: " + "; ".join(
+                    f"{rule['label']} {value:.2f} (rango {rule['min']:g} - {rule['max']:g})" for rule, value in out_of_range))
+
+        # Últimas anomalías estadísticas: lecturas atípicas, derivas lentas dentro del
+        # rango, cambios imposibles y sensores congelados
+        with METRICS.stage("panel.anomalies"):
+            anomalies = feed.recent_anomalies(ANOMALY_ROWS)
+            if anomalies:
+                with st.expander(f"Anomalías recientes ({len(anomalies)})"):
+                    st.dataframe(pd.DataFrame({
+                        "Hora": [record["marca_de_tiempo"] for record in reversed(anomalies)],
+                        "Parámetro": [record["parameter"] for record in reversed(anomalies)],
+                        "Tipo": [ANOMALY_LABELS[record["kind"]] for record in reversed(anomalies)],
+                        "Valor": [record["value"] for record in reversed(anomalies)],
+                        "Puntuación": [record["score"] for record in reversed(anomalies)],
+                    }), hide_index=True, use_container_width=True)
+
+        # Gráficos: la figura se construye una sola vez por sesión y solo se reemplazan
+        # los datos de cada traza, reducidos con LTTB a un máximo de puntos; si el
+        # productor no generó lecturas nuevas desde la última vez se reutiliza tal cual
+        with METRICS.stage("panel.figure"):
+            if render_mode == "Incremental":
+                if 'realtime_figure' not in st.session_state:
+                    st.session_state.realtime_figure = RealtimeFigure()
+                figure_key = (data_source, version, window_size)
+                if st.session_state.get('realtime_figure_key') != figure_key:
+                    if use_rollups:
+                        _, tier, buckets, means = feed.rollup_window(window_size, MAX_CHART_POINTS)
+                        st.session_state.realtime_figure.update(buckets, means)
+                    else:
+                        tier = None
+                        st.session_state.realtime_figure.update(timestamps, data, max_points=MAX_CHART_POINTS)
+                    st.session_state.realtime_figure_key = figure_key
+                    st.session_state.realtime_tier = tier
+                fig = st.session_state.realtime_figure.figure
+            else:
+                fig = build_realtime_figure(timestamps, data)
+        with METRICS.stage("panel.plotly_chart"):
+            st.plotly_chart(fig, use_container_width=True)
+        if render_mode == "Incremental" and st.session_state.get('realtime_tier'):
+            st.caption(f"Medias por intervalos de {TIER_LABELS[st.session_state.realtime_tier]} "
+                       f"de las últimas {window_size:,} lecturas")
+
+    # Solo este fragmento se vuelve a ejecutar en cada actualización: el CSS, la
+    # barra lateral y el resto de la página no se recalculan y ningún hilo queda
+    # bloqueado esperando al siguiente ciclo
+    @st.fragment(run_every=refresh_s)
+    def realtime_panel():
+        METRICS.touch_session(st.session_state.session_id)
+        with METRICS.stage("panel.tick"):
+            render_realtime_panel()
+
+    realtime_panel()
 
 elif page == "📈 Producción Histórica":
+    import altair as alt
+
+    from production_cube import cube_for
+    from production_loader import load_production
+
     st.title("Dashboard de Producción - Vista Histórica")
     
     try:
-        # Cargar datos
-        produccion_data = pd.read_excel('proceso_de_produccion.xlsx')
-        
-        # Asegurar que las columnas numéricas sean del tipo correcto
-        numeric_columns = ['cantidad_cosecha', 'venta_kg', 'costo_produccion', 
-                         'ganancia', 'ingreso_produccion', 'mortalidad_produccion', 
-                         'Peso_produccion', 'cantidad_produccion']
-        
-        for col in numeric_columns:
-            produccion_data[col] = pd.to_numeric(produccion_data[col], errors='coerce')
+        # Cargar datos (ya tipados; el Excel solo se vuelve a leer si el archivo cambia)
+        produccion_data = load_production('proceso_de_produccion.xlsx')
+        # Cubo precalculado por (año, mes, tipo): los filtros consultan los grupos
+        # en lugar de recorrer todas las filas en cada interacción
+        cube = cube_for(produccion_data)
         
         # Filtros en la barra lateral
         with st.sidebar:
@@ -258,62 +320,60 @@ elif page == "📈 Producción Histórica":
             with col1:
                 selected_year = st.selectbox(
                     "Año",
-                    options=sorted(produccion_data["fecha_año"].unique()),
-                    index=len(produccion_data["fecha_año"].unique()) - 1
+                    options=cube.years,
+                    index=len(cube.years) - 1
                 )
                 
             with col2:
                 selected_month = st.selectbox(
                     "Mes",
-                    options=sorted(produccion_data["fecha_mes"].unique())
+                    options=cube.months
                 )
             
             tipo_produccion = st.multiselect(
                 "Tipo de Producción",
-                options=produccion_data["tipo"].unique(),
-                default=produccion_data["tipo"].unique()
+                options=cube.tipos,
+                default=cube.tipos
             )
 
-        # Filtrar datos
-        filtered_data = produccion_data[
-            (produccion_data["fecha_año"] == selected_year) &
-            (produccion_data["fecha_mes"] == selected_month) &
-            (produccion_data["tipo"].isin(tipo_produccion))
-        ]
+        # Filtrar datos: una fila del cubo por tipo seleccionado
+        filtered_cells = cube.select(selected_year, selected_month, tipo_produccion)
+        totals = cube.totals(filtered_cells)
 
         # Métricas generales - Primera fila
         col1, col2, col3 = st.columns(3)
         
         with col1:
-            total_produccion = filtered_data["cantidad_produccion"].sum()
+            total_produccion = totals["cantidad_produccion"]
             st.metric("Producción Total", f"{total_produccion:.2f} kg")
         
         with col2:
-            total_ingresos = filtered_data["ingreso_produccion"].sum()
+            total_ingresos = totals["ingreso_produccion"]
             st.metric("Ingresos Totales", f"S/. {total_ingresos:,.2f}")
         
         with col3:
-            total_ganancia = filtered_data["ganancia"].sum()
+            total_ganancia = totals["ganancia"]
             st.metric("Ganancia Total", f"S/.{total_ganancia:,.2f}")
 
         # Métricas generales - Segunda fila
         col1, col2, col3 = st.columns(3)
         
         with col1:
-            promedio_peso = filtered_data["Peso_produccion"].mean()
+            promedio_peso = totals["Peso_produccion"]
             st.metric("Peso Promedio", f"{promedio_peso:.2f} kg")
         
         with col2:
-            mortalidad = filtered_data["mortalidad_produccion"].mean()
+            mortalidad = totals["mortalidad_produccion"]
             st.metric("Mortalidad Promedio", f"{mortalidad:.2f}%")
         
         with col3:
-            venta_kg = filtered_data["venta_kg"].sum()
+            venta_kg = totals["venta_kg"]
             st.metric("Venta Total", f"{venta_kg:.2f} kg")
 
         # Preparar datos para los gráficos
+        chart_cells = filtered_cells.reset_index()
         chart_data_production = pd.melt(
-            filtered_data,
+            chart_cells,
             id_vars=['tipo'],
             value_vars=['cantidad_cosecha', 'venta_kg'],
             var_name='Métrica',
@@ -321,7 +381,7 @@ elif page == "📈 Producción Histórica":
         )
 
         chart_data_financials = pd.melt(
-            filtered_data,
+            chart_cells,
             id_vars=['tipo'],
             value_vars=['costo_produccion', 'ganancia'],
             var_name='Métrica',
@@ -366,10 +426,123 @@ elif page == "📈 Producción Histórica":
             'costo_produccion', 'ingreso_produccion', 'ganancia',
             'mortalidad_produccion', 'Peso_produccion'
         ]
+        filtered_data = cube.select_rows(produccion_data, selected_year, selected_month, tipo_produccion)
         st.dataframe(
             filtered_data[columns_to_show].sort_values('fecha_mes', ascending=False),
             use_container_width=True
         )
 
     except Exception as e:
-        st.error(f"Error al cargar los datos de producción: {str(e)}")
\ No newline at end of file
+        st.error(f"Error al cargar los datos de producción: {str(e)}")
+
+# Página 3: Historial de Sensores a partir de los rollups. Cada consulta lee el nivel
+# más fino que entra en HISTORY_MAX_POINTS intervalos, nunca las lecturas crudas
+elif page == "📉 Historial de Sensores":
+    import altair as alt
+
+    from sensor_rollups import ROLLUP_SENSORS, RollupStore
+
+    st.title("Historial de Sensores")
+    rollups = RollupStore(ROLLUPS_ROOT)
+    first, last = rollups.time_range()
+    if first is None:
+        st.info(f"No hay rollups en {ROLLUPS_ROOT}. Se generan con ingest_server.py o con "
+                "`python sensor_rollups.py --csv datos_simulados_sistema_acuaponico.csv`")
+    else:
+        with st.sidebar:
+            st.header("Filtros")
+            dates = st.date_input(
+                "Rango de fechas",
+                value=(max(first.date(), (last - timedelta(days=7)).date()), last.date()),
+                min_value=first.date(),
+                max_value=last.date()
+            )
+            tank = st.selectbox("Tanque", options=rollups.tanks())
+            selected_sensors = st.multiselect(
+                "Sensores",
+                options=ROLLUP_SENSORS,
+                default=["nivel_de_ph", "temperatura_agua_C"]
+            )
+
+        if len(dates) == 2 and selected_sensors:
+            start = pd.Timestamp(dates[0])
+            end = pd.Timestamp(dates[1]) + timedelta(days=1)
+            tier, buckets = rollups.query(start, end, HISTORY_MAX_POINTS, tanks=[tank], sensors=selected_sensors)
+            st.caption(f"{len(buckets):,} intervalos de {TIER_LABELS[tier]}")
+
+            # Media por intervalo con la banda mínimo - máximo de cada sensor
+            for sensor in selected_sensors:
+                chart_data = buckets[["bucket", f"{sensor}__min", f"{sensor}__mean", f"{sensor}__max"]]
+                chart_data.columns = ["bucket", "Mínimo", "Media", "Máximo"]
+                base = alt.Chart(chart_data).encode(x=alt.X("bucket:T", title="Fecha"))
+                band = base.mark_area(opacity=0.25).encode(y=alt.Y("Mínimo:Q", title=sensor), y2="Máximo:Q")
+                line = base.mark_line().encode(
+                    y="Media:Q",
+                    tooltip=[alt.Tooltip("bucket:T", title="Desde"), "Mínimo", "Media", "Máximo"]
+                )
+                st.altair_chart((band + line).properties(title=sensor, height=250), use_container_width=True)
+
+# Página 4: Administración. Métricas propias del dashboard: tiempos por etapa del
+# panel en tiempo real y del productor compartido, sesiones activas y memoria
+elif page == "🛠️ Administración":
+    import altair as alt
+
+    st.title("Administración - Métricas del Dashboard")
+
+    with st.sidebar:
+        METRICS.enabled = st.toggle("Métricas activas", value=METRICS.enabled,
+                                    help="Mide cada etapa del panel en tiempo real y del productor compartido")
+        if st.button("Reiniciar métricas"):
+            METRICS.reset()
+            METRICS.touch_session(st.session_state.session_id)
+
+    if metrics_endpoint is not None:
+        host, port = metrics_endpoint.server_address[:2]
+        st.caption(f"Endpoint: http://{host}:{port}/metrics (Prometheus) y http://{host}:{port}/metrics.json")
+    else:
+        st.caption(f"Endpoint de métricas no disponible: el puerto {METRICS_PORT} está ocupado")
+
+    snapshot = METRICS.snapshot()
+    gauges = snapshot["gauges"]
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Sesiones activas", snapshot["sessions"])
+    rss = gauges.get("process_rss_bytes")
+    col2.metric("Memoria del proceso (MB)", f"{rss / 2**20:,.0f}" if rss is not None else "n/d")
+    col3.metric("Historial compartido (MB)", f"{gauges.get('feed_history_bytes', 0) / 2**20:,.1f}")
+    col4.metric("Lecturas en el historial", f"{gauges.get('feed_readings', 0):,}")
+
+    if not METRICS.enabled:
+        st.info("Las métricas están desactivadas. Actívelas en la barra lateral o inicie el dashboard "
+                "con SENSORES_METRICAS=1.")
+    if snapshot["stages"]:
+        # Percentiles aproximados por los intervalos del histograma (factor √2)
+        st.subheader("Tiempos por etapa (ms)")
+        stages = pd.DataFrame.from_dict(snapshot["stages"], orient="index")
+        stages_ms = pd.DataFrame({
+            "Ejecuciones": stages["count"],
+            "Media": stages["mean_s"] * 1e3,
+            "p50": stages["p50_s"] * 1e3,
+            "p90": stages["p90_s"] * 1e3,
+            "p99": stages["p99_s"] * 1e3,
+            "Máximo": stages["max_s"] * 1e3,
+            "Total (s)": stages["total_s"],
+        })
+        st.dataframe(stages_ms.style.format(precision=2), use_container_width=True)
+
+        stage = st.selectbox("Histograma de la etapa", options=list(snapshot["stages"]))
+        buckets = METRICS.histogram_buckets(stage)
+        bounds = [bound for bound, _ in buckets]
+        counts = np.diff(np.concatenate([[0], [count for _, count in buckets]])).astype(int)
+        used = np.flatnonzero(counts)
+        if used.size:
+            histogram = pd.DataFrame({
+                "Hasta (ms)": [f"{bound * 1e3:.3g}" if np.isfinite(bound) else "más" for bound in bounds],
+                "Ejecuciones": counts,
+            }).iloc[used.min():used.max() + 1]
+            st.altair_chart(alt.Chart(histogram).mark_bar().encode(
+                x=alt.X("Hasta (ms):N", sort=None, title="Duración (ms, límite superior)"),
+                y="Ejecuciones:Q",
+            ), use_container_width=True)
+        else:
+            # Las métricas se reiniciaron entre la instantánea y la lectura del histograma
+            st.info(f"La etapa {stage} aún no tiene ejecuciones registradas.")
@@ -0,0 +1,264 @@
+# Bulk xlsx export for large tables.
+# Writes with xlsxwriter's constant-memory mode, so every row goes to disk as soon
+# as the next one starts and memory stays flat whatever the size of the table.
+# Styles are attached once per column (``set_column``) or per range rather than
+# cell by cell. Cells are not written one call at a time either: each column is
+# rendered to its cell XML in one pass (strings once per distinct value) and whole
+# blocks of rows are appended to the sheet's row file, the same XML xlsxwriter
+# writes for single cells. A table longer than the Excel row limit continues on
+# ``<sheet>_2``, ``<sheet>_3``... Images are only read from local files, so an
+# export never waits on the network.
+#
+# The bulk path relies on xlsxwriter internals, so it only runs on the versions in
+# BULK_XLSXWRITER_VERSIONS (the one pinned in requirements.txt), which
+# tests/test_excel_export.py checks by reopening the written workbooks. Any other
+# version falls back to the public ``write_*`` calls, several times slower but
+# independent of xlsxwriter's internals.
+import os
+
+import numpy as np
+import pandas as pd
+
+# Excel hard limit is 1,048,576 rows per sheet, one of them is the header
+EXCEL_MAX_DATA_ROWS = 1_048_575
+
+# Rows rendered and appended to the sheet per step
+BLOCK_ROWS = 1 << 14
+
+# Longest string a cell can hold
+EXCEL_MAX_STRING = 32_767
+
+DEFAULT_LOGO_PATH = 'logo.jpg'
+DATETIME_FORMAT = 'yyyy-mm-dd hh:mm:ss'
+
+# xlsxwriter versions the bulk path has been verified with, and the internals it uses
+BULK_XLSXWRITER_VERSIONS = {'3.2.0'}
+_BULK_ATTRIBUTES = ('fh', 'previous_row', '_write_single_row', '_check_dimensions',
+                    '_escape_control_characters', '_escape_data')
+
+# Day zero of Excel's 1900 date system (1900-02-29 included)
+_EXCEL_EPOCH = np.datetime64('1899-12-30T00:00:00', 'ns')
+_NS_PER_DAY = 86_400 * 10**9
+
+
+def excel_serial(values):
+    """Datetimes as Excel serial day numbers (float64, NaN for missing values)."""
+    values = np.asarray(values, dtype='datetime64[ns]')
+    days = (values - _EXCEL_EPOCH).astype(np.int64) / _NS_PER_DAY
+    days[np.isnat(values)] = np.nan
+    return days
+
+
+def insert_logo(worksheet, cell, logo_path=DEFAULT_LOGO_PATH, options=None):
+    """Insert the local image ``logo_path`` at ``cell``; returns False if the file is not there."""
+    if not logo_path or not os.path.isfile(logo_path):
+        return False
+    worksheet.insert_image(cell, logo_path, options or {})
+    return True
+
+
+class TableWriter:
+    """Appends DataFrame chunks to one table in an xlsx workbook.
+
+    ``widths`` and ``number_formats`` map column names to a width and an Excel
+    number format; datetime columns get ``DATETIME_FORMAT`` unless given one.
+    ``header_format``, ``cell_format`` and ``title_format`` are xlsxwriter format
+    properties; ``cell_format`` is one shared style for every data cell (borders,
+    say) and takes the place of the column formats. The autofilter covers each
+    sheet when it is finished.
+    """
+
+    def __init__(self, output_path, columns, sheet_name='Hoja1', widths=None, number_formats=None,
+                 header_format=None, cell_format=None, title=None, title_format=None,
+                 logo_path=None, logo_cell=None, logo_options=None, max_rows=EXCEL_MAX_DATA_ROWS):
+        import xlsxwriter
+        from xlsxwriter.utility import xl_col_to_name, xl_rowcol_to_cell
+
+        self.workbook = xlsxwriter.Workbook(output_path, {'constant_memory': True})
+        self.bulk_version = xlsxwriter.__version__ in BULK_XLSXWRITER_VERSIONS
+        self.columns = list(columns)
+        self.sheet_name = sheet_name
+        self.widths = widths or {}
+        self.number_formats = dict(number_formats or {})
+        self.header_format = self.workbook.add_format(header_format) if header_format else None
+        self.cell_format = self.workbook.add_format(cell_format) if cell_format else None
+        self.title = title
+        self.title_format = self.workbook.add_format(title_format) if title_format else None
+        self.logo_path = logo_path
+        # Default logo position: first row, one column right of the table
+        self.logo_cell = logo_cell or xl_rowcol_to_cell(0, len(self.columns) + 1)
+        self.logo_options = logo_options
+        self.max_rows = max_rows
+        # One <row> of the bulk path: the row number, then each cell's attributes, content and end tag
+        cells = ''.join(f'<c r="{xl_col_to_name(col)}{{0}}"{{{col + 1}}}' for col in range(len(self.columns)))
+        self.row_template = f'<row r="{{0}}">{cells}</row>'.format
+        self.rows = 0
+        self.sheets = 0
+        self.worksheet = None
+
+    @property
+    def header_row(self):
+        return 1 if self.title else 0
+
+    def _start(self, frame):
+        # Datetime columns get a date format by default, known from the first chunk
+        if frame is not None:
+            for column in self.columns:
+                if pd.api.types.is_datetime64_any_dtype(frame[column].dtype):
+                    self.number_formats.setdefault(column, DATETIME_FORMAT)
+        self.column_formats = {
+            column: self.workbook.add_format({'num_format': number_format})
+            for column, number_format in self.number_formats.items()
+        }
+        self._new_sheet()
+
+    def _new_sheet(self):
+        self.sheets += 1
+        name = self.sheet_name if self.sheets == 1 else f'{self.sheet_name}_{self.sheets}'
+        self.worksheet = worksheet = self.workbook.add_worksheet(name)
+        self.bulk = self.bulk_version and getattr(worksheet, 'constant_memory', False) and all(
+            hasattr(worksheet, attribute) for attribute in _BULK_ATTRIBUTES)
+        for index, column in enumerate(self.columns):
+            if column in self.widths or column in self.column_formats:
+                worksheet.set_column(index, index, self.widths.get(column), self.column_formats.get(column))
+        # constant_memory needs the rows in order: title, header, then the data
+        if self.title:
+            worksheet.merge_range(0, 0, 0, len(self.columns) - 1, self.title, self.title_format)
+        worksheet.write_row(self.header_row, 0, self.columns, self.header_format)
+        if self.sheets == 1 and self.logo_path:
+            insert_logo(worksheet, self.logo_cell, self.logo_path, self.logo_options)
+        self.row = self.header_row
+
+    def _finish_sheet(self):
+        self.worksheet.autofilter(self.header_row, 0, self.row, len(self.columns) - 1)
+
+    def _column_writer(self, series):
+        """``(values, write)`` for one column: Python values plus the typed xlsxwriter call for them."""
+        worksheet, fmt = self.worksheet, self.cell_format
+        kind, values = _column_values(series)
+        write = {'number': worksheet.write_number, 'bool': worksheet.write_boolean,
+                 'string': worksheet.write_string, 'object': worksheet.write}[kind]
+        has_missing = np.isnan(values).any() if kind == 'number' else kind == 'object'
+        values = values.tolist()
+        if has_missing:
+            blank = worksheet.write_blank
+
+            def write(row, col, value, typed=write):
+                # NaN is the only value not equal to itself; blanks are only stored with a format
+                if value is None or value != value:
+                    blank(row, col, None, fmt)
+                else:
+                    typed(row, col, value, fmt)
+        elif fmt is not None:
+            def write(row, col, value, typed=write):
+                typed(row, col, value, fmt)
+        return values, write
+
+    def _cell_xml(self, series, style):
+        """Attributes, content and end tag of every ``<c>`` element of one column, as strings."""
+        kind, values = _column_values(series)
+        blank = f'{style}/>'
+        if kind == 'number':
+            finite = np.isfinite(values)
+            if finite.all():
+                return [f'{style}><v>%.16G</v></c>' % value for value in values.tolist()]
+            cells = np.full(len(values), blank, dtype=object)
+            cells[finite] = [f'{style}><v>%.16G</v></c>' % value for value in values[finite].tolist()]
+            return cells.tolist()
+        if kind == 'bool':
+            return np.where(values, f'{style} t="b"><v>1</v></c>', f'{style} t="b"><v>0</v></c>').tolist()
+        # Strings are escaped once per distinct value; missing values are blank cells
+        codes, uniques = pd.factorize(values)
+        worksheet = self.worksheet
+        cells = [_object_xml(worksheet, value, style) for value in uniques.tolist()] + [blank]
+        return np.array(cells, dtype=object)[codes].tolist()
+
+    def append(self, frame):
+        """Write the rows of ``frame`` (it must have every column in ``columns``)."""
+        if self.worksheet is None:
+            self._start(frame)
+        start = 0
+        while start < len(frame):
+            if self.row - self.header_row == self.max_rows:
+                self._finish_sheet()
+                self._new_sheet()
+            stop = min(len(frame), start + self.max_rows - (self.row - self.header_row))
+            self._write_rows(frame.iloc[start:stop])
+            start = stop
+        self.rows += len(frame)
+
+    def _write_rows(self, frame):
+        if self.bulk:
+            for start in range(0, len(frame), BLOCK_ROWS):
+                self._write_block(frame.iloc[start:start + BLOCK_ROWS])
+            return
+        values, writers = zip(*(self._column_writer(frame[column]) for column in self.columns))
+        indices = range(len(self.columns))
+        row = self.row
+        for record in zip(*values):
+            row += 1
+            for col, write, value in zip(indices, writers, record):
+                write(row, col, value)
+        self.row = row
+
+    def _write_block(self, frame):
+        worksheet = self.worksheet
+        first = self.row + 1
+        # Flush the rows still pending in xlsxwriter (title, header), then append ours
+        worksheet._write_single_row(first)
+        cells = []
+        for col, column in enumerate(self.columns):
+            fmt = self.cell_format or self.column_formats.get(column)
+            cells.append(self._cell_xml(frame[column], f' s="{fmt._get_xf_index()}"' if fmt else ''))
+        row_numbers = np.arange(first + 1, first + 1 + len(frame)).astype(str).tolist()
+        worksheet.fh.write(''.join(map(self.row_template, row_numbers, *cells)))
+        self.row = first + len(frame) - 1
+        worksheet._check_dimensions(self.row, len(self.columns) - 1)
+        worksheet.previous_row = self.row
+
+    def close(self):
+        if self.worksheet is None:
+            self._start(None)
+        self._finish_sheet()
+        self.workbook.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def _column_values(series):
+    """``(kind, values)``: numbers (float64, NaN when missing, datetimes as serials), bools or objects."""
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        series = series.astype(object)
+    if pd.api.types.is_datetime64_any_dtype(series.dtype):
+        return 'number', excel_serial(series.dt.tz_localize(None) if series.dt.tz else series)
+    if pd.api.types.is_bool_dtype(series.dtype) and not series.hasnans:
+        return 'bool', series.to_numpy(dtype=bool)
+    if pd.api.types.is_numeric_dtype(series.dtype):
+        return 'number', series.to_numpy(dtype=np.float64, na_value=np.nan)
+    if pd.api.types.infer_dtype(series, skipna=False) == 'string':
+        return 'string', series.to_numpy(dtype=object)
+    # Mixed objects: xlsxwriter's generic dispatch per cell, None and NaN are blanks
+    return 'object', series.to_numpy(dtype=object)
+
+
+def _object_xml(worksheet, value, style):
+    """``<c>`` attributes, content and end tag for one value, strings escaped as xlsxwriter does."""
+    if isinstance(value, (bool, np.bool_)):
+        return f'{style} t="b"><v>{int(value)}</v></c>'
+    if isinstance(value, (int, float, np.number)):
+        return f'{style}><v>%.16G</v></c>' % value if np.isfinite(value) else f'{style}/>'
+    string = worksheet._escape_control_characters(str(value)[:EXCEL_MAX_STRING])
+    # Leading or trailing whitespace needs xml:space="preserve"
+    space = ' xml:space="preserve"' if string[:1].isspace() or string[-1:].isspace() else ''
+    return f'{style} t="inlineStr"><is><t{space}>{worksheet._escape_data(string)}</t></is></c>'
+
+
+def write_frame(output_path, frame, sheet_name='Hoja1', **options):
+    """Write ``frame`` to ``output_path`` with a ``TableWriter``; returns the number of sheets used."""
+    with TableWriter(output_path, frame.columns, sheet_name, **options) as writer:
+        writer.append(frame)
+    return writer.sheets
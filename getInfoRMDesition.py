@@ -1,64 +1,71 @@
-# Define realistic parameter ranges for a hypothetical aquaponic system
-# This includes the target and range for each parameter
-import pandas as pd
-
-# Load the user's uploaded data to inspect it
-file_path = 'datos_simulados_sistema_acuaponico.csv'
-data = pd.read_csv(file_path)
-
-# Display the first few rows of the data to understand its structure
-data.head()
-
-parameter_ranges = {
-    'nivel_de_oxigeno_agua_mg_L': {'min': 5.0, 'max': 8.5, 'target': 7.5, 'adjustment': 'Increase aeration if low, decrease if high'},
-    'nivel_de_ph': {'min': 6.5, 'max': 7.5, 'target': 7.0, 'adjustment': 'Add acid to lower pH, base to increase'},
-    'nivel_de_nitratos_ppm': {'min': 10.0, 'max': 40.0, 'target': 30.0, 'adjustment': 'Adjust feeding or filtration to regulate'},
-    'nivel_de_nitritos_ppm': {'min': 0.0, 'max': 1.0, 'target': 0.5, 'adjustment': 'Increase filtration efficiency'},
-    'temperatura_agua_C': {'min': 20.0, 'max': 28.0, 'target': 24.0, 'adjustment': 'Use heaters or coolers to maintain'},
-    'temperatura_ambiente_C': {'min': 18.0, 'max': 30.0, 'target': 25.0, 'adjustment': 'Adjust greenhouse temperature'},
-    'humedad_ambiente_%': {'min': 40.0, 'max': 70.0, 'target': 55.0, 'adjustment': 'Use humidifiers or dehumidifiers'},
-    'cantidad_alimento_g': {'min': 50.0, 'max': 100.0, 'target': 75.0, 'adjustment': 'Feed more if low, reduce if high'},
-    'flujo_de_agua_L_min': {'min': 5.0, 'max': 10.0, 'target': 7.5, 'adjustment': 'Adjust pump speed to maintain flow'},
-    'intensidad_de_luz_lux': {'min': 10000, 'max': 50000, 'target': 30000, 'adjustment': 'Increase or decrease lighting'},
-    'nivel_de_agua_cm': {'min': 20.0, 'max': 80.0, 'target': 50.0, 'adjustment': 'Add or remove water to maintain level'},
-}
-
-# Create a DataFrame to store the adjustments
-adjustments = []
-
-for index, row in data.iterrows():
-    for parameter, limits in parameter_ranges.items():
-        if row[parameter] < limits['min'] or row[parameter] > limits['max']:
-            adjustment = {
-                'marca_de_tiempo': row['marca_de_tiempo'],
-                'parameter': parameter,
-                'current_value': row[parameter],
-                'target_value': limits['target'],
-                'adjustment': limits['adjustment']
-            }
-            adjustments.append(adjustment)
-
-# Convert to DataFrame for export
-adjustments_df = pd.DataFrame(adjustments)
-
-# Save the adjustments to an Excel file with filtering and formatting
-output_path = './data/ajustes_sistema_acuaponico.xlsx'
-with pd.ExcelWriter(output_path, engine='xlsxwriter') as writer:
-    adjustments_df.to_excel(writer, sheet_name='Ajustes', index=False)
-    workbook = writer.book
-    worksheet = writer.sheets['Ajustes']
-    
-    # Apply autofilter to all columns
-    worksheet.autofilter(0, 0, adjustments_df.shape[0], adjustments_df.shape[1] - 1)
-    
-    # Add a logo (using a placeholder if logo is not specified)
-    worksheet.insert_image('F1', 'https://t3.ftcdn.net/jpg/02/77/90/42/360_F_277904250_ntgzV5Y9aagdBl75ssigmBZx9rXv7xal.jpg',
-                           {'x_scale': 0.3, 'y_scale': 0.3, 'x_offset': 15, 'y_offset': 10})
-    
-    # Set column widths for better readability
-    worksheet.set_column('A:A', 20)
-    worksheet.set_column('B:B', 25)
-    worksheet.set_column('C:D', 15)
-    worksheet.set_column('E:E', 30)
-
-output_path
+# Check the sensor export against the parameter ranges of the aquaponic system
+# and write every out-of-range reading, with its target and adjustment, to Excel
+import argparse
+import os
+
+from alarm_engine import detect_adjustments
+from alert_episodes import detect_episodes, detect_episodes_in_chunks
+from excel_export import write_frame
+from parameter_rules import DEFAULT_RULES_PATH, load_rules
+from sensor_schema import read_sensor_csv
+from streaming_report import EPISODE_WIDTHS, XlsxSink, checked_chunks, iter_sensor_chunks
+
+DEFAULT_CSV_PATH = 'datos_simulados_sistema_acuaponico.csv'
+DEFAULT_OUTPUT_DIR = 'data'
+ADJUSTMENTS_FILE = 'ajustes_sistema_acuaponico.xlsx'
+EPISODES_FILE = 'episodios_sistema_acuaponico.xlsx'
+
+# Inputs larger than this are streamed in chunks instead of loaded whole
+STREAMING_THRESHOLD_BYTES = 256 * 1024 * 1024
+
+
+def write_reports(file_path=DEFAULT_CSV_PATH, output_dir=DEFAULT_OUTPUT_DIR, parameter_ranges=None):
+    """Write the adjustments and episodes workbooks of one sensor CSV; returns their paths."""
+    # Limits, targets and adjustments come from the shared rule registry
+    # (parameter_rules.json), the same thresholds used by the decision table
+    parameter_ranges = load_rules() if parameter_ranges is None else parameter_ranges
+
+    os.makedirs(output_dir, exist_ok=True)
+    output_path = os.path.join(output_dir, ADJUSTMENTS_FILE)
+    episodes_path = os.path.join(output_dir, EPISODES_FILE)
+
+    if os.path.getsize(file_path) > STREAMING_THRESHOLD_BYTES:
+        # Large exports: one pass chunk by chunk with flat memory; each chunk is
+        # checked and its adjustments written on its way to the episode detector
+        with XlsxSink(output_path, text_timestamps=True) as sink:
+            chunks = iter_sensor_chunks(file_path, list(parameter_ranges))
+            episodes_df = detect_episodes_in_chunks(checked_chunks(chunks, parameter_ranges, sink), parameter_ranges)
+    else:
+        data = read_sensor_csv(file_path)
+
+        # Check every parameter against its range in one vectorized pass
+        adjustments_df = detect_adjustments(data, parameter_ranges)
+        episodes_df = detect_episodes(data, parameter_ranges)
+
+        # Save the adjustments to Excel: constant-memory writer, formats per column,
+        # autofilter, local logo and a new sheet every time the row limit is reached
+        with XlsxSink(output_path, text_timestamps=True) as sink:
+            sink.append(adjustments_df)
+
+    # Compact summary: one row per out-of-range episode (with hysteresis and a minimum
+    # duration) instead of one row per out-of-range sample
+    write_frame(episodes_path, episodes_df, sheet_name='Episodios', widths=EPISODE_WIDTHS)
+    return output_path, episodes_path
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Reporte de ajustes y episodios fuera de rango de los sensores")
+    parser.add_argument("--csv", default=DEFAULT_CSV_PATH, help="exportación CSV de los sensores")
+    parser.add_argument("--destino", default=DEFAULT_OUTPUT_DIR, help="carpeta de los reportes")
+    parser.add_argument("--reglas", default=DEFAULT_RULES_PATH, help="archivo de reglas de los parámetros")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    output_path, episodes_path = write_reports(args.csv, args.destino, load_rules(args.reglas))
+    print(f"Ajustes en {output_path}, episodios en {episodes_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,85 +1,49 @@
-from openpyxl import Workbook
-from openpyxl.styles import Font, Alignment, PatternFill, Border, Side
-from openpyxl.utils.dataframe import dataframe_to_rows
-from openpyxl.drawing.image import Image
-import pandas as pd
+# Decision table of the aquaponic system: the range of every parameter and the
+# action to take, written to Excel from the shared rule registry
+import argparse
+import os
 
-# Load the uploaded CSV file to check the data structure
-file_path = 'datos_simulados_sistema_acuaponico.csv'
-data = pd.read_csv(file_path)
+from excel_export import DEFAULT_LOGO_PATH, write_frame
+from parameter_rules import DEFAULT_RULES_PATH, load_rules
 
-# Display the first few rows to understand its structure
-data.head()
+DEFAULT_OUTPUT_PATH = os.path.join('data', 'decision_de_parametros_Sistema_Acuaponico.xlsx')
 
-# Define allowable ranges and recommendations for each parameter
-decisions_data = {
-    "Parametro": [
-        "Nivel de Oxígeno en Agua (mg/L)", "Nivel de pH", "Nivel de Nitratos (ppm)",
-        "Nivel de Nitritos (ppm)", "Temperatura del Agua (°C)", "Temperatura Ambiente (°C)",
-        "Humedad Ambiente (%)", "Cantidad de Alimento (g)", "Flujo de Agua (L/min)",
-        "Intensidad de Luz (lux)", "Nivel de Agua (cm)", "Estado del Filtro", "Consumo de Energía (kWh)"
-    ],
-    "Valor Minimo": [
-        5.0, 6.5, 10, 0.5, 18, 10, 40, 50, 5, 5000, 20, None, 1
-    ],
-    "Valor Maximo": [
-        8.0, 7.5, 50, 1.0, 28, 35, 70, 100, 10, 80000, 80, None, 10
-    ],
-    "Accion a Tomar": [
-        "Ajustar bomba de oxígeno", "Ajustar sistema de pH", "Revisar nivel de filtrado",
-        "Ajustar control de nitritos", "Ajustar temperatura", "Ajustar ventilación",
-        "Ajustar humedad", "Revisar nivel de alimentación", "Ajustar flujo de agua",
-        "Ajustar intensidad de luz", "Ajustar nivel de agua", "Cambiar filtro si está sucio",
-        "Revisar consumo de energía"
-    ]
-}
 
-# Create a new workbook and select active sheet
-wb = Workbook()
-ws = wb.active
-ws.title = "Parametros y Ajustes"
+def write_decision_table(output_path=DEFAULT_OUTPUT_PATH, rules=None):
+    """Write the decision workbook; returns its path."""
+    # Allowable ranges and recommendations for each parameter, from the shared rule registry
+    rules = load_rules() if rules is None else rules
 
-# Add a title
-ws.merge_cells("A1:D1")
-title_cell = ws["A1"]
-title_cell.value = "Parámetros del Sistema Acuapónico y Acciones"
-title_cell.font = Font(bold=True, size=14)
-title_cell.alignment = Alignment(horizontal="center")
+    # Decision table (parameter, limits, action) built from the rules
+    decisions_df = rules.decision_table()
 
-# Convert decisions data to a DataFrame and add to the sheet
-decisions_df = pd.DataFrame(decisions_data)
+    # Title merged over the table, blue header row and thin borders on the data cells:
+    # each style is one shared format applied to its range, not built cell by cell
+    thin_border = {'border': 1}
+    os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
+    write_frame(
+        output_path, decisions_df, sheet_name="Parametros y Ajustes",
+        title="Parámetros del Sistema Acuapónico y Acciones",
+        title_format={'bold': True, 'font_size': 14, 'align': 'center'},
+        header_format={'bold': True, 'font_color': '#FFFFFF', 'bg_color': '#4F81BD', 'align': 'center', **thin_border},
+        cell_format=thin_border,
+        # Logo only if the local file is there
+        logo_path=DEFAULT_LOGO_PATH, logo_cell="E1",
+    )
+    return output_path
 
-# Write headers with formatting
-headers = ["Parametro", "Valor Minimo", "Valor Maximo", "Accion a Tomar"]
-for col_num, header in enumerate(headers, 1):
-    cell = ws.cell(row=2, column=col_num, value=header)
-    cell.font = Font(bold=True, color="FFFFFF")
-    cell.fill = PatternFill(start_color="4F81BD", end_color="4F81BD", fill_type="solid")
-    cell.alignment = Alignment(horizontal="center")
-    cell.border = Border(left=Side(style='thin'), right=Side(style='thin'), top=Side(style='thin'), bottom=Side(style='thin'))
 
-# Write data rows
-for row in dataframe_to_rows(decisions_df, index=False, header=False):
-    ws.append(row)
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Tabla de decisión de los parámetros del sistema acuapónico")
+    parser.add_argument("--destino", default=DEFAULT_OUTPUT_PATH, help="archivo xlsx de salida")
+    parser.add_argument("--reglas", default=DEFAULT_RULES_PATH, help="archivo de reglas de los parámetros")
+    return parser.parse_args(argv)
 
-# Apply border to data cells
-for row in ws.iter_rows(min_row=3, max_row=ws.max_row, min_col=1, max_col=4):
-    for cell in row:
-        cell.border = Border(left=Side(style='thin'), right=Side(style='thin'), top=Side(style='thin'), bottom=Side(style='thin'))
 
-# Add autofilter to columns
-ws.auto_filter.ref = "A2:D" + str(ws.max_row)
+def main(argv=None):
+    args = parse_args(argv)
+    print(f"Tabla de decisión en {write_decision_table(args.destino, load_rules(args.reglas))}")
 
-# Add logo if available
-logo_path = 'logo.jpg'
-try:
-    logo = Image(logo_path)
-    ws.add_image(logo, "E1")
-except FileNotFoundError:
-    pass  # Skip if no logo is provided
 
-# Save the workbook
-output_path = "./data/decision_de_parametros_Sistema_Acuaponico.xlsx"
-wb.save(output_path)
-
-output_path
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,39 @@
+# Shared pieces of the chunked detectors (alert_episodes, sensor_anomalies): the
+# time and forward-fill helpers of their vectorized ``update_frame`` and the scan of
+# the Parquet sensor store one day partition at a time.
+import numpy as np
+import pandas as pd
+
+from sensor_schema import TANK_COLUMN
+
+# Readings of installations without tank ids are attributed to this tank
+DEFAULT_TANK = 1
+
+
+def to_ms(timestamps):
+    return np.asarray(timestamps, dtype='datetime64[ms]').astype(np.int64)
+
+
+def ffill(raw, initial):
+    """Forward-fill NaNs down each column, starting from the ``initial`` row."""
+    filled = np.vstack([initial[None, :], raw])
+    index = np.where(np.isnan(filled), 0, np.arange(len(filled))[:, None])
+    np.maximum.accumulate(index, axis=0, out=index)
+    return filled[index, np.arange(filled.shape[1])][1:]
+
+
+def history_chunks(root, columns, start=None, end=None):
+    """Frames of ``columns`` (plus the tank ids, if stored) for each day of the store in ``[start, end)``."""
+    from sensor_store import history_days, read_history
+
+    # Files may or may not store tank ids (the first one is no guide): the reads
+    # unify the schemas of the files they open, so ask for them always
+    columns = [*columns, TANK_COLUMN]
+    start = pd.Timestamp(start) if start is not None else None
+    end = pd.Timestamp(end) if end is not None else None
+    for day in history_days(root):
+        day_start, day_end = pd.Timestamp(day), pd.Timestamp(day) + pd.Timedelta(days=1)
+        if (start is not None and day_end <= start) or (end is not None and day_start >= end):
+            continue
+        yield read_history(root, columns, max(day_start, start) if start is not None else day_start,
+                           min(day_end, end) if end is not None else day_end)
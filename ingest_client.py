@@ -0,0 +1,129 @@
+# Clients of the ingestion server's binary protocol.
+# AsyncPublisher sends batches with a bounded number of unacknowledged packets in
+# flight, so a client slows down as soon as the server applies back-pressure.
+# IngestSubscriber runs in a background thread and hands every published batch
+# to a callback, e.g. to feed the dashboard's shared history.
+import asyncio
+import logging
+import socket
+import threading
+import time
+
+import ingest_protocol as proto
+
+log = logging.getLogger('ingest_client')
+
+
+class AsyncPublisher:
+    """PUBLISH sender with at most ``window`` packets waiting for their PUBACK."""
+
+    def __init__(self, host, port, window=8, topic=proto.DEFAULT_TOPIC):
+        self.host, self.port, self.topic = host, port, topic
+        self.window = window
+        self.accepted = 0
+        self.rejected = 0
+        # Seconds from sending each packet to its acknowledgement
+        self.latencies = []
+        self._sent_at = {}
+        self._slots = None
+        self._next_id = 0
+        self._writer = None
+        self._ack_task = None
+
+    async def connect(self):
+        reader, self._writer = await asyncio.open_connection(self.host, self.port, limit=1 << 20)
+        self._slots = asyncio.Semaphore(self.window)
+        self._ack_task = asyncio.create_task(self._read_acks(reader))
+        return self
+
+    async def _read_acks(self, reader):
+        while (packet := await proto.read_packet(reader)) is not None:
+            packet_type, body = packet
+            if packet_type != proto.PUBACK:
+                continue
+            packet_id, accepted, rejected = proto.decode_puback(body)
+            self.latencies.append(time.perf_counter() - self._sent_at.pop(packet_id))
+            self.accepted += accepted
+            self.rejected += rejected
+            self._slots.release()
+
+    async def publish(self, readings=None, batch=None):
+        """Send one batch (a readings frame or an already encoded ``batch``); waits for a free slot."""
+        await self._slots.acquire()
+        if self._ack_task.done():
+            self._ack_task.result()
+            raise ConnectionError("server closed the connection")
+        packet_id = self._next_id
+        self._next_id = (self._next_id + 1) % 65536
+        self._sent_at[packet_id] = time.perf_counter()
+        self._writer.write(proto.encode_publish(readings, packet_id, self.topic, batch))
+        await self._writer.drain()
+
+    async def close(self):
+        """Wait for every outstanding acknowledgement, then disconnect."""
+        for _ in range(self.window):
+            await self._slots.acquire()
+        self._writer.write(proto.encode_packet(proto.DISCONNECT))
+        await self._writer.drain()
+        self._writer.close()
+        self._ack_task.cancel()
+
+
+class IngestSubscriber:
+    """Background thread calling ``on_batch(readings)`` for every batch matching ``topic``.
+
+    Reconnects with a growing delay whenever the server is unreachable.
+    """
+
+    def __init__(self, host, port, on_batch, topic='#', max_retry_s=30.0):
+        self.host, self.port, self.topic = host, port, topic
+        self.on_batch = on_batch
+        self.max_retry_s = max_retry_s
+        self.connected = False
+        self._stop = threading.Event()
+        self._socket = None
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="ingest-subscriber", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._socket is not None:
+            try:
+                # Wakes up the blocked read; close() alone does not
+                self._socket.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        delay = 0.5
+        while not self._stop.is_set():
+            try:
+                self._listen()
+                delay = 0.5
+            except (OSError, proto.ProtocolError) as exc:
+                log.info("subscription to %s:%s lost: %s", self.host, self.port, exc)
+            self.connected = False
+            self._stop.wait(delay)
+            delay = min(delay * 2, self.max_retry_s)
+
+    def _listen(self):
+        with socket.create_connection((self.host, self.port), timeout=5) as sock:
+            self._socket = sock
+            sock.settimeout(None)
+            sock.sendall(proto.encode_subscribe(topic=self.topic))
+            stream = sock.makefile('rb')
+            self.connected = True
+            while (packet := proto.read_packet_sync(stream)) is not None:
+                packet_type, body = packet
+                if packet_type == proto.PUBLISH:
+                    _, _, offset = proto.decode_publish(body)
+                    readings, _ = proto.decode_batch(body, offset)
+                    self.on_batch(readings)
@@ -0,0 +1,166 @@
+# Generador de carga para el servidor de ingesta.
+# Abre varias conexiones y envía lotes simulados lo más rápido que el servidor los
+# confirma: cada conexión mantiene como máximo --ventana lotes sin confirmar, así
+# que el ritmo medido es el que el servidor sostiene con su contrapresión.
+#
+#   python ingest_server.py --sin-historial &
+#   python ingest_loadgen.py --protocolo mqtt --lecturas 5000000
+import argparse
+import asyncio
+import time
+
+import numpy as np
+
+import ingest_protocol as proto
+from ingest_client import AsyncPublisher
+from ingest_server import DEFAULT_PORT
+from simulation_iot import generate_chunk
+
+# Lotes distintos codificados de antemano; el generador solo los reenvía
+DISTINCT_BATCHES = 16
+
+
+class _PipelinedClient:
+    """Cliente de texto con hasta ``window`` peticiones en vuelo (JSON por líneas o HTTP)."""
+
+    def __init__(self, host, port, window=8):
+        self.host, self.port, self.window = host, port, window
+        self.accepted = 0
+        self.rejected = 0
+        self.latencies = []
+        self._sent_at = []
+        self._slots = None
+        self._writer = None
+        self._reply_task = None
+
+    async def connect(self):
+        reader, self._writer = await asyncio.open_connection(self.host, self.port, limit=1 << 20)
+        self._slots = asyncio.Semaphore(self.window)
+        self._reply_task = asyncio.create_task(self._read_replies(reader))
+        return self
+
+    async def _read_replies(self, reader):
+        while (reply := await self.read_reply(reader)) is not None:
+            # Las respuestas llegan en el orden de las peticiones
+            self.latencies.append(time.perf_counter() - self._sent_at.pop(0))
+            self.accepted += reply.get('aceptadas', 0)
+            self.rejected += reply.get('rechazadas', 0)
+            self._slots.release()
+
+    async def publish(self, batch):
+        await self._slots.acquire()
+        if self._reply_task.done():
+            self._reply_task.result()
+            raise ConnectionError("el servidor cerró la conexión")
+        self._sent_at.append(time.perf_counter())
+        self._writer.write(batch)
+        await self._writer.drain()
+
+    async def close(self):
+        for _ in range(self.window):
+            await self._slots.acquire()
+        self._writer.close()
+        self._reply_task.cancel()
+
+
+class JsonLinesClient(_PipelinedClient):
+    @staticmethod
+    def encode(readings):
+        return proto.encode_json(readings) + b'\n'
+
+    async def read_reply(self, reader):
+        line = await reader.readline()
+        return proto.loads(line) if line else None
+
+
+class HttpClient(_PipelinedClient):
+    def encode(self, readings):
+        body = proto.encode_json(readings)
+        head = (f"POST /lecturas HTTP/1.1\r\nHost: {self.host}\r\nContent-Type: application/json\r\n"
+                f"Content-Length: {len(body)}\r\n\r\n")
+        return head.encode('latin-1') + body
+
+    async def read_reply(self, reader):
+        if not await reader.readline():
+            return None
+        length = 0
+        while (line := await reader.readline()) not in (b'\r\n', b''):
+            name, _, value = line.decode('latin-1').partition(':')
+            if name.lower() == 'content-length':
+                length = int(value)
+        return proto.loads(await reader.readexactly(length))
+
+
+class MqttClient(AsyncPublisher):
+    @staticmethod
+    def encode(readings):
+        return proto.encode_batch(readings)
+
+    async def publish(self, batch):
+        await super().publish(batch=batch)
+
+
+CLIENTS = {"mqtt": MqttClient, "json": JsonLinesClient, "http": HttpClient}
+
+
+def make_batches(batch_rows, num_tanks, seed=0):
+    """Lotes simulados consecutivos en el tiempo (uno por cada DISTINCT_BATCHES)."""
+    rng = np.random.default_rng(seed)
+    start = np.datetime64("now", "s")
+    return [generate_chunk(rng, i * batch_rows, batch_rows, start, num_tanks, 1)
+            for i in range(DISTINCT_BATCHES)]
+
+
+async def run_load(host="127.0.0.1", port=DEFAULT_PORT, protocol="mqtt", readings=1_000_000,
+                   connections=4, batch_rows=1_000, window=8, num_tanks=10):
+    """Envía ``readings`` lecturas y devuelve el resumen de la prueba."""
+    clients = [await CLIENTS[protocol](host, port, window=window).connect() for _ in range(connections)]
+    payloads = [clients[0].encode(batch) for batch in make_batches(batch_rows, num_tanks)]
+    num_batches = -(-readings // batch_rows)
+
+    async def drive(client, index):
+        for i in range(index, num_batches, connections):
+            await client.publish(payloads[i % len(payloads)])
+        await client.close()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(drive(client, i) for i, client in enumerate(clients)))
+    elapsed = time.perf_counter() - start
+
+    latencies = np.concatenate([client.latencies for client in clients]) * 1e3
+    accepted = sum(client.accepted for client in clients)
+    return {
+        "protocolo": protocol,
+        "lecturas": accepted,
+        "rechazadas": sum(client.rejected for client in clients),
+        "segundos": elapsed,
+        "lecturas_por_s": accepted / elapsed,
+        "latencia_p50_ms": float(np.percentile(latencies, 50)),
+        "latencia_p99_ms": float(np.percentile(latencies, 99)),
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Generador de carga para el servidor de ingesta")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--puerto", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--protocolo", choices=sorted(CLIENTS), default="mqtt")
+    parser.add_argument("--lecturas", type=int, default=1_000_000, help="lecturas a enviar en total")
+    parser.add_argument("--conexiones", type=int, default=4)
+    parser.add_argument("--lote", type=int, default=1_000, help="lecturas por lote")
+    parser.add_argument("--ventana", type=int, default=8, help="lotes sin confirmar por conexión")
+    parser.add_argument("--tanques", type=int, default=10)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    result = asyncio.run(run_load(args.host, args.puerto, args.protocolo, args.lecturas,
+                                  args.conexiones, args.lote, args.ventana, args.tanques))
+    print(f"{result['lecturas']:,} lecturas ({result['rechazadas']:,} rechazadas) en {result['segundos']:.2f} s: "
+          f"{result['lecturas_por_s']:,.0f} lecturas/s, latencia p50 {result['latencia_p50_ms']:.1f} ms, "
+          f"p99 {result['latencia_p99_ms']:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
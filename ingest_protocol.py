@@ -0,0 +1,332 @@
+# Wire formats and validation for sensor readings sent to the ingestion server.
+#
+# Readings travel in batches, in one of two encodings:
+#   - JSON: one object per reading, a list of them, or a columnar object
+#     ({"marca_de_tiempo": [...], "nivel_de_ph": [...], ...}). Used one batch per
+#     line over a plain socket and as the body of ``POST /lecturas`` over HTTP.
+#   - Binary, MQTT-like packets: a fixed header byte (packet type << 4) and the
+#     MQTT variable-length remaining size, then the body, little-endian:
+#       PUBLISH    u16 topic length, topic, u16 packet id, batch
+#       PUBACK     u16 packet id, u32 accepted, u32 rejected
+#       SUBSCRIBE  u16 packet id, u16 topic length, topic filter
+#       SUBACK     u16 packet id
+#       CONNECT / CONNACK, PINGREQ / PINGRESP, DISCONNECT  accepted for compatibility
+#     A batch is columnar: u32 row count, u8 flags (bit 0: tank ids present),
+#     int64 epoch-milliseconds timestamps, [int32 tank ids], one float64 array per
+#     NUMERIC_FIELDS entry and one uint8 array of FILTER_STATES codes, so decoding
+#     is a handful of zero-copy ``np.frombuffer`` calls.
+import json
+import struct
+
+import numpy as np
+import pandas as pd
+
+from sensor_schema import VALID_LIMITS
+from simulation_iot import FILTER_STATES, SENSOR_RANGES
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+TIMESTAMP_FIELD = 'marca_de_tiempo'
+TANK_FIELD = 'id_tanque'
+FILTER_FIELD = 'estado_filtro'
+NUMERIC_FIELDS = [*SENSOR_RANGES, 'consumo_energia_kWh']
+# The 13 sensor fields every reading must carry, besides its timestamp
+SENSOR_FIELDS = [*SENSOR_RANGES, FILTER_FIELD, 'consumo_energia_kWh']
+
+# Filter states as sent by the simulator and by the bundled CSV export
+FILTER_CODES = {**{state: code for code, state in enumerate(FILTER_STATES)},
+                'Clean': 0, 'Needs Cleaning': 1}
+
+DEFAULT_TOPIC = 'acuaponia/lecturas'
+
+CONNECT, CONNACK, PUBLISH, PUBACK, SUBSCRIBE, SUBACK, PINGREQ, PINGRESP, DISCONNECT = 1, 2, 3, 4, 8, 9, 12, 13, 14
+
+MAX_PACKET_BYTES = 64 * 1024 * 1024
+HAS_TANKS = 0x01
+
+_U16 = struct.Struct('<H')
+_PUBACK = struct.Struct('<HII')
+_BATCH_HEADER = struct.Struct('<IB')
+
+
+class ProtocolError(ValueError):
+    """Malformed packet or batch; the connection that sent it is closed."""
+
+
+def empty_batch():
+    """Validated batch with no rows, with the same columns and dtypes as any other."""
+    frame = pd.DataFrame({TIMESTAMP_FIELD: np.empty(0, dtype='datetime64[ms]')})
+    for field in NUMERIC_FIELDS:
+        frame[field] = np.empty(0)
+    frame[FILTER_FIELD] = pd.Categorical.from_codes(np.empty(0, dtype=np.int8), FILTER_STATES)
+    return frame
+
+
+def _numeric(values):
+    """float64 array of ``values``; anything non-numeric becomes NaN."""
+    if isinstance(values, np.ndarray) and values.dtype.kind in 'iuf':
+        return values.astype(np.float64, copy=False)
+    return pd.to_numeric(pd.Series(values), errors='coerce').to_numpy(dtype=np.float64, na_value=np.nan)
+
+
+def _timestamps(values):
+    if isinstance(values, np.ndarray) and values.dtype.kind == 'i':
+        # Epoch milliseconds, as sent by the binary protocol
+        return values.astype('<i8', copy=False).view('datetime64[ms]')
+    values = pd.Series(values)
+    if pd.api.types.is_numeric_dtype(values):
+        parsed = pd.to_datetime(values, unit='ms', errors='coerce')
+    else:
+        parsed = pd.to_datetime(values, errors='coerce', format='ISO8601')
+    return parsed.to_numpy().astype('datetime64[ms]')
+
+
+def validate_readings(columns):
+    """Typed frame of the valid readings in ``columns`` and the number of rejected ones.
+
+    ``columns`` is a DataFrame or a mapping of field name to values. Raises
+    ``ProtocolError`` when a required field is missing altogether; rows with an
+    unparseable timestamp, a non-numeric, non-finite or physically impossible value
+    or an unknown filter state are dropped and counted.
+    """
+    missing = [field for field in [TIMESTAMP_FIELD, *SENSOR_FIELDS] if field not in columns]
+    if missing:
+        raise ProtocolError(f"missing fields: {', '.join(missing)}")
+
+    timestamps = _timestamps(columns[TIMESTAMP_FIELD])
+    valid = ~np.isnat(timestamps)
+    data = {TIMESTAMP_FIELD: timestamps}
+    if TANK_FIELD in columns:
+        tanks = _numeric(columns[TANK_FIELD])
+        valid &= (tanks >= 0) & (tanks < 2 ** 31)
+        data[TANK_FIELD] = np.nan_to_num(tanks).astype(np.int32)
+    for field in NUMERIC_FIELDS:
+        values = _numeric(columns[field])
+        low, high = VALID_LIMITS[field]
+        # NaN fails both comparisons, so missing and non-numeric values are rejected too
+        valid &= (values >= low) & (values <= high)
+        data[field] = values
+
+    states = columns[FILTER_FIELD]
+    if isinstance(states, np.ndarray) and states.dtype.kind in 'iu':
+        codes = states
+    else:
+        states = pd.Series(states)
+        codes = (states.map(FILTER_CODES) if not pd.api.types.is_numeric_dtype(states) else states)
+        codes = codes.to_numpy(dtype=np.float64, na_value=np.nan)
+    valid &= (codes == 0) | (codes == 1)
+    data[FILTER_FIELD] = pd.Categorical.from_codes(np.where(valid, codes, 0).astype(np.int8), FILTER_STATES,
+                                                   validate=False)
+
+    readings = pd.DataFrame(data, copy=False)
+    if not valid.all():
+        readings = readings[valid].reset_index(drop=True)
+    return readings, int(len(valid) - valid.sum())
+
+
+def loads(payload):
+    if orjson is not None:
+        return orjson.loads(payload)
+    return json.loads(payload)
+
+
+def dumps(obj):
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj).encode()
+
+
+def decode_json(payload):
+    """Validated batch from a JSON document: one reading, a list of them or columns."""
+    try:
+        document = loads(payload)
+    except ValueError as exc:
+        raise ProtocolError(f"invalid JSON: {exc}") from None
+    if isinstance(document, dict) and document and all(isinstance(value, list) for value in document.values()):
+        lengths = {len(value) for value in document.values()}
+        if len(lengths) > 1:
+            raise ProtocolError("columns of different lengths")
+        if lengths == {0}:
+            return empty_batch(), 0
+        return validate_readings({field: np.asarray(values) if field != FILTER_FIELD else values
+                                  for field, values in document.items()})
+    if isinstance(document, dict):
+        document = [document]
+    if not isinstance(document, list) or not all(isinstance(item, dict) for item in document):
+        raise ProtocolError("expected a reading, a list of readings or a columnar object")
+    if not document:
+        return empty_batch(), 0
+    return validate_readings(pd.DataFrame(document))
+
+
+def encode_json(readings):
+    """Columnar JSON document for a readings frame (timestamps as epoch milliseconds)."""
+    document = {TIMESTAMP_FIELD: readings[TIMESTAMP_FIELD].to_numpy().astype('datetime64[ms]').astype(np.int64).tolist()}
+    if TANK_FIELD in readings.columns:
+        document[TANK_FIELD] = readings[TANK_FIELD].tolist()
+    for field in NUMERIC_FIELDS:
+        document[field] = readings[field].tolist()
+    document[FILTER_FIELD] = [FILTER_STATES[FILTER_CODES[state]] for state in readings[FILTER_FIELD]]
+    return dumps(document)
+
+
+def encode_batch(readings):
+    """Binary batch for a readings frame with the columns of the sensor CSV."""
+    n = len(readings)
+    has_tanks = TANK_FIELD in readings.columns
+    parts = [_BATCH_HEADER.pack(n, HAS_TANKS if has_tanks else 0),
+             readings[TIMESTAMP_FIELD].to_numpy().astype('datetime64[ms]').astype('<i8').tobytes()]
+    if has_tanks:
+        parts.append(readings[TANK_FIELD].to_numpy().astype('<i4').tobytes())
+    for field in NUMERIC_FIELDS:
+        parts.append(readings[field].to_numpy().astype('<f8').tobytes())
+    states = readings[FILTER_FIELD]
+    if isinstance(states.dtype, pd.CategoricalDtype):
+        codes = states.cat.categories.map(FILTER_CODES).to_numpy()[states.cat.codes.to_numpy()]
+    else:
+        codes = states.map(FILTER_CODES).to_numpy()
+    parts.append(codes.astype(np.uint8).tobytes())
+    return b''.join(parts)
+
+
+def decode_batch(payload, offset=0):
+    """Validated batch from its binary encoding."""
+    if len(payload) - offset < _BATCH_HEADER.size:
+        raise ProtocolError("truncated batch header")
+    n, flags = _BATCH_HEADER.unpack_from(payload, offset)
+    offset += _BATCH_HEADER.size
+    expected = n * (8 + 4 * bool(flags & HAS_TANKS) + 8 * len(NUMERIC_FIELDS) + 1)
+    if len(payload) - offset != expected:
+        raise ProtocolError(f"batch of {n} rows needs {expected} bytes, got {len(payload) - offset}")
+
+    def column(dtype):
+        nonlocal offset
+        values = np.frombuffer(payload, dtype=dtype, count=n, offset=offset)
+        offset += values.nbytes
+        return values
+
+    frame = {TIMESTAMP_FIELD: column('<i8')}
+    if flags & HAS_TANKS:
+        frame[TANK_FIELD] = column('<i4')
+    for field in NUMERIC_FIELDS:
+        frame[field] = column('<f8')
+    frame[FILTER_FIELD] = column(np.uint8)
+    return validate_readings(frame)
+
+
+def encode_varint(value):
+    out = bytearray()
+    while True:
+        byte, value = value & 0x7F, value >> 7
+        out.append(byte | (0x80 if value else 0))
+        if not value:
+            return bytes(out)
+
+
+def encode_packet(packet_type, body=b''):
+    return bytes([packet_type << 4]) + encode_varint(len(body)) + body
+
+
+def _add_length_byte(length, shift, byte):
+    length |= (byte & 0x7F) << shift
+    if byte & 0x80 and shift >= 21:
+        raise ProtocolError("remaining length longer than 4 bytes")
+    if length > MAX_PACKET_BYTES:
+        raise ProtocolError(f"packet of {length} bytes exceeds the limit")
+    return length, not byte & 0x80
+
+
+async def read_packet(reader, first_byte=None):
+    """``(packet_type, body)`` of the next packet from an asyncio stream, ``None`` at its end."""
+    if first_byte is None:
+        first_byte = await reader.read(1)
+        if not first_byte:
+            return None
+    length, shift, done = 0, 0, False
+    while not done:
+        length, done = _add_length_byte(length, shift, (await reader.readexactly(1))[0])
+        shift += 7
+    return first_byte[0] >> 4, await reader.readexactly(length)
+
+
+def read_packet_sync(stream):
+    """Blocking ``read_packet`` for a binary file object such as ``socket.makefile('rb')``."""
+    first_byte = stream.read(1)
+    if not first_byte:
+        return None
+    length, shift, done = 0, 0, False
+    while not done:
+        byte = stream.read(1)
+        if not byte:
+            raise ProtocolError("connection closed inside a packet header")
+        length, done = _add_length_byte(length, shift, byte[0])
+        shift += 7
+    body = stream.read(length)
+    if len(body) != length:
+        raise ProtocolError("connection closed inside a packet")
+    return first_byte[0] >> 4, body
+
+
+def encode_topic(topic):
+    encoded = topic.encode()
+    return _U16.pack(len(encoded)) + encoded
+
+
+def decode_topic(body, offset=0):
+    (length,) = _U16.unpack_from(body, offset)
+    offset += _U16.size
+    return body[offset:offset + length].decode(), offset + length
+
+
+def encode_publish(readings, packet_id=0, topic=DEFAULT_TOPIC, batch=None):
+    """PUBLISH packet; pass ``batch`` to reuse an already encoded batch."""
+    if batch is None:
+        batch = encode_batch(readings)
+    return encode_packet(PUBLISH, encode_topic(topic) + _U16.pack(packet_id) + batch)
+
+
+def decode_publish(body):
+    """``(topic, packet_id, batch offset)`` of a PUBLISH body."""
+    try:
+        topic, offset = decode_topic(body)
+        (packet_id,) = _U16.unpack_from(body, offset)
+    except (struct.error, UnicodeDecodeError) as exc:
+        raise ProtocolError(f"malformed PUBLISH: {exc}") from None
+    return topic, packet_id, offset + _U16.size
+
+
+def encode_puback(packet_id, accepted, rejected):
+    return encode_packet(PUBACK, _PUBACK.pack(packet_id, accepted, rejected))
+
+
+def decode_puback(body):
+    """``(packet_id, accepted, rejected)``."""
+    return _PUBACK.unpack(body)
+
+
+def encode_subscribe(packet_id=1, topic='#'):
+    return encode_packet(SUBSCRIBE, _U16.pack(packet_id) + encode_topic(topic))
+
+
+def decode_subscribe(body):
+    """``(packet_id, topic filter)``."""
+    try:
+        (packet_id,) = _U16.unpack_from(body)
+        topic, _ = decode_topic(body, _U16.size)
+    except (struct.error, UnicodeDecodeError) as exc:
+        raise ProtocolError(f"malformed SUBSCRIBE: {exc}") from None
+    return packet_id, topic
+
+
+def topic_matches(topic_filter, topic):
+    """MQTT-style filter match: ``+`` is one level, a trailing ``#`` any number of them."""
+    filter_levels, levels = topic_filter.split('/'), topic.split('/')
+    for i, level in enumerate(filter_levels):
+        if level == '#':
+            return True
+        if i >= len(levels) or (level != '+' and level != levels[i]):
+            return False
+    return len(filter_levels) == len(levels)
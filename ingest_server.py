@@ -0,0 +1,410 @@
+# Asyncio ingestion server for real sensor readings.
+# One TCP port speaks every registered protocol; the first byte of a connection
+# picks the handler (JSON lines, HTTP or the binary MQTT-like packets described in
+# ingest_protocol). Every accepted batch is validated, published to subscribers
+# and queued for storage; a single writer task groups queued batches into large
+# Parquet appends. The queue is bounded: when storage falls behind, handlers stop
+# reading their sockets until there is room again, so back-pressure reaches the
+# clients through their acknowledgements and TCP flow control instead of growing
+# memory without limit. A group the sink fails to store stays pending and is
+# retried with backoff; meanwhile the queue fills and clients stop getting
+# acknowledgements, so nothing acknowledged is lost unless the server shuts down
+# while storage is still failing. Stored readings are also folded into the rollup
+# tiers (sensor_rollups) so history charts never have to read the raw points.
+import argparse
+import asyncio
+import logging
+import os
+import time
+import uuid
+from functools import partial
+
+import numpy as np
+import pandas as pd
+
+import ingest_protocol as proto
+from sensor_rollups import RollupStore
+from sensor_store import write_history
+
+log = logging.getLogger('ingest_server')
+
+DEFAULT_PORT = 1884
+# Queued batches before handlers block; the memory bound is this times the batch size
+MAX_PENDING_BATCHES = 64
+FLUSH_ROWS = 250_000
+FLUSH_INTERVAL_S = 2.0
+# Wait before retrying a failed write; doubles on every failure up to the maximum
+RETRY_DELAY_S = 1.0
+MAX_RETRY_DELAY_S = 30.0
+# Largest HTTP request body accepted
+MAX_HTTP_BODY_BYTES = proto.MAX_PACKET_BYTES
+# Publications buffered per subscriber; slow subscribers lose the oldest ones
+SUBSCRIBER_BUFFER = 256
+STREAM_LIMIT = 16 * 1024 * 1024
+
+HTTP_REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed', 413: 'Payload Too Large'}
+
+# (detect(first_byte) -> bool, async handler(server, first_byte, reader, writer))
+PROTOCOLS = []
+
+
+def register_protocol(detect, handler):
+    """Add a wire protocol; the first handler whose ``detect`` accepts the first byte wins."""
+    PROTOCOLS.append((detect, handler))
+
+
+class Subscriber:
+    """Binary-protocol client receiving PUBLISH packets for its topic filters."""
+
+    def __init__(self, writer):
+        self.writer = writer
+        self.filters = []
+        self.queue = asyncio.Queue(SUBSCRIBER_BUFFER)
+        self.dropped = 0
+
+    def offer(self, packet):
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(packet)
+
+    async def run(self):
+        while True:
+            packet = await self.queue.get()
+            self.writer.write(packet)
+            await self.writer.drain()
+
+
+class IngestServer:
+    """Validates incoming batches, publishes them and stores them in batches."""
+
+    def __init__(self, sink=None, max_pending_batches=MAX_PENDING_BATCHES,
+                 flush_rows=FLUSH_ROWS, flush_interval_s=FLUSH_INTERVAL_S):
+        # ``sink(frame, name)`` stores a group of readings; it runs in a worker thread.
+        # ``name`` is the same on every retry of a group, so a sink can replace what
+        # a failed attempt wrote instead of storing it twice
+        self.sink = sink
+        self.flush_rows = flush_rows
+        self.flush_interval_s = flush_interval_s
+        self.max_pending_batches = max_pending_batches
+        self.queue = None
+        self.subscribers = set()
+        self.listeners = []
+        self.stats = dict.fromkeys(['connections', 'batches', 'received', 'accepted', 'rejected',
+                                    'written', 'flushes', 'write_errors', 'lost', 'dropped_publications'], 0)
+        self.started = time.monotonic()
+        self._server = None
+        self._writer_task = None
+        self._closing = None
+
+    def add_listener(self, callback):
+        """Call ``callback(topic, readings)`` in the event loop for every accepted batch."""
+        self.listeners.append(callback)
+
+    async def start(self, host='127.0.0.1', port=DEFAULT_PORT):
+        self.queue = asyncio.Queue(self.max_pending_batches)
+        self._closing = asyncio.Event()
+        self._writer_task = asyncio.create_task(self._write_loop())
+        self._server = await asyncio.start_server(self._handle_connection, host, port, limit=STREAM_LIMIT)
+        return self._server
+
+    @property
+    def port(self):
+        return self._server.sockets[0].getsockname()[1]
+
+    async def close(self):
+        """Stop accepting connections and flush everything already queued."""
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        if self._writer_task is not None:
+            # A writer retrying a failed group gives up on it instead of waiting for storage
+            self._closing.set()
+            await self.queue.put(None)
+            await self._writer_task
+            self._writer_task = None
+
+    def snapshot_stats(self):
+        elapsed = time.monotonic() - self.started
+        return {**self.stats, 'pending_batches': self.queue.qsize() if self.queue else 0,
+                'subscribers': len(self.subscribers), 'uptime_s': round(elapsed, 1)}
+
+    async def submit(self, readings, rejected, topic=proto.DEFAULT_TOPIC):
+        """Count, publish and queue one validated batch; waits while the queue is full."""
+        stats = self.stats
+        stats['batches'] += 1
+        stats['received'] += len(readings) + rejected
+        stats['accepted'] += len(readings)
+        stats['rejected'] += rejected
+        if not len(readings):
+            return
+        for callback in self.listeners:
+            callback(topic, readings)
+        self._publish(topic, readings)
+        await self.queue.put(readings)
+
+    def _publish(self, topic, readings):
+        targets = [s for s in self.subscribers if any(proto.topic_matches(f, topic) for f in s.filters)]
+        if not targets:
+            return
+        packet = proto.encode_publish(readings, topic=topic)
+        for subscriber in targets:
+            subscriber.offer(packet)
+
+    async def _handle_connection(self, reader, writer):
+        self.stats['connections'] += 1
+        try:
+            first_byte = await reader.read(1)
+            if not first_byte:
+                return
+            for detect, handler in PROTOCOLS:
+                if detect(first_byte[0]):
+                    await handler(self, first_byte, reader, writer)
+                    break
+            else:
+                log.warning("unknown protocol (first byte 0x%02x)", first_byte[0])
+        except (proto.ProtocolError, asyncio.IncompleteReadError, asyncio.LimitOverrunError) as exc:
+            log.warning("closing connection: %s", exc)
+
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def _write_loop(self):
+        loop = asyncio.get_running_loop()
+        pending, rows, deadline = [], 0, None
+        while True:
+            timeout = None if not pending else max(0.0, deadline - loop.time())
+            try:
+                batch = await asyncio.wait_for(self.queue.get(), timeout)
+            except asyncio.TimeoutError:
+                batch = False
+            if batch is None:
+                break
+            if batch is not False:
+                if not pending:
+                    deadline = loop.time() + self.flush_interval_s
+                pending.append(batch)
+                rows += len(batch)
+            if pending and (rows >= self.flush_rows or loop.time() >= deadline):
+                await self._flush(pending)
+                pending, rows = [], 0
+        if pending:
+            await self._flush(pending)
+
+    async def _flush(self, batches):
+        """Store one group of batches, retrying until the sink takes it or the server closes."""
+        if any(proto.TANK_FIELD in batch.columns for batch in batches):
+            # Readings without a tank id come from single-tank installations
+            batches = [batch if proto.TANK_FIELD in batch.columns else batch.assign(id_tanque=np.int32(1))
+                       for batch in batches]
+        frame = pd.concat(batches, ignore_index=True) if len(batches) > 1 else batches[0]
+        name = uuid.uuid4().hex
+        delay = RETRY_DELAY_S
+        while self.sink is not None:
+            try:
+                await asyncio.to_thread(self.sink, frame, name)
+                break
+            except Exception:
+                self.stats['write_errors'] += 1
+                log.exception("could not store %d readings", len(frame))
+            if self._closing.is_set():
+                self.stats['lost'] += len(frame)
+                log.error("closing: %d readings were not stored", len(frame))
+                return
+            # The queue is not drained while waiting, so clients are held back meanwhile
+            try:
+                await asyncio.wait_for(self._closing.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+            delay = min(delay * 2, MAX_RETRY_DELAY_S)
+        self.stats['written'] += len(frame)
+        self.stats['flushes'] += 1
+
+
+async def _read_line(reader):
+    try:
+        return await reader.readline()
+    except ValueError:
+        # readline() drops a line longer than the stream limit and raises ValueError
+        raise proto.ProtocolError(f"line longer than {STREAM_LIMIT} bytes") from None
+
+
+async def handle_json_lines(server, first_byte, reader, writer):
+    """One JSON batch per line, answered with one JSON line of counts."""
+    try:
+        line = first_byte + await _read_line(reader)
+        while line:
+            try:
+                readings, rejected = proto.decode_json(line)
+            except proto.ProtocolError as exc:
+                writer.write(proto.dumps({'error': str(exc)}) + b'\n')
+            else:
+                await server.submit(readings, rejected)
+                writer.write(proto.dumps({'aceptadas': len(readings), 'rechazadas': rejected}) + b'\n')
+            await writer.drain()
+            line = await _read_line(reader)
+    except proto.ProtocolError as exc:
+        # A line over the limit: answer it like any other rejection, then close
+        writer.write(proto.dumps({'error': str(exc)}) + b'\n')
+        await writer.drain()
+        raise
+
+
+async def handle_http(server, first_byte, reader, writer):
+    """Minimal HTTP/1.1: ``POST /lecturas`` with a JSON batch, ``GET /estado`` for counters."""
+    request_line = first_byte + await _read_line(reader)
+    while request_line.strip():
+        try:
+            method, path, version = request_line.decode('latin-1').split()
+        except ValueError:
+            raise proto.ProtocolError("malformed HTTP request line") from None
+        headers = {}
+        while (line := await _read_line(reader)) not in (b'\r\n', b'\n', b''):
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+        try:
+            length = int(headers.get('content-length', 0))
+        except ValueError:
+            length = -1
+        if length < 0:
+            await _http_response(writer, 400, {'error': 'invalid Content-Length'}, close=True)
+            return
+        if length > MAX_HTTP_BODY_BYTES:
+            await _http_response(writer, 413, {'error': 'body too large'}, close=True)
+            return
+        body = await reader.readexactly(length) if length else b''
+
+        if path == '/lecturas' and method == 'POST':
+            try:
+                readings, rejected = proto.decode_json(body)
+            except proto.ProtocolError as exc:
+                status, payload = 400, {'error': str(exc)}
+            else:
+                await server.submit(readings, rejected)
+                status, payload = 200, {'aceptadas': len(readings), 'rechazadas': rejected}
+        elif path == '/estado' and method == 'GET':
+            status, payload = 200, server.snapshot_stats()
+        elif path in ('/lecturas', '/estado'):
+            status, payload = 405, {'error': f'{method} not allowed'}
+        else:
+            status, payload = 404, {'error': f'{path} not found'}
+
+        close = headers.get('connection', '').lower() == 'close' or version == 'HTTP/1.0'
+        await _http_response(writer, status, payload, close)
+        if close:
+            return
+        request_line = await _read_line(reader)
+
+
+async def _http_response(writer, status, payload, close=False):
+    body = proto.dumps(payload)
+    head = (f"HTTP/1.1 {status} {HTTP_REASONS[status]}\r\nContent-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\nConnection: {'close' if close else 'keep-alive'}\r\n\r\n")
+    writer.write(head.encode('latin-1') + body)
+    await writer.drain()
+
+
+async def handle_packets(server, first_byte, reader, writer):
+    """Binary MQTT-like session: PUBLISH batches (acknowledged with counts) and SUBSCRIBE."""
+    subscriber, subscriber_task = None, None
+    try:
+        packet = await proto.read_packet(reader, first_byte)
+        while packet is not None:
+            packet_type, body = packet
+            if packet_type == proto.PUBLISH:
+                topic, packet_id, offset = proto.decode_publish(body)
+                readings, rejected = proto.decode_batch(body, offset)
+                await server.submit(readings, rejected, topic)
+                writer.write(proto.encode_puback(packet_id, len(readings), rejected))
+            elif packet_type == proto.SUBSCRIBE:
+                packet_id, topic_filter = proto.decode_subscribe(body)
+                if subscriber is None:
+                    subscriber = Subscriber(writer)
+                    server.subscribers.add(subscriber)
+                    subscriber_task = asyncio.create_task(subscriber.run())
+                subscriber.filters.append(topic_filter)
+                writer.write(proto.encode_packet(proto.SUBACK, packet_id.to_bytes(2, 'little')))
+            elif packet_type == proto.CONNECT:
+                writer.write(proto.encode_packet(proto.CONNACK, b'\x00\x00'))
+            elif packet_type == proto.PINGREQ:
+                writer.write(proto.encode_packet(proto.PINGRESP))
+            elif packet_type == proto.DISCONNECT:
+                break
+            else:
+                raise proto.ProtocolError(f"unexpected packet type {packet_type}")
+            await writer.drain()
+            packet = await proto.read_packet(reader)
+    finally:
+        if subscriber is not None:
+            server.subscribers.discard(subscriber)
+            server.stats['dropped_publications'] += subscriber.dropped
+            subscriber_task.cancel()
+
+
+register_protocol(lambda byte: byte >> 4 in (proto.CONNECT, proto.PUBLISH, proto.SUBSCRIBE,
+                                             proto.PINGREQ, proto.DISCONNECT), handle_packets)
+register_protocol(lambda byte: byte in b'{[', handle_json_lines)
+register_protocol(lambda byte: byte in b'GPHD', handle_http)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Servidor de ingesta de lecturas del sistema acuapónico")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--puerto", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--historial", default=os.path.join("data", "historial_sensores"),
+                        help="carpeta del historial Parquet")
+    parser.add_argument("--sin-historial", action="store_true", help="no guardar las lecturas (pruebas de carga)")
+    parser.add_argument("--rollups", default=os.path.join("data", "rollups_sensores"),
+                        help="carpeta de los rollups (1 min, 15 min, 1 h, 1 día)")
+    parser.add_argument("--sin-rollups", action="store_true", help="no actualizar los rollups")
+    parser.add_argument("--lote", type=int, default=FLUSH_ROWS, help="filas por escritura en el historial")
+    parser.add_argument("--intervalo", type=float, default=FLUSH_INTERVAL_S,
+                        help="segundos máximos antes de escribir un lote incompleto")
+    parser.add_argument("--cola", type=int, default=MAX_PENDING_BATCHES,
+                        help="lotes en espera antes de frenar a los clientes")
+    return parser.parse_args(argv)
+
+
+def store_readings(frame, name, history_root, rollups=None):
+    """Sink writing a group of readings to the history and then to the rollups.
+
+    Only a failed history write raises; it is retried under the same ``name``, so
+    the files of the failed attempt are replaced. The rollups can be rebuilt from
+    the history, so retrying for them would store the readings twice.
+    """
+    write_history(frame, history_root, name)
+    if rollups is not None:
+        try:
+            rollups.update(frame)
+        except Exception:
+            log.exception("could not update the rollups with %d readings", len(frame))
+
+
+async def serve(args):
+    sink = None
+    if not args.sin_historial:
+        rollups = None if args.sin_rollups else RollupStore(args.rollups)
+        sink = partial(store_readings, history_root=args.historial, rollups=rollups)
+    server = IngestServer(sink, args.cola, args.lote, args.intervalo)
+    listener = await server.start(args.host, args.puerto)
+    print(f"Escuchando en {args.host}:{server.port}", flush=True)
+    try:
+        async with listener:
+            await listener.serve_forever()
+    finally:
+        await server.close()
+        print(f"{server.stats['written']:,} lecturas guardadas", flush=True)
+
+
+def main(argv=None):
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    try:
+        asyncio.run(serve(parse_args(argv)))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+# Single registry of the parameter rules (limits, targets and actions).
+# The rules live in parameter_rules.json and are compiled once into contiguous
+# min/max/target arrays, so every consumer (alarm reports, the decision table,
+# dashboard highlighting) evaluates the same thresholds in one vectorized pass.
+# ``load_rules`` checks the file's (mtime, size) signature on every call and
+# recompiles only when it changed, so edits are picked up without a restart; an
+# invalid edit, or a file that is briefly missing while an editor saves it, keeps
+# the last good rules in place.
+import json
+import logging
+import os
+from collections.abc import Mapping
+
+import numpy as np
+import pandas as pd
+
+from alarm_engine import compile_ranges
+
+log = logging.getLogger('parameter_rules')
+
+DEFAULT_RULES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'parameter_rules.json')
+
+RULE_FIELDS = ['column', 'label', 'min', 'max', 'target', 'alarm', 'adjustment', 'action']
+
+# absolute path -> (signature, RuleSet)
+_cache = {}
+
+
+class RuleSet(Mapping):
+    """Parsed rules; as a mapping it is ``{column: {min, max, target, adjustment}}`` for the alarm rules.
+
+    That mapping is what the alarm engine and the streaming report take as
+    ``parameter_ranges``; ``compiled`` holds its arrays, built once.
+    """
+
+    def __init__(self, rules):
+        self.rules = [dict(rule) for rule in rules]
+        self._ranges = {
+            rule['column']: {key: rule[key] for key in ('min', 'max', 'target', 'adjustment')}
+            for rule in self.rules if rule['alarm']
+        }
+        self.compiled = compile_ranges(self._ranges)
+
+    def __getitem__(self, column):
+        return self._ranges[column]
+
+    def __iter__(self):
+        return iter(self._ranges)
+
+    def __len__(self):
+        return len(self._ranges)
+
+    def out_of_range(self, readings):
+        """``[(rule, value)]`` for the alarm parameters of one reading that are outside their limits."""
+        compiled = self.compiled
+        present = np.array([column in readings for column in compiled['parameters']], dtype=bool)
+        values = np.array([readings.get(column, np.nan) for column in compiled['parameters']], dtype=np.float64)
+        outside = present & ((values < compiled['min']) | (values > compiled['max']))
+        by_column = {rule['column']: rule for rule in self.rules}
+        return [(by_column[compiled['parameters'][i]], values[i]) for i in np.flatnonzero(outside)]
+
+    def decision_table(self):
+        """Parameter, limits and action of every rule, as shown in the decision workbook."""
+        return pd.DataFrame({
+            "Parametro": [rule['label'] for rule in self.rules],
+            "Valor Minimo": [rule['min'] for rule in self.rules],
+            "Valor Maximo": [rule['max'] for rule in self.rules],
+            "Accion a Tomar": [rule['action'] for rule in self.rules],
+        })
+
+
+def parse_rules(document):
+    """Validated ``RuleSet`` from the JSON document; raises ``ValueError`` on bad rules."""
+    rules = document.get('rules') if isinstance(document, dict) else None
+    if not isinstance(rules, list) or not rules:
+        raise ValueError("expected an object with a non-empty 'rules' list")
+    seen = set()
+    for rule in rules:
+        missing = [field for field in RULE_FIELDS if field not in rule]
+        if missing:
+            raise ValueError(f"rule {rule.get('column', '?')!r} is missing {', '.join(missing)}")
+        if rule['column'] in seen:
+            raise ValueError(f"duplicate rule for {rule['column']!r}")
+        seen.add(rule['column'])
+        if rule['alarm']:
+            limits = [rule['min'], rule['target'], rule['max']]
+            if not all(isinstance(value, (int, float)) for value in limits) or rule['adjustment'] is None:
+                raise ValueError(f"alarm rule {rule['column']!r} needs numeric min, target, max and an adjustment")
+            if not rule['min'] <= rule['target'] <= rule['max']:
+                raise ValueError(f"rule {rule['column']!r} needs min <= target <= max")
+    return RuleSet(rules)
+
+
+def load_rules(path=DEFAULT_RULES_PATH):
+    """Current rules from ``path``, recompiled only when the file changes."""
+    key = os.path.abspath(path)
+    cached = _cache.get(key)
+    try:
+        stat = os.stat(path)
+        signature = stat.st_mtime_ns, stat.st_size
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+        with open(path, encoding='utf-8') as f:
+            rules = parse_rules(json.load(f))
+    except OSError as exc:
+        if cached is None:
+            raise
+        # The cached signature is kept, so the file is read again as soon as it is back
+        log.warning("keeping the previous rules, cannot read %s: %s", path, exc)
+        return cached[1]
+    except ValueError as exc:
+        if cached is None:
+            raise
+        log.warning("keeping the previous rules, %s is invalid: %s", path, exc)
+        rules = cached[1]
+    _cache[key] = (signature, rules)
+    return rules
+
+
+def clear_cache():
+    _cache.clear()
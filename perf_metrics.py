@@ -0,0 +1,238 @@
+# Lightweight self-metrics for the dashboard and its shared feed.
+# ``METRICS.stage(name)`` times a block of code into a latency histogram with
+# fixed log-spaced buckets (sqrt(2) apart, 10 us to ~2 min), so recording is one
+# bisect and a few additions under a lock, and percentiles come from the bucket
+# counts without keeping samples. While metrics are disabled ``stage`` returns a
+# shared no-op context manager. Gauges hold the latest value of a quantity
+# (memory, feed size) and sessions are counted by their last heartbeat.
+#
+# ``serve_metrics`` exposes the same snapshot on a local HTTP endpoint:
+# ``/metrics`` in the Prometheus text format and ``/metrics.json``.
+# Metrics start enabled when SENSORES_METRICAS=1.
+import bisect
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Upper bound of every histogram bucket, seconds; the last bucket takes anything larger
+BUCKET_BOUNDS_S = [1e-5 * 2 ** (i / 2) for i in range(47)]
+
+QUANTILES = (0.5, 0.9, 0.99)
+
+# A session counts as active while its heartbeat is younger than this
+SESSION_TIMEOUT_S = 60.0
+
+DEFAULT_METRICS_PORT = 9108
+
+
+class LatencyHistogram:
+    """Counts of durations per bucket, plus their count, sum and maximum."""
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKET_BOUNDS_S) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds):
+        self.counts[bisect.bisect_left(BUCKET_BOUNDS_S, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding quantile ``q`` (at most the largest duration seen)."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(BUCKET_BOUNDS_S, self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def summary(self):
+        return {
+            'count': self.count,
+            'total_s': self.total,
+            'mean_s': self.total / self.count if self.count else 0.0,
+            'max_s': self.max,
+            **{f'p{round(q * 100)}_s': self.quantile(q) for q in QUANTILES},
+        }
+
+
+class _Stage:
+    __slots__ = ('histogram', 'lock', 'start')
+
+    def __init__(self, histogram, lock):
+        self.histogram = histogram
+        self.lock = lock
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        elapsed = time.perf_counter() - self.start
+        with self.lock:
+            self.histogram.record(elapsed)
+
+
+class _NoStage:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+_NO_STAGE = _NoStage()
+
+
+class Metrics:
+    """Thread-safe registry of stage histograms, gauges and session heartbeats."""
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.histograms = {}
+            self.gauges = {}
+            self.sessions = {}
+            self.started = time.time()
+
+    def stage(self, name):
+        """Context manager timing its block into the ``name`` histogram (no-op while disabled)."""
+        if not self.enabled:
+            return _NO_STAGE
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            histogram = self._histogram(name)
+        return _Stage(histogram, self._lock)
+
+    def _histogram(self, name):
+        with self._lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = LatencyHistogram()
+            return histogram
+
+    def record(self, name, seconds):
+        histogram = self._histogram(name)
+        with self._lock:
+            histogram.record(seconds)
+
+    def set_gauge(self, name, value):
+        if self.enabled:
+            with self._lock:
+                self.gauges[name] = value
+
+    def touch_session(self, session_id):
+        if self.enabled:
+            with self._lock:
+                self.sessions[session_id] = time.monotonic()
+
+    def active_sessions(self, timeout_s=SESSION_TIMEOUT_S):
+        now = time.monotonic()
+        with self._lock:
+            for session_id, seen in list(self.sessions.items()):
+                if now - seen > timeout_s:
+                    del self.sessions[session_id]
+            return len(self.sessions)
+
+    def snapshot(self):
+        """Every metric as plain data: ``{enabled, uptime_s, sessions, gauges, stages}``."""
+        sessions = self.active_sessions()
+        with self._lock:
+            stages = {name: histogram.summary() for name, histogram in sorted(self.histograms.items())}
+            gauges = dict(self.gauges)
+        rss = process_rss_bytes()
+        if rss is not None:
+            gauges['process_rss_bytes'] = rss
+        return {'enabled': self.enabled, 'uptime_s': time.time() - self.started, 'sessions': sessions,
+                'gauges': gauges, 'stages': stages}
+
+    def histogram_buckets(self, name):
+        """Cumulative ``[(upper_bound_s, count)]`` of one stage, the last bound infinite."""
+        with self._lock:
+            histogram = self.histograms.get(name)
+            counts = list(histogram.counts) if histogram else []
+        cumulative, buckets = 0, []
+        for bound, count in zip(BUCKET_BOUNDS_S + [float('inf')], counts):
+            cumulative += count
+            buckets.append((bound, cumulative))
+        return buckets
+
+    def prometheus(self):
+        """The snapshot in the Prometheus text exposition format."""
+        snapshot = self.snapshot()
+        lines = ['# TYPE dashboard_sessions gauge', f"dashboard_sessions {snapshot['sessions']}",
+                 '# TYPE dashboard_uptime_seconds gauge', f"dashboard_uptime_seconds {snapshot['uptime_s']:.3f}"]
+        for name, value in sorted(snapshot['gauges'].items()):
+            lines += [f'# TYPE dashboard_{name} gauge', f'dashboard_{name} {value}']
+        lines.append('# TYPE dashboard_stage_seconds histogram')
+        for name, stage in snapshot['stages'].items():
+            buckets = self.histogram_buckets(name)
+            for bound, count in buckets:
+                le = '+Inf' if bound == float('inf') else f'{bound:.6g}'
+                lines.append(f'dashboard_stage_seconds_bucket{{stage="{name}",le="{le}"}} {count}')
+            lines.append(f'dashboard_stage_seconds_sum{{stage="{name}"}} {stage["total_s"]:.6f}')
+            lines.append(f'dashboard_stage_seconds_count{{stage="{name}"}} {buckets[-1][1]}')
+        return '\n'.join(lines) + '\n'
+
+
+def process_rss_bytes():
+    """Resident memory of this process (peak RSS where /proc is not available, None on Windows)."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes, except on macOS where getrusage reports bytes
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def serve_metrics(metrics, host='127.0.0.1', port=DEFAULT_METRICS_PORT):
+    """Serve ``metrics`` over HTTP from a daemon thread; returns the server (``server_address`` has the port)."""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path == '/metrics':
+                body, content_type = metrics.prometheus().encode(), 'text/plain; version=0.0.4'
+            elif self.path == '/metrics.json':
+                body, content_type = json.dumps(metrics.snapshot()).encode(), 'application/json'
+            else:
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='metrics-http', daemon=True).start()
+    return server
+
+
+# Registry shared by the dashboard, its feed and the metrics endpoint
+METRICS = Metrics(enabled=os.environ.get('SENSORES_METRICAS') == '1')
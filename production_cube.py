@@ -0,0 +1,98 @@
+# Pre-aggregated production cube for the historical page.
+# Production rows are summed once per (fecha_año, fecha_mes, tipo) group, keeping
+# non-null counts next to the columns shown as averages, so the metric cards,
+# the charts and the filter options are answered from the groups instead of
+# re-filtering and re-aggregating every row on each widget change; the row
+# positions of each group serve the detail table without a full-frame mask.
+# New rows are folded into the existing groups without touching the ones
+# already aggregated.
+import numpy as np
+import pandas as pd
+
+KEY_COLUMNS = ['fecha_año', 'fecha_mes', 'tipo']
+SUM_COLUMNS = ['cantidad_produccion', 'ingreso_produccion', 'ganancia', 'venta_kg',
+               'cantidad_cosecha', 'costo_produccion']
+MEAN_COLUMNS = ['Peso_produccion', 'mortalidad_produccion']
+COUNT_SUFFIX = '__n'
+
+# cache key -> (source frame, cube)
+_cubes = {}
+
+
+def aggregate(rows):
+    """Per-group sums of every metric plus non-null counts of the averaged ones."""
+    grouped = rows.groupby(KEY_COLUMNS, sort=False)
+    sums = grouped[SUM_COLUMNS + MEAN_COLUMNS].sum()
+    counts = grouped[MEAN_COLUMNS].count().add_suffix(COUNT_SUFFIX)
+    return pd.concat([sums, counts], axis=1).astype('float64')
+
+
+class ProductionCube:
+    """Production metrics keyed by (fecha_año, fecha_mes, tipo)."""
+
+    def __init__(self):
+        self.cells = aggregate(pd.DataFrame(columns=KEY_COLUMNS + SUM_COLUMNS + MEAN_COLUMNS))
+        self.rows = 0
+        self.positions = {}
+        self._blocks = {}
+        self.years, self.months, self.tipos = [], [], []
+
+    @classmethod
+    def from_frame(cls, frame):
+        cube = cls()
+        cube.add_rows(frame)
+        return cube
+
+    def add_rows(self, rows):
+        """Fold new production rows into the cube; cost depends on the new rows and the group count."""
+        self.cells = self.cells.add(aggregate(rows), fill_value=0).sort_index()
+        for key, positions in rows.groupby(KEY_COLUMNS, sort=False).indices.items():
+            self.positions.setdefault(key, []).append(positions + self.rows)
+        self.rows += len(rows)
+        # Cells are sorted, so every (year, month) is one contiguous block
+        months = self.cells.index.droplevel('tipo')
+        starts = np.flatnonzero(np.r_[True, months[1:] != months[:-1]]) if len(months) else []
+        ends = np.r_[starts[1:], len(months)] if len(months) else []
+        self._blocks = {months[start]: slice(start, end) for start, end in zip(starts, ends)}
+        # Filter options, tipos in order of first appearance like Series.unique()
+        self.years = sorted(self.cells.index.unique(level='fecha_año'))
+        self.months = sorted(self.cells.index.unique(level='fecha_mes'))
+        self.tipos = list(dict.fromkeys([*self.tipos, *rows['tipo'].dropna().unique()]))
+
+    def select(self, year, month, tipos):
+        """One row per selected tipo for the given year and month."""
+        block = self._blocks.get((year, month), slice(0, 0))
+        cells = self.cells.iloc[block].droplevel(['fecha_año', 'fecha_mes'])
+        return cells[cells.index.isin(tipos)]
+
+    def select_rows(self, frame, year, month, tipos):
+        """Rows of ``frame`` (the frame the cube was built from) in the selected cells, in frame order."""
+        chunks = [part for tipo in tipos for part in self.positions.get((year, month, tipo), [])]
+        positions = np.sort(np.concatenate(chunks)) if chunks else np.empty(0, dtype=np.intp)
+        return frame.take(positions)
+
+    @staticmethod
+    def totals(cells):
+        """Sums of SUM_COLUMNS and averages of MEAN_COLUMNS over the selected cells."""
+        sums = dict(zip(cells.columns, cells.to_numpy().sum(axis=0)))
+        result = {column: sums[column] for column in SUM_COLUMNS}
+        for column in MEAN_COLUMNS:
+            count = sums[column + COUNT_SUFFIX]
+            result[column] = sums[column] / count if count else float('nan')
+        return result
+
+
+def cube_for(frame, key='produccion'):
+    """Cube for ``frame``, reusing the cached one when ``frame`` only appends rows to it."""
+    cached = _cubes.get(key)
+    if cached is not None:
+        source, cube = cached
+        if source is frame:
+            return cube
+        if len(frame) >= cube.rows and frame.iloc[:cube.rows].equals(source):
+            cube.add_rows(frame.iloc[cube.rows:])
+            _cubes[key] = (frame, cube)
+            return cube
+    cube = ProductionCube.from_frame(frame)
+    _cubes[key] = (frame, cube)
+    return cube
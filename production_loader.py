@@ -0,0 +1,100 @@
+# Cached, typed loading of the production workbook (proceso_de_produccion.xlsx).
+# Parsing the workbook with openpyxl is the slowest step of the historical page,
+# so the parsed and coerced frame is kept in memory and only reloaded when the
+# file changes: the (mtime, size) signature is checked on every call and, when it
+# differs, the content hash decides whether the data really changed. A Parquet
+# sidecar tagged with that hash lets cold starts skip Excel parsing entirely.
+import hashlib
+import os
+
+import pandas as pd
+
+NUMERIC_COLUMNS = ['cantidad_cosecha', 'venta_kg', 'costo_produccion',
+                   'ganancia', 'ingreso_produccion', 'mortalidad_produccion',
+                   'Peso_produccion', 'cantidad_produccion']
+
+SIDECAR_HASH_KEY = b'source_sha256'
+
+# absolute path -> (signature, sha256, frame)
+_cache = {}
+
+
+def file_signature(path):
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+def content_hash(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def sidecar_path(path):
+    return os.path.splitext(path)[0] + '.parquet'
+
+
+def parse_production(path):
+    """Read the workbook and make sure the numeric columns have numeric dtypes."""
+    produccion_data = pd.read_excel(path)
+    for col in NUMERIC_COLUMNS:
+        produccion_data[col] = pd.to_numeric(produccion_data[col], errors='coerce')
+    return produccion_data
+
+
+def _read_sidecar(path, digest):
+    import pyarrow.parquet as pq
+
+    try:
+        table = pq.read_table(sidecar_path(path))
+    except (OSError, ValueError):
+        return None
+    if (table.schema.metadata or {}).get(SIDECAR_HASH_KEY, b'').decode() != digest:
+        return None
+    return table.to_pandas()
+
+
+def _write_sidecar(path, digest, frame):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    try:
+        table = pa.Table.from_pandas(frame, preserve_index=False)
+        table = table.replace_schema_metadata({**(table.schema.metadata or {}), SIDECAR_HASH_KEY: digest.encode()})
+        pq.write_table(table, sidecar_path(path))
+    except (OSError, pa.ArrowException):
+        # Read-only location, or columns Arrow cannot type (mixed values in an
+        # object column): the in-memory cache still applies
+        pass
+
+
+def load_production(path='proceso_de_produccion.xlsx', sidecar=True):
+    """Typed production frame, parsed at most once per distinct file content.
+
+    The returned frame is shared between callers and must not be modified in place.
+    """
+    key = os.path.abspath(path)
+    signature = file_signature(path)
+    cached = _cache.get(key)
+    if cached is not None and cached[0] == signature:
+        return cached[2]
+
+    digest = content_hash(path)
+    if cached is not None and cached[1] == digest:
+        # Touched or copied over with the same content
+        _cache[key] = (signature, digest, cached[2])
+        return cached[2]
+
+    frame = _read_sidecar(path, digest) if sidecar else None
+    if frame is None:
+        frame = parse_production(path)
+        if sidecar:
+            _write_sidecar(path, digest, frame)
+    _cache[key] = (signature, digest, frame)
+    return frame
+
+
+def clear_cache():
+    _cache.clear()
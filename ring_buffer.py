@@ -0,0 +1,95 @@
+# Fixed-capacity, array-backed history for the realtime dashboard.
+# Every value is written twice, at i and i + capacity, so the latest n values are
+# always one contiguous slice of the backing array: appends are O(1) and windows
+# are zero-copy NumPy views, whatever the capacity.
+import numpy as np
+
+
+class RingBuffer:
+    """Latest ``capacity`` values of one series."""
+
+    def __init__(self, capacity, dtype=np.float64):
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        self.capacity = capacity
+        self._data = np.zeros(2 * capacity, dtype=dtype)
+        self._next = 0
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def nbytes(self):
+        return self._data.nbytes
+
+    def append(self, value):
+        self._data[self._next] = value
+        self._data[self._next + self.capacity] = value
+        self._next = (self._next + 1) % self.capacity
+        if self._size < self.capacity:
+            self._size += 1
+
+    def extend(self, values):
+        values = np.asarray(values)[-self.capacity:]
+        positions = (self._next + np.arange(len(values))) % self.capacity
+        self._data[positions] = values
+        self._data[positions + self.capacity] = values
+        self._next = (self._next + len(values)) % self.capacity
+        self._size = min(self._size + len(values), self.capacity)
+
+    def view(self, n=None):
+        """Read-only view of the latest ``n`` values (all stored values by default), oldest first."""
+        n = self._size if n is None else min(n, self._size)
+        end = self._next + self.capacity
+        window = self._data[end - n:end]
+        window.flags.writeable = False
+        return window
+
+    def last(self, default=None):
+        return self._data[self._next + self.capacity - 1] if self._size else default
+
+    def previous(self, default=None):
+        """Value before the latest one, e.g. for metric deltas."""
+        return self._data[self._next + self.capacity - 2] if self._size > 1 else default
+
+
+class SensorHistory:
+    """One ring buffer per sensor plus a shared timestamp buffer."""
+
+    def __init__(self, sensors, capacity):
+        self.sensors = list(sensors)
+        self.capacity = capacity
+        self.timestamps = RingBuffer(capacity, dtype='datetime64[ms]')
+        self.series = {sensor: RingBuffer(capacity) for sensor in self.sensors}
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    @property
+    def nbytes(self):
+        return self.timestamps.nbytes + sum(buffer.nbytes for buffer in self.series.values())
+
+    def append(self, timestamp, readings):
+        self.timestamps.append(timestamp)
+        for sensor, buffer in self.series.items():
+            buffer.append(readings[sensor])
+
+    def extend(self, timestamps, readings):
+        """Append a batch: ``timestamps`` and one array per sensor, oldest first."""
+        self.timestamps.extend(timestamps)
+        for sensor, buffer in self.series.items():
+            buffer.extend(readings[sensor])
+
+    def window(self, n=None):
+        """``(timestamps, {sensor: values})`` views of the latest ``n`` readings."""
+        return self.timestamps.view(n), {sensor: buffer.view(n) for sensor, buffer in self.series.items()}
+
+    def resized(self, capacity):
+        """New history with another capacity, keeping the most recent readings."""
+        history = SensorHistory(self.sensors, capacity)
+        timestamps, values = self.window(capacity)
+        history.timestamps.extend(timestamps)
+        for sensor in self.sensors:
+            history.series[sensor].extend(values[sensor])
+        return history
@@ -0,0 +1,299 @@
+# Statistical anomaly detection for sensor series, beyond the static min/max rules.
+# Every (tank, sensor) series keeps an exponentially weighted baseline: a mean over
+# about ``baseline_span`` readings and the variance around it over ``variance_span``
+# readings (ten times longer by default, so a drift in progress does not inflate its
+# own limits; bias-corrected, so the first readings already give a usable deviation).
+# Four detectors run on it:
+#   - zscore: a reading more than ``z_threshold`` baseline deviations from the
+#     baseline mean (spikes, dropouts)
+#   - ewma:   an EWMA control chart; the reading smoothed over ``ewma_span``
+#     readings moves more than ``ewma_threshold`` baseline deviations away from the
+#     baseline mean, which catches a drift while every reading is still inside the
+#     alarm range. Reported when it starts. A drift much slower than the baseline
+#     span is followed by the baseline and goes unreported.
+#   - rate:   a change faster than the sensor can physically move
+#     (RATE_FRACTION of its valid span per second)
+#   - stuck:  ``stuck_samples`` identical readings in a row from a sensor that
+#     never holds still (a frozen probe). Reported when it is reached.
+# The zscore and ewma checks only run on BASELINE_SENSORS, quantities that vary
+# continuously; the rest switch between set levels (rations, lights, pumps, level
+# refills) and every switch would look like an outlier. Missing readings never
+# change the state, and the first ``warmup`` readings of a
+# series only build its baseline.
+#
+# As in alert_episodes the detectors run in two modes that give identical results:
+#   - ``update``: one reading at a time, O(1) state and work per series (live feed)
+#   - ``update_frame``: vectorized over a whole chunk (historical CSV/Parquet), the
+#     exponential recurrences computed by pandas' ``ewm`` seeded with the carried
+#     state, so chunks can follow each other
+import math
+
+import numpy as np
+import pandas as pd
+
+from history_scan import DEFAULT_TANK, ffill, history_chunks, to_ms
+from sensor_schema import SENSOR_COLUMNS, VALID_LIMITS, float64_values
+
+ANOMALY_COLUMNS = ['marca_de_tiempo', 'id_tanque', 'parameter', 'kind', 'value', 'score']
+KINDS = ['zscore', 'ewma', 'rate', 'stuck']
+
+BASELINE_SPAN = 3600
+VARIANCE_SPAN = 10 * BASELINE_SPAN
+EWMA_SPAN = 60
+Z_THRESHOLD = 5.0
+EWMA_THRESHOLD = 3.0
+WARMUP = 60
+
+# Continuously measured quantities, checked against their baseline
+BASELINE_SENSORS = ['nivel_de_oxigeno_agua_mg_L', 'nivel_de_ph', 'nivel_de_nitratos_ppm', 'temperatura_agua_C',
+                    'temperatura_ambiente_C', 'humedad_ambiente_%']
+
+# Fastest plausible change: this fraction of the sensor's valid span per second
+RATE_FRACTION = 0.1
+DEFAULT_MAX_RATES = {sensor: (high - low) * RATE_FRACTION for sensor, (low, high) in VALID_LIMITS.items()}
+
+# Measured quantities that always fluctuate. Feed and light hold steady values
+# (a daily ration, darkness at night) and nitrites sit at zero for hours.
+STUCK_SENSORS = ['nivel_de_oxigeno_agua_mg_L', 'nivel_de_ph', 'nivel_de_nitratos_ppm', 'temperatura_agua_C',
+                 'temperatura_ambiente_C', 'humedad_ambiente_%', 'flujo_de_agua_L_min', 'nivel_de_agua_cm']
+STUCK_SAMPLES = 60
+
+def _previous(values, initial):
+    """Row ``t`` holds row ``t - 1`` of ``values`` (``initial`` for the first row)."""
+    return np.vstack([initial[None, :], values[:-1]])
+
+
+class _SeriesState:
+    """Detector state of every sensor of one tank (plain lists: cheap scalar access)."""
+
+    def __init__(self, num_sensors):
+        nan = [math.nan] * num_sensors
+        self.count = [0] * num_sensors
+        self.mean, self.var, self.smooth = list(nan), list(nan), list(nan)
+        self.weight = list(nan)   # weight the variance has gathered, for its bias correction
+        self.last_value, self.last_time = list(nan), list(nan)   # epoch ms
+        self.run = [0] * num_sensors
+        self.drifting = [False] * num_sensors
+
+
+class AnomalyDetector:
+    """Incremental anomaly detection for a set of sensors, per tank."""
+
+    def __init__(self, sensors=SENSOR_COLUMNS, baseline_span=BASELINE_SPAN, variance_span=VARIANCE_SPAN,
+                 ewma_span=EWMA_SPAN, z_threshold=Z_THRESHOLD, ewma_threshold=EWMA_THRESHOLD, warmup=WARMUP,
+                 baseline_sensors=BASELINE_SENSORS, max_rates=None, stuck_sensors=STUCK_SENSORS,
+                 stuck_samples=STUCK_SAMPLES):
+        # ``max_rates`` maps sensors to the largest change per second (units/s);
+        # sensors missing from it are not rate-checked
+        self.sensors = list(sensors)
+        max_rates = DEFAULT_MAX_RATES if max_rates is None else max_rates
+        # pandas' ewm works from the centre of mass, 1 / (1 + com) being its alpha:
+        # both modes derive their factors from the same one
+        self.com, self.var_com, self.smooth_com = [(span - 1) / 2 for span in (baseline_span, variance_span,
+                                                                              ewma_span)]
+        self.alpha = 1.0 / (1.0 + self.com)
+        self.var_alpha = 1.0 / (1.0 + self.var_com)
+        self.smooth_alpha = 1.0 / (1.0 + self.smooth_com)
+        self.z_threshold = z_threshold
+        self.ewma_threshold = ewma_threshold
+        self.warmup = max(1, warmup)
+        self.baselined = [sensor in baseline_sensors for sensor in self.sensors]
+        self.max_rates = [float(max_rates.get(sensor, math.nan)) for sensor in self.sensors]
+        self.stuck_samples = [stuck_samples if sensor in stuck_sensors else 0 for sensor in self.sensors]
+        self.tanks = {}
+
+    def _state(self, tank):
+        state = self.tanks.get(tank)
+        if state is None:
+            state = self.tanks[tank] = _SeriesState(len(self.sensors))
+        return state
+
+    def update(self, timestamp, readings, tank=DEFAULT_TANK):
+        """Feed one reading (``{sensor: value}``); returns the anomalies it raised as records."""
+        now = int(to_ms(timestamp))
+        state = self._state(tank)
+        alpha, var_alpha, smooth_alpha = self.alpha, self.var_alpha, self.smooth_alpha
+        # Same operations, in the same order, as pandas' ewm(adjust=False): bit-identical results
+        decay, var_decay, smooth_decay = 1.0 - alpha, 1.0 - var_alpha, 1.0 - smooth_alpha
+        norm, var_norm, smooth_norm = decay + alpha, var_decay + var_alpha, smooth_decay + smooth_alpha
+        found = []
+        for s, sensor in enumerate(self.sensors):
+            value = readings.get(sensor)
+            if value is None or value != value:
+                continue
+            value = float(value)
+            count = state.count[s]
+            state.count[s] = count + 1
+            if not count:
+                state.mean[s], state.var[s], state.weight[s], state.smooth[s] = value, 0.0, 0.0, value
+                state.last_value[s], state.last_time[s], state.run[s] = value, now, 1
+                continue
+            mean, var, weight, smooth = state.mean[s], state.var[s], state.weight[s], state.smooth[s]
+            deviation = value - mean
+            # Like pandas, a mean already equal to the new value is left as it is
+            if smooth != value:
+                smooth = state.smooth[s] = (smooth_decay * smooth + smooth_alpha * value) / smooth_norm
+            if mean != value:
+                state.mean[s] = (decay * mean + alpha * value) / norm
+            if var != deviation * deviation:
+                state.var[s] = (var_decay * var + var_alpha * (deviation * deviation)) / var_norm
+            if weight != 1.0:
+                state.weight[s] = (var_decay * weight + var_alpha * 1.0) / var_norm
+
+            warm = self.baselined[s] and count >= self.warmup and var > 0
+            drifting = False
+            if warm:
+                sigma = math.sqrt(var / weight)
+                if abs(deviation) > self.z_threshold * sigma:
+                    found.append(self._record(now, tank, sensor, 'zscore', value, deviation / sigma))
+                drifting = abs(smooth - mean) > self.ewma_threshold * sigma
+                if drifting and not state.drifting[s]:
+                    found.append(self._record(now, tank, sensor, 'ewma', value, (smooth - mean) / sigma))
+            state.drifting[s] = drifting
+
+            change = value - state.last_value[s]
+            elapsed = (now - state.last_time[s]) / 1000.0
+            if elapsed > 0 and abs(change) > self.max_rates[s] * elapsed:
+                found.append(self._record(now, tank, sensor, 'rate', value, change / elapsed))
+            run = state.run[s] + 1 if change == 0 else 1
+            state.run[s] = run
+            if run == self.stuck_samples[s]:
+                found.append(self._record(now, tank, sensor, 'stuck', value, float(run)))
+            state.last_value[s], state.last_time[s] = value, now
+        return found
+
+    def update_frame(self, frame):
+        """Feed a chunk of readings (vectorized); returns the anomalies it raised as a DataFrame.
+
+        Rows are evaluated in time order within each tank; chunks must follow each
+        other in time.
+        """
+        found = []
+        if 'id_tanque' in frame.columns:
+            for tank, positions in frame.groupby('id_tanque', sort=True, observed=True).indices.items():
+                found.append(self._update_block(int(tank), frame.iloc[positions]))
+        elif len(frame):
+            found.append(self._update_block(DEFAULT_TANK, frame))
+        return _concat(found)
+
+    def _update_block(self, tank, frame):
+        times = to_ms(pd.to_datetime(frame['marca_de_tiempo']).to_numpy())
+        values = np.column_stack([
+            float64_values(frame[sensor]) if sensor in frame.columns else np.full(len(frame), np.nan)
+            for sensor in self.sensors
+        ])
+        if np.any(np.diff(times) < 0):
+            order = np.argsort(times, kind='stable')
+            times, values = times[order], values[order]
+
+        state = self._state(tank)
+        valid = ~np.isnan(values)
+        seen = np.array(state.count) + np.cumsum(valid, axis=0) - valid   # readings before each row
+
+        # Baseline mean before each reading; a series' first reading is its own mean
+        mean = self._ewm(values, np.array(state.mean), self.com)
+        mean_before = _previous(mean, np.array(state.mean))
+        deviation = values - np.where(np.isnan(mean_before), values, mean_before)
+        var = self._ewm(deviation * deviation, np.array(state.var), self.var_com)
+        var_before = _previous(var, np.array(state.var))
+        # The variance starts at 0: divide by the weight it has gathered so far (0 on the first reading)
+        weight = self._ewm(np.where(valid, (seen > 0).astype(np.float64), np.nan), np.array(state.weight),
+                           self.var_com)
+        weight_before = _previous(weight, np.array(state.weight))
+        smooth = self._ewm(values, np.array(state.smooth), self.smooth_com)
+
+        found = []
+        with np.errstate(invalid='ignore', divide='ignore'):
+            sigma = np.sqrt(var_before / weight_before)
+            warm = valid & np.array(self.baselined) & (seen >= self.warmup) & (var_before > 0)
+            found.append(self._records(warm & (np.abs(deviation) > self.z_threshold * sigma),
+                                       'zscore', times, tank, values, deviation / sigma))
+            drift = smooth - mean_before
+            drifting = warm & (np.abs(drift) > self.ewma_threshold * sigma)
+            held_drifting = ffill(np.where(valid, drifting, np.nan), np.array(state.drifting, dtype=float))
+            was_drifting = _previous(held_drifting, np.array(state.drifting, dtype=float))
+            found.append(self._records(drifting & (was_drifting == 0), 'ewma', times, tank, values, drift / sigma))
+
+            held_values = ffill(values, np.array(state.last_value))
+            held_times = ffill(np.where(valid, times[:, None], np.nan), np.array(state.last_time))
+            last_value = _previous(held_values, np.array(state.last_value))
+            last_time = _previous(held_times, np.array(state.last_time))
+            checked = valid & (seen > 0)
+            change = values - last_value
+            elapsed = (times[:, None] - last_time) / 1000.0
+            found.append(self._records(checked & (elapsed > 0) & (np.abs(change) > np.array(self.max_rates) * elapsed),
+                                       'rate', times, tank, values, change / elapsed))
+
+            # Run of identical readings: same readings counted since the last reading that changed
+            same = checked & (change == 0)
+            counted = np.cumsum(same, axis=0)
+            base = ffill(np.where(valid & ~same, counted, np.nan), 1.0 - np.array(state.run))
+            run = counted - base + 1
+            found.append(self._records(same & (run == np.array(self.stuck_samples)), 'stuck', times, tank, values,
+                                       run.astype(np.float64)))
+
+        state.count = (np.array(state.count) + valid.sum(axis=0)).tolist()
+        for name, series in (('mean', mean), ('var', var), ('weight', weight), ('smooth', smooth)):
+            setattr(state, name, np.where(valid.any(axis=0), series[-1], getattr(state, name)).tolist())
+        state.last_value = held_values[-1].tolist()
+        state.last_time = held_times[-1].tolist()
+        state.run = ffill(np.where(valid, run, np.nan), np.array(state.run, dtype=float))[-1].astype(int).tolist()
+        state.drifting = held_drifting[-1].astype(bool).tolist()
+        return _concat(found)
+
+    @staticmethod
+    def _ewm(values, initial, com):
+        """Exponentially weighted mean down each column, continuing from the ``initial`` row
+        (NaN where a series has no state yet); missing values hold the previous mean."""
+        seeded = pd.DataFrame(np.vstack([initial[None, :], values]))
+        return seeded.ewm(com=com, adjust=False, ignore_na=True).mean().to_numpy()[1:]
+
+    def _records(self, mask, kind, times, tank, values, scores):
+        rows, columns = np.nonzero(mask)
+        return pd.DataFrame({
+            'marca_de_tiempo': times[rows].astype('datetime64[ms]'),
+            'id_tanque': np.full(len(rows), tank, dtype=np.int64),
+            'parameter': np.array(self.sensors, dtype=object)[columns],
+            'kind': kind,
+            'value': values[rows, columns],
+            'score': scores[rows, columns],
+        }, columns=ANOMALY_COLUMNS)
+
+    @staticmethod
+    def _record(timestamp, tank, sensor, kind, value, score):
+        return {'marca_de_tiempo': np.datetime64(timestamp, 'ms'), 'id_tanque': tank, 'parameter': sensor,
+                'kind': kind, 'value': value, 'score': score}
+
+
+ANOMALY_DTYPES = {'marca_de_tiempo': 'datetime64[ms]', 'id_tanque': np.int64, 'value': np.float64,
+                  'score': np.float64}
+
+
+def anomalies_frame(records):
+    frame = pd.DataFrame.from_records(records, columns=ANOMALY_COLUMNS).astype(ANOMALY_DTYPES)
+    return frame.sort_values(['marca_de_tiempo', 'id_tanque', 'parameter', 'kind'], kind='stable', ignore_index=True)
+
+
+def _concat(frames):
+    frames = [frame for frame in frames if len(frame)]
+    if not frames:
+        return anomalies_frame([])
+    frame = pd.concat(frames, ignore_index=True).astype(ANOMALY_DTYPES)
+    return frame.sort_values(['marca_de_tiempo', 'id_tanque', 'parameter', 'kind'], kind='stable', ignore_index=True)
+
+
+def detect_anomalies(data, sensors=SENSOR_COLUMNS, **options):
+    """Every anomaly in a historical frame, ordered by time (``options`` go to ``AnomalyDetector``)."""
+    return AnomalyDetector(sensors, **options).update_frame(data)
+
+
+def detect_anomalies_in_chunks(chunks, sensors=SENSOR_COLUMNS, **options):
+    """``detect_anomalies`` over consecutive chunks (e.g. ``pd.read_csv(..., chunksize=...)``)."""
+    detector = AnomalyDetector(sensors, **options)
+    return _concat([detector.update_frame(chunk) for chunk in chunks])
+
+
+def detect_anomalies_in_history(root, sensors=SENSOR_COLUMNS, start=None, end=None, **options):
+    """``detect_anomalies`` over the Parquet sensor store, read one day partition at a time."""
+    chunks = history_chunks(root, sensors, start, end)
+    return detect_anomalies_in_chunks(chunks, sensors, **options)
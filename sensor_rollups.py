@@ -0,0 +1,456 @@
+# Time-bucketed rollups (downsampled tiers) of the sensor history.
+# Readings are sorted by time and folded into 1-minute buckets per tank holding the
+# min, max, sum, count and last value of every sensor; the 15-minute, hourly and
+# daily tiers are folded from the 1-minute aggregates, never from the raw readings.
+# Two aggregates of the same bucket merge into one, so a new batch of readings only
+# touches the buckets it falls in: ``RollupStore.update`` folds it into tiers kept in
+# memory (the realtime feed) or into Parquet files per period (rollups/1h/2024-10.parquet).
+# On disk every update only writes its own aggregates, as a small fragment of each
+# period it touches (rollups/1h/2024-10~000007.parquet). Readers fold a period's
+# fragments into its file as they read it. Once a period has MAX_FRAGMENTS fragments
+# they are compacted into the period file, which records the last fragment it
+# includes, so an update costs the size of the batch and not of the period.
+# A chart spanning weeks then reads a few hundred buckets of the right tier
+# instead of every raw reading.
+#
+# Rebuild from the Parquet history or a CSV export:
+#   python sensor_rollups.py --historial data/historial_sensores --destino data/rollups_sensores
+#   python sensor_rollups.py --csv datos_simulados_sistema_acuaponico.csv
+import argparse
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from history_scan import DEFAULT_TANK
+from sensor_schema import SENSOR_COLUMNS, TANK_COLUMN, TIMESTAMP_COLUMN, float64_values, read_sensor_csv
+
+BUCKET_COLUMN = 'bucket'
+LAST_TIME_COLUMN = 'last_time'
+KEY_COLUMNS = [BUCKET_COLUMN, TANK_COLUMN]
+
+# Tiers from finest to coarsest (pandas frequencies); each is folded from the previous one
+TIERS = ['1min', '15min', '1h', '1D']
+
+# Stored per sensor and bucket; the mean is sum / count at query time
+STATS = ['min', 'max', 'sum', 'count', 'last']
+QUERY_STATS = ['min', 'max', 'mean', 'last', 'count']
+
+ROLLUP_SENSORS = list(SENSOR_COLUMNS)
+
+# One file per day of 1-minute buckets, per month of 15-minute and hourly ones, per year of daily ones
+FILE_PERIODS = {'1min': 'D', '15min': 'M', '1h': 'M', '1D': 'Y'}
+_PERIOD_FORMATS = {'D': '%Y-%m-%d', 'M': '%Y-%m', 'Y': '%Y'}
+_PERIOD_LENGTHS = {'D': pd.DateOffset(days=1), 'M': pd.DateOffset(months=1), 'Y': pd.DateOffset(years=1)}
+
+# Fragments a period collects before they are compacted into the period file
+MAX_FRAGMENTS = 16
+# Period file metadata: the last fragment sequence number folded into it
+FRAGMENTS_THROUGH_KEY = b'fragments_through'
+
+
+def stat_columns(sensors, stats=STATS):
+    return [f'{sensor}__{stat}' for sensor in sensors for stat in stats]
+
+
+def rollup_columns(sensors):
+    """Columns of a stored tier, in order."""
+    return [*KEY_COLUMNS, LAST_TIME_COLUMN, *stat_columns(sensors)]
+
+
+class _Aggregates:
+    """Aggregates as arrays: bucket and latest reading time (int64 ns), tank, and
+    one (rows, sensors) array per statistic. Cheaper than a DataFrame for the
+    small folds a realtime update makes."""
+
+    __slots__ = ('buckets', 'tanks', 'last_times', 'stats')
+
+    def __init__(self, buckets, tanks, last_times, stats):
+        self.buckets, self.tanks, self.last_times, self.stats = buckets, tanks, last_times, stats
+
+    def __len__(self):
+        return len(self.buckets)
+
+    def __getitem__(self, index):
+        return _Aggregates(self.buckets[index], self.tanks[index], self.last_times[index],
+                           {stat: values[index] for stat, values in self.stats.items()})
+
+    @classmethod
+    def empty(cls, num_sensors):
+        empty = np.empty(0, dtype=np.int64)
+        return cls(empty, empty.astype(np.int32), empty, {
+            stat: np.empty((0, num_sensors), dtype=np.int64 if stat == 'count' else np.float64) for stat in STATS})
+
+    @classmethod
+    def concat(cls, parts):
+        return cls(*(np.concatenate([getattr(part, name) for part in parts]) for name in ('buckets', 'tanks', 'last_times')),
+                   {stat: np.concatenate([part.stats[stat] for part in parts]) for stat in STATS})
+
+    @classmethod
+    def from_frame(cls, frame, sensors):
+        return cls(_nanoseconds(frame[BUCKET_COLUMN]), frame[TANK_COLUMN].to_numpy(dtype=np.int32),
+                   _nanoseconds(frame[LAST_TIME_COLUMN]),
+                   {stat: frame[stat_columns(sensors, [stat])].to_numpy() for stat in STATS})
+
+    def to_frame(self, sensors):
+        columns = {
+            BUCKET_COLUMN: self.buckets.view('datetime64[ns]'),
+            TANK_COLUMN: self.tanks,
+            LAST_TIME_COLUMN: self.last_times.view('datetime64[ns]'),
+        }
+        for position, sensor in enumerate(sensors):
+            for stat in STATS:
+                columns[f'{sensor}__{stat}'] = self.stats[stat][:, position]
+        return pd.DataFrame(columns)
+
+    def fold(self, freq=None):
+        """One row per (bucket, tank), ordered by both; with ``freq`` buckets are first floored to it.
+
+        ``last`` is the sensor's value in the bucket's latest reading (missing if
+        that reading has none), so it comes from the row with the latest time.
+        """
+        buckets = self.buckets if freq is None else _floor(self.buckets, freq)
+        # Stable: rows with the same key and time keep their arrival order
+        order = np.lexsort((self.last_times, self.tanks, buckets))
+        buckets, tanks = buckets[order], self.tanks[order]
+        new_key = np.ones(len(order), dtype=bool)
+        new_key[1:] = (buckets[1:] != buckets[:-1]) | (tanks[1:] != tanks[:-1])
+        starts = np.flatnonzero(new_key)
+        last = order[np.append(starts[1:], len(order)) - 1]
+        stats = self.stats
+        return _Aggregates(buckets[starts], tanks[starts], self.last_times[last], {
+            # fmin/fmax skip missing values; a bucket with none at all stays NaN
+            'min': np.fmin.reduceat(stats['min'][order], starts, axis=0),
+            'max': np.fmax.reduceat(stats['max'][order], starts, axis=0),
+            'sum': np.add.reduceat(stats['sum'][order], starts, axis=0),
+            'count': np.add.reduceat(stats['count'][order], starts, axis=0),
+            'last': stats['last'][last],
+        })
+
+
+def _nanoseconds(values):
+    return np.asarray(values).astype('datetime64[ns]').view(np.int64)
+
+
+def _floor(nanoseconds, freq):
+    step = pd.Timedelta(freq).value
+    return nanoseconds // step * step
+
+
+def _file_name(period, sequence=0):
+    return f'{period}.parquet' if not sequence else f'{period}~{sequence:06d}.parquet'
+
+
+def _list_periods(tier_dir):
+    """``{period: (has_file, [fragment sequence numbers])}`` of the files in a tier directory."""
+    periods = {}
+    for name in os.listdir(tier_dir):
+        if not name.endswith('.parquet'):
+            continue
+        period, _, sequence = name[:-len('.parquet')].partition('~')
+        has_file, fragments = periods.get(period, (False, []))
+        if sequence:
+            fragments.append(int(sequence))
+        periods[period] = (has_file or not sequence, fragments)
+    return {period: (has_file, sorted(fragments)) for period, (has_file, fragments) in sorted(periods.items())}
+
+
+def _write_table(table, path):
+    # Readers always see a complete file: write aside, then replace
+    temporary = f'{path}.tmp'
+    pq.write_table(table, temporary)
+    os.replace(temporary, path)
+
+
+def _aggregate(frame, sensors, freq):
+    if not len(frame):
+        return _Aggregates.empty(len(sensors))
+    times = _nanoseconds(pd.to_datetime(frame[TIMESTAMP_COLUMN]))
+    tanks = (frame[TANK_COLUMN].to_numpy(dtype=np.int32) if TANK_COLUMN in frame.columns
+             else np.full(len(frame), DEFAULT_TANK, dtype=np.int32))
+    values = np.column_stack([float64_values(frame[sensor]) for sensor in sensors])
+    missing = np.isnan(values)
+    stats = {'min': values, 'max': values, 'last': values,
+             'sum': np.where(missing, 0.0, values), 'count': (~missing).astype(np.int64)}
+    return _Aggregates(times, tanks, times, stats).fold(freq)
+
+
+def empty_rollup(sensors):
+    return _Aggregates.empty(len(sensors)).to_frame(sensors)
+
+
+def aggregate_readings(frame, sensors=ROLLUP_SENSORS, freq=TIERS[0]):
+    """Aggregates of raw readings per ``freq`` bucket and tank (readings need not be sorted)."""
+    return _aggregate(frame, sensors, freq).to_frame(sensors)
+
+
+def summarize(aggregates, sensors=ROLLUP_SENSORS):
+    """Query view of stored aggregates: min, max, mean, last and count per sensor."""
+    summary = aggregates[KEY_COLUMNS].copy()
+    for sensor in sensors:
+        count = aggregates[f'{sensor}__count']
+        summary[f'{sensor}__min'] = aggregates[f'{sensor}__min']
+        summary[f'{sensor}__max'] = aggregates[f'{sensor}__max']
+        summary[f'{sensor}__mean'] = aggregates[f'{sensor}__sum'] / count.where(count > 0)
+        summary[f'{sensor}__last'] = aggregates[f'{sensor}__last']
+        summary[f'{sensor}__count'] = count
+    return summary
+
+
+def choose_tier(start, end, max_points, tiers=TIERS):
+    """Finest tier with at most ``max_points`` buckets between ``start`` and ``end`` (else the coarsest)."""
+    span = pd.Timestamp(end) - pd.Timestamp(start)
+    for tier in tiers:
+        if span / pd.Timedelta(tier) < max_points:
+            return tier
+    return tiers[-1]
+
+
+def _in_range(frame, tier, start, end, tanks):
+    mask = np.ones(len(frame), dtype=bool)
+    if start is not None:
+        # Buckets that started before ``start`` but still cover part of the range
+        mask &= frame[BUCKET_COLUMN].to_numpy() > np.datetime64(pd.Timestamp(start) - pd.Timedelta(tier))
+    if end is not None:
+        mask &= frame[BUCKET_COLUMN].to_numpy() < np.datetime64(pd.Timestamp(end))
+    if tanks is not None:
+        mask &= np.isin(frame[TANK_COLUMN].to_numpy(), list(tanks))
+    return frame[mask]
+
+
+class RollupStore:
+    """Rollup tiers kept up to date as readings arrive.
+
+    With ``root`` the tiers are Parquet files (``root/<tier>/<period>.parquet``
+    plus the fragments of recent updates); without it they live in memory and
+    ``max_buckets`` bounds each tier to its latest buckets. Every reading must be
+    added once: ``update`` does not detect repeated batches. A store on disk has a
+    single writer; any number of processes can read it.
+    """
+
+    def __init__(self, root=None, sensors=ROLLUP_SENSORS, tiers=TIERS, max_buckets=None):
+        self.root = root
+        self.sensors = list(sensors)
+        self.tiers = list(tiers)
+        self.max_buckets = max_buckets
+        self._tiers = {tier: _Aggregates.empty(len(self.sensors)) for tier in self.tiers} if root is None else None
+        # Writer side: tier -> {period: [last fragment in the period file, live fragments]}
+        self._periods = {}
+
+    def update(self, frame):
+        """Fold raw readings (timestamp, optional tank id and sensor columns) into every tier."""
+        if not len(frame):
+            return
+        partial = _aggregate(frame, self.sensors, self.tiers[0])
+        for index, tier in enumerate(self.tiers):
+            if index:
+                partial = partial.fold(tier)
+            if self.root is None:
+                self._merge_in_memory(tier, partial)
+            else:
+                self._merge_files(tier, partial)
+
+    def _merge_in_memory(self, tier, partial):
+        current = self._tiers[tier]
+        # Rows are ordered by bucket and new readings are mostly recent: only the
+        # tail from the first touched bucket on is merged again
+        cut = np.searchsorted(current.buckets, partial.buckets[0])
+        merged = _Aggregates.concat([current[cut:], partial]).fold()
+        current = _Aggregates.concat([current[:cut], merged]) if cut else merged
+        if self.max_buckets is not None:
+            oldest = current.buckets[-1] - (self.max_buckets - 1) * pd.Timedelta(tier).value
+            current = current[np.searchsorted(current.buckets, oldest):]
+        self._tiers[tier] = current
+
+    def _tier_dir(self, tier):
+        return os.path.join(self.root, tier)
+
+    def _tier_periods(self, tier):
+        periods = self._periods.get(tier)
+        if periods is None:
+            os.makedirs(self._tier_dir(tier), exist_ok=True)
+            periods = self._periods[tier] = {}
+            for period, (has_file, fragments) in _list_periods(self._tier_dir(tier)).items():
+                through = self._fragments_through(tier, period) if has_file else 0
+                periods[period] = [through, [sequence for sequence in fragments if sequence > through]]
+        return periods
+
+    def _fragments_through(self, tier, period):
+        metadata = pq.read_schema(os.path.join(self._tier_dir(tier), _file_name(period))).metadata or {}
+        return int(metadata.get(FRAGMENTS_THROUGH_KEY, 0))
+
+    def _merge_files(self, tier, partial):
+        periods = self._tier_periods(tier)
+        period_format = _PERIOD_FORMATS[FILE_PERIODS[tier]]
+        names = pd.DatetimeIndex(partial.buckets.view('datetime64[ns]')).strftime(period_format)
+        for period in names.unique():
+            rows = pa.Table.from_pandas(partial[np.flatnonzero(names == period)].to_frame(self.sensors),
+                                        preserve_index=False)
+            state = periods.get(period)
+            if state is None:
+                # First aggregates of the period: they are its file
+                _write_table(rows, os.path.join(self._tier_dir(tier), _file_name(period)))
+                periods[period] = [0, []]
+                continue
+            through, fragments = state
+            sequence = max([through, *fragments]) + 1
+            _write_table(rows, os.path.join(self._tier_dir(tier), _file_name(period, sequence)))
+            fragments.append(sequence)
+            if len(fragments) >= MAX_FRAGMENTS:
+                self._compact_period(tier, period)
+
+    def _compact_period(self, tier, period):
+        through, fragments = self._tier_periods(tier)[period]
+        if not fragments:
+            return
+        rows = self._read_period(tier, period, rollup_columns(self.sensors), self.sensors)
+        table = pa.Table.from_pandas(rows, preserve_index=False)
+        last = max(fragments)
+        table = table.replace_schema_metadata({**(table.schema.metadata or {}), FRAGMENTS_THROUGH_KEY: str(last).encode()})
+        _write_table(table, os.path.join(self._tier_dir(tier), _file_name(period)))
+        # The period file now says which fragments it holds: readers skip them even
+        # if they are still there, so removing them is only cleanup
+        for sequence in fragments:
+            try:
+                os.remove(os.path.join(self._tier_dir(tier), _file_name(period, sequence)))
+            except FileNotFoundError:
+                pass
+        self._tier_periods(tier)[period] = [last, []]
+
+    def compact(self):
+        """Fold every fragment into its period file (the rebuilds end with this)."""
+        if self.root is None:
+            return
+        for tier in self.tiers:
+            for period in list(self._tier_periods(tier)):
+                self._compact_period(tier, period)
+
+    def _read_period(self, tier, period, columns, sensors=None, fragments=None):
+        """Rows of one period: its file plus the fragments it does not include yet.
+
+        With ``sensors`` the fragments are folded in, one row per bucket and tank;
+        without, buckets can repeat (enough for bucket, time and tank columns).
+        """
+        tier_dir = self._tier_dir(tier)
+        for attempt in range(3):
+            if fragments is None:
+                fragments = _list_periods(tier_dir).get(period, (False, []))[1]
+            try:
+                tables, through = [], 0
+                if os.path.exists(os.path.join(tier_dir, _file_name(period))):
+                    table = pq.read_table(os.path.join(tier_dir, _file_name(period)), columns=columns)
+                    through = int((table.schema.metadata or {}).get(FRAGMENTS_THROUGH_KEY, 0))
+                    tables.append(table)
+                tables += [pq.read_table(os.path.join(tier_dir, _file_name(period, sequence)), columns=columns)
+                           for sequence in fragments if sequence > through]
+                break
+            except FileNotFoundError:
+                # Compacted while being read: list the period again
+                fragments = None
+        else:
+            raise RuntimeError(f'{tier_dir}/{period} keeps changing while being read')
+        frame = pa.concat_tables(tables).to_pandas() if tables else empty_rollup(self.sensors)[columns]
+        if sensors is None or len(tables) < 2:
+            return frame
+        return _Aggregates.from_frame(frame, sensors).fold().to_frame(sensors)[columns]
+
+    def _read_tier(self, tier, start=None, end=None, columns=None, sensors=None):
+        columns = rollup_columns(self.sensors) if columns is None else columns
+        if self.root is None:
+            current = self._tiers[tier]
+            if start is not None:
+                current = current[np.searchsorted(current.buckets, (pd.Timestamp(start) - pd.Timedelta(tier)).value, 'right'):]
+            return current.to_frame(self.sensors)[columns]
+        tier_dir = self._tier_dir(tier)
+        if not os.path.isdir(tier_dir):
+            return empty_rollup(self.sensors)[columns]
+        period_length = _PERIOD_LENGTHS[FILE_PERIODS[tier]]
+        frames = []
+        for period, (_, fragments) in _list_periods(tier_dir).items():
+            # Only the periods that overlap the range are opened
+            first = pd.Timestamp(period)
+            if end is not None and first >= pd.Timestamp(end):
+                continue
+            if start is not None and first + period_length <= pd.Timestamp(start).floor(tier):
+                continue
+            frames.append(self._read_period(tier, period, columns, sensors, fragments))
+        if not frames:
+            return empty_rollup(self.sensors)[columns]
+        return pd.concat(frames, ignore_index=True)
+
+    def read(self, tier, start=None, end=None, tanks=None, sensors=None):
+        """Buckets of ``tier`` overlapping ``[start, end)``, summarized (min, max, mean, last, count)."""
+        sensors = self.sensors if sensors is None else list(sensors)
+        columns = [*KEY_COLUMNS, LAST_TIME_COLUMN, *stat_columns(sensors)]
+        frame = _in_range(self._read_tier(tier, start, end, columns, sensors), tier, start, end, tanks)
+        return summarize(frame.reset_index(drop=True), sensors)
+
+    def query(self, start, end, max_points, tanks=None, sensors=None):
+        """``(tier, buckets)`` from the finest tier with at most ``max_points`` buckets in the range."""
+        tier = choose_tier(start, end, max_points, self.tiers)
+        return tier, self.read(tier, start, end, tanks, sensors)
+
+    def time_range(self):
+        """First bucket and latest reading time in the store, or ``(None, None)`` when it is empty."""
+        frame = self._read_tier(self.tiers[-1], columns=[BUCKET_COLUMN, LAST_TIME_COLUMN])
+        if not len(frame):
+            return None, None
+        return frame[BUCKET_COLUMN].min(), frame[LAST_TIME_COLUMN].max()
+
+    def tanks(self):
+        return sorted(self._read_tier(self.tiers[-1], columns=[TANK_COLUMN])[TANK_COLUMN].unique().tolist())
+
+
+def rebuild_from_history(history_root, rollup_root, sensors=ROLLUP_SENSORS):
+    """Recompute every tier of ``rollup_root`` from the Parquet history, one day at a time."""
+    from sensor_store import history_days, read_history
+
+    shutil.rmtree(rollup_root, ignore_errors=True)
+    store = RollupStore(rollup_root, sensors)
+    rows = 0
+    for day in history_days(history_root):
+        start = pd.Timestamp(day)
+        frame = read_history(history_root, start=start, end=start + pd.Timedelta(days=1))
+        store.update(frame)
+        rows += len(frame)
+    store.compact()
+    return rows
+
+
+def rebuild_from_csv(csv_path, rollup_root, sensors=ROLLUP_SENSORS, chunksize=1_000_000):
+    """Recompute every tier of ``rollup_root`` from a sensor CSV export, a chunk at a time."""
+    shutil.rmtree(rollup_root, ignore_errors=True)
+    store = RollupStore(rollup_root, sensors)
+    rows = 0
+    for chunk in read_sensor_csv(csv_path, sensors, chunksize):
+        store.update(chunk)
+        rows += len(chunk)
+    store.compact()
+    return rows
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Reconstruye los rollups (1 min, 15 min, 1 h, 1 día) de los sensores")
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--historial", default=os.path.join("data", "historial_sensores"),
+                        help="carpeta del historial Parquet")
+    source.add_argument("--csv", help="exportación CSV de los sensores")
+    parser.add_argument("--destino", default=os.path.join("data", "rollups_sensores"),
+                        help="carpeta de los rollups (se reemplaza)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.csv:
+        rows = rebuild_from_csv(args.csv, args.destino)
+    else:
+        rows = rebuild_from_history(args.historial, args.destino)
+    print(f"{rows:,} lecturas agregadas en {args.destino}")
+
+
+if __name__ == "__main__":
+    main()
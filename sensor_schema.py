@@ -0,0 +1,120 @@
+# Compact in-memory layout of the sensor frames.
+# Every loader (CSV exports and the Parquet history) returns the filter state and
+# the tank id as categoricals and the timestamp parsed once into datetime64.
+# Against object strings this is several times smaller.
+#
+# Readings stay float64 except in CSV exports, which have SENSOR_DECIMALS
+# decimals: there a column is loaded as float32 when rounding its float64
+# widening back to those decimals gives exactly the value the CSV parser gives.
+# ``float64_values`` does this rounding, so the limits, aggregates and reports
+# computed from compact frames are the same as before. Readings from the history
+# and the ingestion server are never downcast: sensors report any precision, and
+# rounding them would move readings across the alarm limits.
+import numpy as np
+import pandas as pd
+
+TIMESTAMP_COLUMN = 'marca_de_tiempo'
+TANK_COLUMN = 'id_tanque'
+FILTER_COLUMN = 'estado_filtro'
+
+SENSOR_COLUMNS = [
+    'nivel_de_oxigeno_agua_mg_L', 'nivel_de_ph', 'nivel_de_nitratos_ppm', 'nivel_de_nitritos_ppm',
+    'temperatura_agua_C', 'temperatura_ambiente_C', 'humedad_ambiente_%', 'cantidad_alimento_g',
+    'flujo_de_agua_L_min', 'intensidad_de_luz_lux', 'nivel_de_agua_cm', 'consumo_energia_kWh',
+]
+
+# What the sensors can physically report. Wider than the alarm ranges on purpose:
+# out-of-range readings are data for the alarms, only impossible values are rejected.
+VALID_LIMITS = {
+    'nivel_de_oxigeno_agua_mg_L': (0, 25),
+    'nivel_de_ph': (0, 14),
+    'nivel_de_nitratos_ppm': (0, 1000),
+    'nivel_de_nitritos_ppm': (0, 100),
+    'temperatura_agua_C': (-5, 50),
+    'temperatura_ambiente_C': (-30, 60),
+    'humedad_ambiente_%': (0, 100),
+    'cantidad_alimento_g': (0, 10000),
+    'flujo_de_agua_L_min': (0, 1000),
+    'intensidad_de_luz_lux': (0, 200000),
+    'nivel_de_agua_cm': (0, 500),
+    'consumo_energia_kWh': (0, 1000),
+}
+
+# Decimals of the exported readings (the simulator and the CSV exports round to two)
+SENSOR_DECIMALS = 2
+
+COMPACT_DTYPES = {TANK_COLUMN: 'category', FILTER_COLUMN: 'category'}
+
+# read_csv would turn categorical tank ids into strings: they are read as
+# integers and made categorical afterwards. Readings are parsed as float64 (a
+# chunk of whole numbers would come out as int64) and downcast when exact.
+_CSV_DTYPES = {**dict.fromkeys(SENSOR_COLUMNS, 'float64'), **COMPACT_DTYPES, TANK_COLUMN: 'int32'}
+
+
+def compact_frame(frame):
+    """``frame`` with the compact dtypes; columns it does not have are skipped."""
+    changes = {column: dtype for column, dtype in COMPACT_DTYPES.items()
+               if column in frame.columns and frame[column].dtype != dtype}
+    if changes:
+        frame = frame.astype(changes)
+    if TIMESTAMP_COLUMN in frame.columns and not pd.api.types.is_datetime64_any_dtype(frame[TIMESTAMP_COLUMN]):
+        frame[TIMESTAMP_COLUMN] = pd.to_datetime(frame[TIMESTAMP_COLUMN])
+    return frame
+
+
+def timestamp_text(values):
+    """Timestamps as the text of the CSV exports ('2024-10-01 08:00:00'): the inverse of the parse."""
+    import pyarrow as pa
+
+    values = np.asarray(values, dtype='datetime64[ns]')
+    seconds = values.astype('datetime64[s]')
+    if not (np.isnat(values) | (seconds == values)).all():
+        # Fractions of a second, written as pandas writes them
+        return pd.Series(values).astype(str).to_numpy(dtype=object)
+    # Arrow formats whole seconds as the exports do, tens of times faster than pandas
+    return pa.array(seconds).cast(pa.string()).to_numpy(zero_copy_only=False)
+
+
+def read_sensor_csv(path, columns=None, chunksize=None):
+    """Read a sensor CSV export with the compact dtypes and float32 readings where exact.
+
+    ``columns`` limits the read to those columns plus the timestamp and tank id.
+    With ``chunksize`` an iterator of compact chunks is returned.
+    """
+    usecols = _usecols(columns)
+    if chunksize is None:
+        return _downcast_readings(compact_frame(pd.read_csv(path, usecols=usecols, dtype=_CSV_DTYPES)))
+    return _iter_compact_chunks(path, usecols, chunksize)
+
+
+def _usecols(columns):
+    if columns is None:
+        return None
+    wanted = {TIMESTAMP_COLUMN, TANK_COLUMN, *columns}
+    return lambda column: column in wanted
+
+
+def _iter_compact_chunks(path, usecols, chunksize):
+    with pd.read_csv(path, usecols=usecols, dtype=_CSV_DTYPES, chunksize=chunksize) as reader:
+        for chunk in reader:
+            yield _downcast_readings(compact_frame(chunk))
+
+
+def _downcast_readings(frame):
+    """``frame`` with float32 readings in the columns ``float64_values`` widens back exactly."""
+    for column in frame.columns.intersection(SENSOR_COLUMNS):
+        values = frame[column].to_numpy()
+        if values.dtype != np.float64:
+            continue
+        narrow = values.astype(np.float32)
+        if np.array_equal(float64_values(narrow), values, equal_nan=True):
+            frame[column] = narrow
+    return frame
+
+
+def float64_values(values):
+    """Readings as a float64 array; float32 readings (CSV exports) are rounded back to SENSOR_DECIMALS."""
+    values = np.asarray(values)
+    if values.dtype == np.float32:
+        return np.round(values.astype(np.float64), SENSOR_DECIMALS)
+    return values.astype(np.float64, copy=False)
@@ -0,0 +1,418 @@
+# Columnar storage backend for the sensor history.
+# Readings are stored as typed Parquet files, hive-partitioned by day
+# (historial/fecha=2024-10-02/part-....parquet) and sorted by time inside each file,
+# so readers can project columns and push time-range filters down to the
+# partition and row-group level instead of re-parsing CSV strings on every run.
+#
+# Every store also keeps a block index (historial/_index.parquet): one entry per
+# row group with its file, first and last timestamp and tank id range, taken from
+# the footers ``write_history`` has just written. Each write adds its entries as a
+# small index fragment (_index~000001.parquet, ...) that readers merge on load, so
+# a write costs the size of the batch and not of the index. Reads select the
+# overlapping blocks from the index and read only those row groups from
+# memory-mapped files, so their cost depends on the size of the window, not on
+# how much history the store holds or how many files it has.
+#
+# Every MAX_INDEX_FRAGMENTS writes ``compact_history`` merges the small part files
+# of each day (the ingestion server writes one per batch) and folds the fragments
+# into the index file, which records the last fragment it includes.
+import logging
+import os
+import uuid
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from sensor_schema import SENSOR_COLUMNS, compact_frame, float64_values, read_sensor_csv
+
+log = logging.getLogger('sensor_store')
+
+TIMESTAMP_COLUMN = 'marca_de_tiempo'
+PARTITION_COLUMN = 'fecha'
+TANK_COLUMN = 'id_tanque'
+
+SENSOR_SCHEMA = pa.schema([
+    (TIMESTAMP_COLUMN, pa.timestamp('ms')),
+    ('nivel_de_oxigeno_agua_mg_L', pa.float64()),
+    ('nivel_de_ph', pa.float64()),
+    ('nivel_de_nitratos_ppm', pa.float64()),
+    ('nivel_de_nitritos_ppm', pa.float64()),
+    ('temperatura_agua_C', pa.float64()),
+    ('temperatura_ambiente_C', pa.float64()),
+    ('humedad_ambiente_%', pa.float64()),
+    ('cantidad_alimento_g', pa.float64()),
+    ('flujo_de_agua_L_min', pa.float64()),
+    ('intensidad_de_luz_lux', pa.float64()),
+    ('nivel_de_agua_cm', pa.float64()),
+    ('estado_filtro', pa.dictionary(pa.int8(), pa.string())),
+    ('consumo_energia_kWh', pa.float64()),
+])
+
+# Optional columns, stored only when the frame has them
+OPTIONAL_FIELDS = [pa.field(TANK_COLUMN, pa.int32())]
+
+PARTITIONING = ds.partitioning(pa.schema([(PARTITION_COLUMN, pa.date32())]), flavor='hive')
+
+# Small enough row groups for the timestamp statistics to skip most of a file
+ROWS_PER_GROUP = 64 * 1024
+
+# Dataset discovery skips names starting with '_', so the index is never read as data
+INDEX_FILE = '_index.parquet'
+# Index fragments written since the last compaction before compact_history runs
+MAX_INDEX_FRAGMENTS = 32
+# Index file metadata: the last fragment sequence number folded into it
+FRAGMENTS_THROUGH_KEY = b'fragments_through'
+# A day's part files are merged once it has this many below ROWS_PER_GROUP rows
+MIN_SMALL_PARTS = 8
+INDEX_SCHEMA = pa.schema([
+    ('path', pa.string()),
+    ('row_group', pa.int32()),
+    ('rows', pa.int64()),
+    ('start', pa.timestamp('ms')),
+    ('end', pa.timestamp('ms')),
+    ('tank_min', pa.int32()),
+    ('tank_max', pa.int32()),
+])
+
+
+def _table_schema(frame):
+    fields = list(SENSOR_SCHEMA)
+    fields += [field for field in OPTIONAL_FIELDS if field.name in frame.columns]
+    return pa.schema(fields)
+
+
+def to_sensor_table(frame):
+    """Typed Arrow table (plus the ``fecha`` partition column) from a sensor DataFrame."""
+    frame = frame.copy()
+    # Timestamps are parsed once here and stored as real timestamps from then on
+    frame[TIMESTAMP_COLUMN] = pd.to_datetime(frame[TIMESTAMP_COLUMN])
+    frame['estado_filtro'] = frame['estado_filtro'].astype('category')
+    # Compact CSV frames are widened back: exact float64 readings and integer tank ids
+    for column in frame.columns.intersection(SENSOR_COLUMNS):
+        frame[column] = float64_values(frame[column])
+    if TANK_COLUMN in frame.columns and isinstance(frame[TANK_COLUMN].dtype, pd.CategoricalDtype):
+        frame[TANK_COLUMN] = frame[TANK_COLUMN].astype(np.int32)
+    if not frame[TIMESTAMP_COLUMN].is_monotonic_increasing:
+        frame = frame.sort_values(TIMESTAMP_COLUMN, kind='stable')
+
+    schema = _table_schema(frame)
+    table = pa.Table.from_pandas(frame[schema.names], schema=schema, preserve_index=False, safe=False)
+    return table.append_column(PARTITION_COLUMN, pc.cast(table[TIMESTAMP_COLUMN], pa.date32()))
+
+
+def write_history(frame, root, name=None):
+    """Append sensor readings to the store at ``root``; only ``compact_history`` rewrites files.
+
+    ``name`` (a new random one by default) names the written files, one per day:
+    writing the same readings again under the same name replaces the files of an
+    interrupted write instead of storing a second copy.
+    """
+    name = uuid.uuid4().hex if name is None else name
+    written = []
+    ds.write_dataset(
+        to_sensor_table(frame),
+        root,
+        format='parquet',
+        partitioning=PARTITIONING,
+        basename_template=f'part-{name}-{{i}}.parquet',
+        existing_data_behavior='overwrite_or_ignore',
+        max_rows_per_group=ROWS_PER_GROUP,
+        min_rows_per_group=min(ROWS_PER_GROUP, len(frame)) or 1,
+        file_visitor=written.append,
+    )
+    _append_index(root, [_block_entries(root, file.path, file.metadata) for file in written])
+
+
+def csv_to_history(csv_path, root, chunksize=1_000_000):
+    """Convert a sensor CSV export into the Parquet store, a chunk at a time."""
+    rows = 0
+    for chunk in read_sensor_csv(csv_path, chunksize=chunksize):
+        write_history(chunk, root)
+        rows += len(chunk)
+    return rows
+
+
+def open_history(root):
+    return ds.dataset(root, format='parquet', partitioning=PARTITIONING)
+
+
+def history_days(root):
+    """Sorted dates of the day partitions in the store."""
+    days = {
+        pd.Timestamp(part.split('=', 1)[1]).date()
+        for path in open_history(root).files
+        for part in path.replace('\\', '/').split('/') if part.startswith(f'{PARTITION_COLUMN}=')
+    }
+    return sorted(days)
+
+
+def _timestamp_scalar(timestamp):
+    return pa.scalar(timestamp.to_pydatetime(), SENSOR_SCHEMA.field(TIMESTAMP_COLUMN).type)
+
+
+def read_history(root, columns=None, start=None, end=None, tanks=None):
+    """Read sensor history as a DataFrame, projecting ``columns`` and filtering by time.
+
+    ``columns`` defaults to every sensor column; the timestamp is always included.
+    Reads are served from the block index, so files being merged by
+    ``compact_history`` are never read twice.
+    """
+    return read_window(root, start, end, tanks, columns)
+
+
+def _to_frame(table):
+    """DataFrame with the compact dtypes of ``sensor_schema``; readings stay float64."""
+    for i, field in enumerate(table.schema):
+        if field.name == TANK_COLUMN:
+            table = table.set_column(i, field.name, pc.dictionary_encode(table[i]))
+    return compact_frame(table.to_pandas())
+
+
+def _block_entries(root, path, metadata):
+    """Index entries (one per row group) of a written file, from its footer statistics.
+
+    Row groups whose footer lacks them (files written by other tools) are scanned
+    instead; those without any timestamp cannot match a window and are left out.
+    """
+    names = metadata.schema.names
+    tank_column = TANK_COLUMN if TANK_COLUMN in names else None
+    relative = os.path.relpath(path, root).replace('\\', '/')
+    entries = []
+    for row_group in range(metadata.num_row_groups):
+        start, end = _column_range(path, metadata, row_group, TIMESTAMP_COLUMN)
+        if start is None:
+            continue
+        tank_min, tank_max = _column_range(path, metadata, row_group, tank_column)
+        entries.append({
+            'path': relative, 'row_group': row_group, 'rows': metadata.row_group(row_group).num_rows,
+            'start': start, 'end': end, 'tank_min': tank_min, 'tank_max': tank_max,
+        })
+    return entries
+
+
+def _column_range(path, metadata, row_group, name):
+    """``(min, max)`` of a column in a row group: from the footer, else from its values."""
+    if name is None:
+        return None, None
+    statistics = metadata.row_group(row_group).column(metadata.schema.names.index(name)).statistics
+    if statistics is not None and statistics.has_min_max:
+        return statistics.min_raw, statistics.max_raw
+    extremes = pc.min_max(pq.ParquetFile(path).read_row_group(row_group, columns=[name]).column(0))
+    return extremes['min'].as_py(), extremes['max'].as_py()
+
+
+def _index_name(sequence=0):
+    return INDEX_FILE if not sequence else f'{INDEX_FILE[:-len(".parquet")]}~{sequence:06d}.parquet'
+
+
+def _index_fragments(root):
+    """Sorted sequence numbers of the index fragments in ``root``."""
+    prefix = f'{INDEX_FILE[:-len(".parquet")]}~'
+    return sorted(int(name[len(prefix):-len('.parquet')]) for name in os.listdir(root)
+                  if name.startswith(prefix) and name.endswith('.parquet'))
+
+
+def _fragments_through(schema):
+    return int((schema.metadata or {}).get(FRAGMENTS_THROUGH_KEY, 0))
+
+
+def _write_index(root, table, sequence=0):
+    path = os.path.join(root, _index_name(sequence))
+    # Readers always see a complete file: write aside, then replace
+    pq.write_table(table, f'{path}.tmp')
+    os.replace(f'{path}.tmp', path)
+
+
+def _replace_index(root, table, through):
+    """Write ``table`` as the index file, holding the fragments up to ``through``, and drop them."""
+    _write_index(root, table.replace_schema_metadata({FRAGMENTS_THROUGH_KEY: str(through).encode()}))
+    # The index file now says which fragments it holds: readers skip them even if
+    # they are still there, so removing them is only cleanup
+    for sequence in _index_fragments(root):
+        if sequence <= through:
+            try:
+                os.remove(os.path.join(root, _index_name(sequence)))
+            except FileNotFoundError:
+                pass
+
+
+def _append_index(root, files):
+    path = os.path.join(root, INDEX_FILE)
+    if not os.path.exists(path):
+        # Stores written before the index existed are indexed in full the first time
+        build_index(root)
+        return
+    through = _fragments_through(pq.read_schema(path))
+    fragments = [sequence for sequence in _index_fragments(root) if sequence > through]
+    entries = pa.Table.from_pylist([entry for entries in files for entry in entries], schema=INDEX_SCHEMA)
+    _write_index(root, entries, max([through, *fragments]) + 1)
+    if len(fragments) + 1 >= MAX_INDEX_FRAGMENTS:
+        # The readings are already stored and indexed: a failed compaction must not
+        # make the caller write them again. The next write retries it.
+        try:
+            compact_history(root)
+        except Exception:
+            log.exception("could not compact the history in %s", root)
+
+
+def build_index(root):
+    """(Re)build the block index of the store at ``root`` from the file footers; returns the blocks."""
+    fragments = _index_fragments(root)
+    entries = []
+    for path in open_history(root).files:
+        entries.extend(_block_entries(root, path, pq.read_metadata(path)))
+    _replace_index(root, pa.Table.from_pylist(entries, schema=INDEX_SCHEMA), max(fragments, default=0))
+    return len(entries)
+
+
+def compact_history(root):
+    """Merge the small part files of each day and fold the index fragments into the index file.
+
+    Returns the number of part files merged. ``write_history`` runs it every
+    MAX_INDEX_FRAGMENTS writes.
+    """
+    load_index(root)
+    _, through, fragments, table, _ = _INDEX_CACHE[os.path.join(root, INDEX_FILE)]
+    table = table.replace_schema_metadata(None)
+    files = table.group_by('path').aggregate([('rows', 'sum')]).to_pylist()
+    days = {}
+    for file in files:
+        if file['rows_sum'] < ROWS_PER_GROUP:
+            days.setdefault(file['path'].rpartition('/')[0], []).append(file['path'])
+    merged, entries = [], []
+    for day, paths in days.items():
+        if len(paths) < MIN_SMALL_PARTS:
+            continue
+        parts = pa.concat_tables([pq.read_table(os.path.join(root, path), partitioning=None) for path in paths],
+                                 promote_options='default').unify_dictionaries()
+        parts = parts.take(pc.sort_indices(parts, [(TIMESTAMP_COLUMN, 'ascending')]))
+        path = os.path.join(root, day, f'part-{uuid.uuid4().hex}-0.parquet')
+        # Written under a hidden name so dataset scans never see it half written
+        hidden = os.path.join(root, day, f'_{os.path.basename(path)}.tmp')
+        pq.write_table(parts, hidden, row_group_size=ROWS_PER_GROUP)
+        os.replace(hidden, path)
+        entries.extend(_block_entries(root, path, pq.read_metadata(path)))
+        merged.extend(paths)
+    if merged:
+        table = table.filter(pc.invert(pc.is_in(table['path'], pa.array(merged, pa.string()))))
+        table = pa.concat_tables([table, pa.Table.from_pylist(entries, schema=INDEX_SCHEMA)])
+    _replace_index(root, table, max([through, *fragments]))
+    # Readers holding the previous index retry with this one if a file they want is gone
+    for path in merged:
+        os.remove(os.path.join(root, path))
+    return len(merged)
+
+
+class BlockIndex:
+    """Row-group entries of a store as arrays (times in ns, missing tank ids as -1)."""
+
+    def __init__(self, table):
+        self.paths = table['path'].to_numpy(zero_copy_only=False)
+        self.row_groups = table['row_group'].to_numpy()
+        self.rows = table['rows'].to_numpy()
+        self.starts = table['start'].cast(pa.timestamp('ns')).cast(pa.int64()).to_numpy()
+        self.ends = table['end'].cast(pa.timestamp('ns')).cast(pa.int64()).to_numpy()
+        self.tank_min = table['tank_min'].fill_null(-1).to_numpy()
+        self.tank_max = table['tank_max'].fill_null(-1).to_numpy()
+
+    def __len__(self):
+        return len(self.paths)
+
+    def select(self, start=None, end=None, tanks=None):
+        """Positions of the blocks that may hold readings in ``[start, end)`` of ``tanks``."""
+        mask = np.ones(len(self), dtype=bool)
+        if start is not None:
+            mask &= self.ends >= pd.Timestamp(start).value
+        if end is not None:
+            mask &= self.starts < pd.Timestamp(end).value
+        if tanks is not None:
+            tanks = np.asarray(list(tanks))
+            mask &= (self.tank_min <= tanks.max()) & (self.tank_max >= tanks.min()) & (self.tank_max >= 0)
+        return np.flatnonzero(mask)
+
+
+# Loaded indexes by path: (file signature, fragments it holds, fragments merged
+# since, table, BlockIndex), extended with new fragments while the file does not change
+_INDEX_CACHE = {}
+
+
+def load_index(root):
+    """The store's ``BlockIndex`` (index file plus fragments), built first if the store has none."""
+    path = os.path.join(root, INDEX_FILE)
+    for _ in range(3):
+        if not os.path.exists(path):
+            build_index(root)
+        try:
+            fragments = _index_fragments(root)
+            stat = os.stat(path)
+            key = (stat.st_mtime_ns, stat.st_size)
+            cached = _INDEX_CACHE.get(path)
+            if cached is None or cached[0] != key:
+                table = pq.read_table(path)
+                cached = (key, _fragments_through(table.schema), [], table.replace_schema_metadata(None), None)
+            key, through, merged, table, index = cached
+            new = [sequence for sequence in fragments if sequence > max([through, *merged])]
+            if new or index is None:
+                table = pa.concat_tables([table, *(pq.read_table(os.path.join(root, _index_name(sequence)))
+                                                   for sequence in new)])
+                cached = _INDEX_CACHE[path] = (key, through, merged + new, table, BlockIndex(table))
+            return cached[4]
+        except FileNotFoundError:
+            # Compacted while being read: list the fragments again
+            continue
+    raise RuntimeError(f'the block index of {root} keeps changing while being read')
+
+
+def _read_blocks(root, index, blocks, columns):
+    tables = []
+    for path in dict.fromkeys(index.paths[blocks]):
+        parquet = pq.ParquetFile(os.path.join(root, path), memory_map=True)
+        row_groups = index.row_groups[blocks[index.paths[blocks] == path]].tolist()
+        available = parquet.schema_arrow.names
+        tables.append(parquet.read_row_groups(row_groups, columns=[c for c in columns if c in available]))
+    return tables
+
+
+def read_window(root, start=None, end=None, tanks=None, columns=None):
+    """``read_history`` reading only the row groups the block index selects."""
+    index = load_index(root)
+    names = [field.name for field in (*SENSOR_SCHEMA, *OPTIONAL_FIELDS)]
+    if columns is not None:
+        names = [TIMESTAMP_COLUMN] + [c for c in columns if c != TIMESTAMP_COLUMN]
+    # Tank ids are needed for the row filter even when they are not returned
+    wanted = names if tanks is None or TANK_COLUMN in names else [*names, TANK_COLUMN]
+    for _ in range(3):
+        try:
+            tables = _read_blocks(root, index, index.select(start, end, tanks), wanted)
+            break
+        except FileNotFoundError:
+            # Files merged by compact_history while being read: load the index again
+            index = load_index(root)
+    else:
+        raise RuntimeError(f'{root} keeps changing while being read')
+    if not tables:
+        schema = pa.schema([field for field in (*SENSOR_SCHEMA, *OPTIONAL_FIELDS) if field.name in wanted])
+        tables = [schema.empty_table()]
+    table = pa.concat_tables(tables, promote_options='default')
+
+    # Blocks are selected whole: keep only the rows inside the window
+    mask = None
+
+    def combine(condition):
+        return condition if mask is None else pc.and_(mask, condition)
+
+    times = table[TIMESTAMP_COLUMN]
+    if start is not None:
+        mask = combine(pc.greater_equal(times, _timestamp_scalar(pd.Timestamp(start))))
+    if end is not None:
+        mask = combine(pc.less(times, _timestamp_scalar(pd.Timestamp(end))))
+    if tanks is not None:
+        mask = combine(pc.fill_null(pc.is_in(table[TANK_COLUMN], pa.array(list(tanks), pa.int32())), False))
+    if mask is not None:
+        table = table.filter(mask)
+    frame = _to_frame(table.select([name for name in names if name in table.column_names]))
+    return frame.sort_values(TIMESTAMP_COLUMN, kind='stable', ignore_index=True)
@@ -0,0 +1,131 @@
+# One data producer shared by every dashboard session.
+# A background thread advances the tank model at a fixed interval and appends the
+# readings to a single SensorHistory; sessions only take snapshots of the window
+# they display, so the cost of producing data no longer grows with the number of
+# viewers and no session thread sleeps waiting for the next tick.
+#
+# Capacity: with the default 100-point window a viewer refresh costs ~3.4 ms of
+# server CPU, about 870 sessions per core at a 3 s refresh (~90 with a 10k-point
+# window), versus ~46 when every session produced its own data and rebuilt the
+# figure; see benchmarks/bench_shared_feed.py. Streamlit's own messaging cost
+# comes on top of these figures.
+#
+# With ``rollups`` (an in-memory sensor_rollups.RollupStore) every reading is also
+# folded into time buckets, so a zoomed-out chart reads a few hundred bucket means
+# instead of copying and downsampling the whole window.
+#
+# With ``anomalies`` (a sensor_anomalies.AnomalyDetector) every reading also goes
+# through the statistical detectors; the latest anomalies are kept for the panel.
+# Producing, folding and detecting are timed as perf_metrics stages when metrics
+# are enabled.
+import collections
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from perf_metrics import METRICS
+from ring_buffer import SensorHistory
+
+
+class SharedFeed:
+    """Background producer with a thread-safe history of the latest readings."""
+
+    def __init__(self, source, sensors, capacity, interval_s=3.0, rollups=None, anomalies=None,
+                 anomaly_log=200):
+        # ``source()`` returns ``(timestamp, {sensor: value})`` for one new reading;
+        # without a source the feed is filled from outside with ``push``
+        self.source = source
+        self.interval_s = interval_s
+        self.history = SensorHistory(sensors, capacity)
+        self.rollups = rollups
+        self.anomalies = anomalies
+        self.anomaly_log = collections.deque(maxlen=anomaly_log)
+        self.version = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None and self.source is not None:
+            self.tick()
+            self._thread = threading.Thread(target=self._run, name="shared-feed", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        next_tick = time.monotonic() + self.interval_s
+        while not self._stop.wait(max(0.0, next_tick - time.monotonic())):
+            self.tick()
+            next_tick += self.interval_s
+
+    def tick(self):
+        with METRICS.stage("feed.tick"):
+            with METRICS.stage("feed.source"):
+                timestamp, readings = self.source()
+            with self._lock:
+                self.history.append(timestamp, readings)
+                if self.rollups is not None:
+                    with METRICS.stage("feed.rollups"):
+                        self._fold([timestamp], {sensor: [readings[sensor]] for sensor in self.history.sensors})
+                if self.anomalies is not None:
+                    with METRICS.stage("feed.anomalies"):
+                        self.anomaly_log.extend(self.anomalies.update(timestamp, readings))
+                self.version += 1
+
+    def push(self, timestamps, readings):
+        """Append a batch of readings received from elsewhere (e.g. the ingestion server)."""
+        with METRICS.stage("feed.push"), self._lock:
+            self.history.extend(timestamps, readings)
+            if self.rollups is not None:
+                with METRICS.stage("feed.rollups"):
+                    self._fold(timestamps, readings)
+            if self.anomalies is not None:
+                with METRICS.stage("feed.anomalies"):
+                    frame = pd.DataFrame(readings)
+                    frame.insert(0, 'marca_de_tiempo', np.asarray(timestamps, dtype='datetime64[ms]'))
+                    self.anomaly_log.extend(self.anomalies.update_frame(frame).to_dict('records'))
+            self.version += 1
+
+    def _fold(self, timestamps, readings):
+        frame = pd.DataFrame({sensor: readings[sensor] for sensor in self.rollups.sensors})
+        frame.insert(0, 'marca_de_tiempo', np.asarray(timestamps, dtype='datetime64[ms]'))
+        self.rollups.update(frame)
+
+    def snapshot(self, n=None):
+        """Copy of the latest ``n`` readings: ``(version, timestamps, {sensor: values})``.
+
+        Copies are taken under the lock so the producer can keep writing while
+        the session renders.
+        """
+        with self._lock:
+            timestamps, values = self.history.window(n)
+            return self.version, timestamps.copy(), {sensor: np.array(view) for sensor, view in values.items()}
+
+    def recent_anomalies(self, n=None):
+        """The latest ``n`` anomalies raised by the feed's detector, oldest first, as records."""
+        with self._lock:
+            records = list(self.anomaly_log)
+        return records if n is None else records[-n:]
+
+    def rollup_window(self, n, max_points):
+        """Bucket means covering the latest ``n`` readings: ``(version, tier, buckets, {sensor: means})``.
+
+        The tier is the finest with at most ``max_points`` buckets over the
+        window's time span; ``tier`` is None when the feed has no rollups or no
+        readings yet.
+        """
+        with self._lock:
+            timestamps = self.history.timestamps.view(n)
+            if self.rollups is None or not len(timestamps):
+                return self.version, None, timestamps[:0].copy(), {}
+            tier, buckets = self.rollups.query(timestamps[0], timestamps[-1] + np.timedelta64(1, 'ms'), max_points)
+            return (self.version, tier, buckets['bucket'].to_numpy(),
+                    {sensor: buckets[f'{sensor}__mean'].to_numpy() for sensor in self.rollups.sensors})
@@ -1,38 +1,182 @@
-import pandas as pd
-import random
-from datetime import datetime, timedelta
+import argparse
 import os
 
-# Definiendo cantidad de registros
-num_records = 1000
-
-# Generando datos aleatorios para cada columna
-data = {
-    "marca_de_tiempo": [(datetime.now() - timedelta(minutes=random.randint(0, 10000))).strftime('%Y-%m-%d %H:%M:%S') for _ in range(num_records)],
-    "nivel_de_oxigeno_agua_mg_L": [round(random.uniform(4, 12), 2) for _ in range(num_records)],
-    "nivel_de_ph": [round(random.uniform(6.0, 8.5), 2) for _ in range(num_records)],
-    "nivel_de_nitratos_ppm": [round(random.uniform(0, 50), 2) for _ in range(num_records)],
-    "nivel_de_nitritos_ppm": [round(random.uniform(0, 5), 2) for _ in range(num_records)],
-    "temperatura_agua_C": [round(random.uniform(15, 30), 2) for _ in range(num_records)],
-    "temperatura_ambiente_C": [round(random.uniform(10, 40), 2) for _ in range(num_records)],
-    "humedad_ambiente_%": [round(random.uniform(30, 100), 2) for _ in range(num_records)],
-    "cantidad_alimento_g": [round(random.uniform(0, 100), 2) for _ in range(num_records)],
-    "flujo_de_agua_L_min": [round(random.uniform(0, 20), 2) for _ in range(num_records)],
-    "intensidad_de_luz_lux": [round(random.uniform(0, 100000), 2) for _ in range(num_records)],
-    "nivel_de_agua_cm": [round(random.uniform(0, 100), 2) for _ in range(num_records)],
-    "estado_filtro": [random.choice(["Limpio", "Necesita limpieza"]) for _ in range(num_records)],
-    "consumo_energia_kWh": [round(random.uniform(0, 10), 2) for _ in range(num_records)]
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pa_csv
+
+from sensor_store import write_history
+
+# Rangos (mínimo, máximo) de cada sensor; los valores se sortean uniformemente
+SENSOR_RANGES = {
+    "nivel_de_oxigeno_agua_mg_L": (4, 12),
+    "nivel_de_ph": (6.0, 8.5),
+    "nivel_de_nitratos_ppm": (0, 50),
+    "nivel_de_nitritos_ppm": (0, 5),
+    "temperatura_agua_C": (15, 30),
+    "temperatura_ambiente_C": (10, 40),
+    "humedad_ambiente_%": (30, 100),
+    "cantidad_alimento_g": (0, 100),
+    "flujo_de_agua_L_min": (0, 20),
+    "intensidad_de_luz_lux": (0, 100000),
+    "nivel_de_agua_cm": (0, 100),
 }
+ENERGY_RANGE = (0, 10)
+FILTER_STATES = ["Limpio", "Necesita limpieza"]
+
+# Filas generadas (y escritas) por bloque; acota la memoria sin importar el total
+CHUNK_ROWS = 1_000_000
+
+
+def generate_chunk(rng, start_row, num_rows, start_time, num_tanks=1, interval_s=600):
+    """Genera las filas ``start_row .. start_row + num_rows`` del conjunto simulado.
+
+    Las filas van ordenadas por tiempo: todos los tanques en el instante 0,
+    luego todos en el instante 1, etc.
+    """
+    row = np.arange(start_row, start_row + num_rows, dtype=np.int64)
+    tick = row // num_tanks
+    data = {"marca_de_tiempo": start_time + (tick * interval_s).astype("timedelta64[s]")}
+    if num_tanks > 1:
+        data["id_tanque"] = (row % num_tanks + 1).astype(np.int32)
+
+    for column, (low, high) in SENSOR_RANGES.items():
+        data[column] = np.round(rng.uniform(low, high, num_rows), 2)
+    data["estado_filtro"] = pd.Categorical.from_codes(
+        rng.integers(0, len(FILTER_STATES), num_rows, dtype=np.int8), FILTER_STATES)
+    data["consumo_energia_kWh"] = np.round(rng.uniform(*ENERGY_RANGE, num_rows), 2)
+    return pd.DataFrame(data)
+
+
+def generate_dataset(num_records, num_tanks=1, interval_s=600, seed=None,
+                     chunk_rows=CHUNK_ROWS, start_time=None, model="uniforme"):
+    """Genera ``num_records`` lecturas en bloques de ``chunk_rows`` filas (DataFrames).
+
+    ``model="uniforme"`` sortea cada valor de forma independiente en su rango;
+    ``model="fisico"`` usa las series temporales acopladas de ``tank_model``.
+    Con la misma semilla y tamaño de bloque el resultado es reproducible. Si no se
+    indica ``start_time`` la serie termina en el momento actual.
+    """
+    num_ticks = -(-num_records // num_tanks)
+    if start_time is None:
+        start_time = np.datetime64("now", "s") - np.timedelta64((num_ticks - 1) * interval_s, "s")
+    start_time = np.datetime64(start_time, "s")
+
+    if model == "fisico":
+        yield from _generate_physical(num_records, num_tanks, interval_s, seed, chunk_rows, start_time)
+        return
+
+    starts = range(0, num_records, chunk_rows)
+    # Un generador independiente por bloque: reproducible y paralelizable
+    seeds = np.random.SeedSequence(seed).spawn(len(starts))
+    for start_row, chunk_seed in zip(starts, seeds):
+        rng = np.random.default_rng(chunk_seed)
+        yield generate_chunk(rng, start_row, min(chunk_rows, num_records - start_row),
+                             start_time, num_tanks, interval_s)
+
+
+def _generate_physical(num_records, num_tanks, interval_s, seed, chunk_rows, start_time):
+    from tank_model import TankSimulator
+
+    # El simulador avanza un intervalo por paso, así que la primera lectura cae en start_time
+    simulator = TankSimulator(num_tanks, interval_s, start_time - np.timedelta64(interval_s, "s"), seed)
+    steps_per_chunk = max(1, chunk_rows // num_tanks)
+    remaining = num_records
+    while remaining > 0:
+        steps = min(steps_per_chunk, -(-remaining // num_tanks))
+        chunk = simulator.run(steps)
+        if len(chunk) > remaining:
+            chunk = chunk.iloc[:remaining]
+        remaining -= len(chunk)
+        yield chunk
+
+
+def _csv_table(chunk):
+    """Tabla Arrow que se escribe igual que ``DataFrame.to_csv``."""
+    table = pa.Table.from_pandas(chunk, preserve_index=False)
+    for i, field in enumerate(table.schema):
+        if not pa.types.is_floating(field.type):
+            continue
+        # Arrow escribe 67 donde pandas escribe 67.0, y "nan" donde pandas deja la celda vacía
+        values = chunk[field.name].to_numpy()
+        whole, missing = np.floor(values) == values, np.isnan(values)
+        if not whole.any() and not missing.any():
+            continue
+        column = table[i].combine_chunks()
+        text = pc.cast(column, pa.string())
+        if whole.any():
+            mask = pa.array(whole)
+            text = pc.replace_with_mask(text, mask, pc.binary_join_element_wise(
+                pc.cast(column.filter(mask), pa.string()), ".0", ""))
+        if missing.any():
+            text = pc.if_else(pa.array(missing), pa.scalar(None, pa.string()), text)
+        table = table.set_column(i, field.name, text)
+    return table
+
+
+def write_dataset(chunks, csv_path=None, history_path=None):
+    """Escribe los bloques en CSV y/o en el historial Parquet; devuelve las filas escritas."""
+    rows = 0
+    csv_file = csv_writer = None
+    try:
+        for chunk in chunks:
+            if csv_path is not None:
+                # El escritor CSV de Arrow formatea fechas y números en C, sin strftime por fila
+                table = _csv_table(chunk)
+                if csv_writer is None:
+                    # Arrow siempre entrecomilla los nombres de las columnas: la cabecera
+                    # se escribe aparte, sin comillas, como la escribía pandas
+                    csv_file = open(csv_path, "wb")
+                    csv_file.write((",".join(table.column_names) + "\n").encode())
+                    csv_writer = pa_csv.CSVWriter(csv_file, table.schema, write_options=pa_csv.WriteOptions(
+                        include_header=False, quoting_style="none"))
+                csv_writer.write_table(table)
+            if history_path is not None:
+                write_history(chunk, history_path)
+            rows += len(chunk)
+    finally:
+        if csv_writer is not None:
+            csv_writer.close()
+        if csv_file is not None:
+            csv_file.close()
+    return rows
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Simulador de datos del sistema acuapónico")
+    parser.add_argument("--registros", type=int, default=1000, help="número total de filas")
+    parser.add_argument("--tanques", type=int, default=1, help="número de tanques simulados")
+    parser.add_argument("--intervalo", type=int, default=600, help="segundos entre lecturas de un tanque")
+    parser.add_argument("--modelo", choices=["uniforme", "fisico"], default="uniforme",
+                        help="valores independientes o series temporales físicamente plausibles")
+    parser.add_argument("--semilla", type=int, default=None, help="semilla para resultados reproducibles")
+    parser.add_argument("--bloque", type=int, default=CHUNK_ROWS, help="filas por bloque escrito")
+    # El historial Parquet solo crece: cada corrida le agrega sus filas, por eso es opcional
+    parser.add_argument("--formato", choices=["csv", "parquet", "ambos"], default="csv",
+                        help="csv reescribe el archivo; parquet y ambos agregan las filas al historial")
+    parser.add_argument("--salida", default="data", help="carpeta de salida")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
 
-# Crear DataFrame
-df = pd.DataFrame(data)
+    # Crear carpeta data
+    os.makedirs(args.salida, exist_ok=True)
 
-# Crear carpeta data
-if not os.path.exists('data'):
-    os.makedirs('data')
+    csv_path = os.path.join(args.salida, "datos_simulados_sistema_acuaponico.csv")
+    history_path = os.path.join(args.salida, "historial_sensores")
+    chunks = generate_dataset(args.registros, args.tanques, args.intervalo, args.semilla, args.bloque,
+                              model=args.modelo)
+    rows = write_dataset(
+        chunks,
+        csv_path=csv_path if args.formato in ("csv", "ambos") else None,
+        history_path=history_path if args.formato in ("parquet", "ambos") else None,
+    )
+    print(f"{rows:,} filas generadas en {args.salida}")
 
-# Guardar como CSV
-csv_path = 'data/datos_simulados_sistema_acuaponico.csv'
-df.to_csv(csv_path, index=False)
 
-csv_path
\ No newline at end of file
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+# Chunked streaming pipeline for the adjustments report.
+# Reads the sensor CSV a chunk at a time, detects violations per chunk with the
+# vectorized alarm engine and appends them to the output as it goes, so peak
+# memory depends on the chunk size and not on the size of the input file.
+import os
+import time
+
+import pandas as pd
+
+from alarm_engine import ADJUSTMENT_COLUMNS, detect_adjustments
+from excel_export import DEFAULT_LOGO_PATH, TableWriter
+from sensor_schema import TIMESTAMP_COLUMN, read_sensor_csv, timestamp_text
+
+# Rows per CSV chunk; with noisy data each chunk can yield several times as many
+# violation records, so this bounds the peak memory of the whole pipeline
+CHUNK_ROWS = 100_000
+
+# Column widths and logo placement of the xlsx reports
+ADJUSTMENT_WIDTHS = {'marca_de_tiempo': 20, 'parameter': 25, 'current_value': 15, 'target_value': 15, 'adjustment': 30}
+EPISODE_WIDTHS = {'id_tanque': 10, 'parameter': 25, 'side': 8, 'start': 20, 'end': 20, 'adjustment': 30,
+                  **dict.fromkeys(['duration_s', 'peak_value', 'mean_value', 'samples', 'limit', 'target_value'], 12)}
+LOGO_OPTIONS = {'x_scale': 0.3, 'y_scale': 0.3, 'x_offset': 15, 'y_offset': 10}
+
+
+def iter_sensor_chunks(csv_path, parameters, chunksize=CHUNK_ROWS):
+    """Yield compact DataFrames with the timestamp, the tank id (if any) and the given parameter columns only."""
+    yield from read_sensor_csv(csv_path, parameters, chunksize)
+
+
+def stream_adjustments(csv_path, parameter_ranges, chunksize=CHUNK_ROWS):
+    """Yield ``(chunk_rows, adjustments_df)`` for every chunk of the sensor CSV."""
+    for chunk in iter_sensor_chunks(csv_path, list(parameter_ranges), chunksize):
+        yield len(chunk), detect_adjustments(chunk, parameter_ranges)
+
+
+def checked_chunks(chunks, parameter_ranges, sink, summary=None):
+    """Yield every chunk after appending its adjustments to ``sink``.
+
+    A second consumer (the episode detector) can then share the one pass over the
+    input. ``summary`` accumulates ``rows``, ``violations``, ``by_parameter`` and
+    the ``read_s``, ``check_s`` and ``write_s`` seconds.
+    """
+    summary = {} if summary is None else summary
+    for key in ('rows', 'violations', 'read_s', 'check_s', 'write_s'):
+        summary.setdefault(key, 0)
+    by_parameter = summary.setdefault('by_parameter', dict.fromkeys(parameter_ranges, 0))
+    chunks = iter(chunks)
+    while True:
+        clock = time.perf_counter()
+        chunk = next(chunks, None)
+        summary['read_s'] += time.perf_counter() - clock
+        if chunk is None:
+            return
+        clock = time.perf_counter()
+        adjustments = detect_adjustments(chunk, parameter_ranges)
+        summary['check_s'] += time.perf_counter() - clock
+        clock = time.perf_counter()
+        sink.append(adjustments)
+        summary['write_s'] += time.perf_counter() - clock
+        summary['rows'] += len(chunk)
+        summary['violations'] += len(adjustments)
+        for parameter, count in adjustments['parameter'].value_counts().items():
+            by_parameter[parameter] += count
+        yield chunk
+
+
+class CsvSink:
+    """Appends adjustment chunks to a CSV file."""
+
+    def __init__(self, output_path):
+        self.file = open(output_path, 'w', newline='', encoding='utf-8')
+        pd.DataFrame(columns=ADJUSTMENT_COLUMNS).to_csv(self.file, index=False)
+
+    def append(self, adjustments_df):
+        adjustments_df.to_csv(self.file, header=False, index=False)
+
+    def close(self):
+        self.file.close()
+
+
+class XlsxSink(TableWriter):
+    """Appends adjustment chunks to an xlsx file with xlsxwriter's constant-memory mode.
+
+    Rows are flushed to disk as they are written; a new ``Ajustes_N`` sheet is
+    started whenever the current one reaches the Excel row limit. With
+    ``text_timestamps`` the timestamps are written as the text cells the reports
+    of CSV exports have always had, not as dates.
+    """
+
+    def __init__(self, output_path, sheet_name='Ajustes', logo_path=DEFAULT_LOGO_PATH, text_timestamps=False):
+        super().__init__(output_path, ADJUSTMENT_COLUMNS, sheet_name, widths=ADJUSTMENT_WIDTHS,
+                         logo_path=logo_path, logo_cell='F1', logo_options=LOGO_OPTIONS)
+        self.text_timestamps = text_timestamps
+
+    def append(self, adjustments_df):
+        if self.text_timestamps:
+            timestamps = timestamp_text(adjustments_df[TIMESTAMP_COLUMN])
+            adjustments_df = adjustments_df.assign(**{TIMESTAMP_COLUMN: timestamps})
+        super().append(adjustments_df)
+
+
+def open_sink(output_path):
+    extension = os.path.splitext(output_path)[1].lower()
+    if extension == '.csv':
+        return CsvSink(output_path)
+    if extension == '.xlsx':
+        return XlsxSink(output_path, text_timestamps=True)
+    raise ValueError(f"Unsupported output format '{extension}', use .csv or .xlsx")
+
+
+def write_adjustments_report(csv_path, parameter_ranges, output_path, chunksize=CHUNK_ROWS):
+    """Stream ``csv_path`` into an adjustments report; returns rows read and violations written."""
+    summary = {}
+    sink = open_sink(output_path)
+    try:
+        chunks = iter_sensor_chunks(csv_path, list(parameter_ranges), chunksize)
+        for _ in checked_chunks(chunks, parameter_ranges, sink, summary):
+            pass
+    finally:
+        sink.close()
+    return {'rows_read': summary['rows'], 'violations': summary['violations']}
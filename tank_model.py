@@ -0,0 +1,195 @@
+# Physically plausible simulation of N aquaponic tanks.
+# Every tank is a small set of coupled processes advanced one interval at a time
+# (first-order processes use their exact exponential decay, so long intervals stay
+# stable), vectorized across all tanks at once:
+#   - day/night cycle: greenhouse light and ambient temperature follow the sun,
+#     water temperature lags the air, humidity moves opposite to temperature
+#   - dissolved oxygen relaxes towards the temperature-dependent saturation level,
+#     minus fish respiration (higher after feeding) plus some photosynthesis
+#   - scheduled feedings load ammonia, which nitrifies to nitrite (spike a few hours
+#     after each meal) and then to nitrate, taken up by the plants in daylight
+#   - nitrification lowers the pH, the buffer pulls it back towards its setpoint
+#   - evaporation lowers the water level until the automatic top-up refills it
+#   - feed residues clog the filter, reducing the flow until it is cleaned
+import numpy as np
+import pandas as pd
+
+from sensor_schema import SENSOR_COLUMNS
+from simulation_iot import FILTER_STATES
+
+HOUR = 3600.0
+FEEDING_HOURS = np.array([8.0, 13.0, 18.0])
+
+# Measurement noise (standard deviation) of each sensor
+SENSOR_NOISE = {
+    "nivel_de_oxigeno_agua_mg_L": 0.05, "nivel_de_ph": 0.01, "nivel_de_nitratos_ppm": 0.2,
+    "nivel_de_nitritos_ppm": 0.01, "temperatura_agua_C": 0.05, "temperatura_ambiente_C": 0.1,
+    "humedad_ambiente_%": 0.5, "cantidad_alimento_g": 0.0, "flujo_de_agua_L_min": 0.05,
+    "intensidad_de_luz_lux": 200.0, "nivel_de_agua_cm": 0.1, "consumo_energia_kWh": 0.01,
+}
+
+
+def oxygen_saturation(temperature_c):
+    """Dissolved oxygen at saturation (mg/L) in fresh water at sea level."""
+    t = temperature_c
+    return 14.652 - 0.41022 * t + 0.007991 * t ** 2 - 0.000077774 * t ** 3
+
+
+class TankSimulator:
+    """Advances ``num_tanks`` tanks in lockstep, ``interval_s`` simulated seconds per step."""
+
+    def __init__(self, num_tanks=1, interval_s=1.0, start_time=None, seed=None):
+        self.num_tanks = num_tanks
+        self.interval_s = float(interval_s)
+        self.rng = np.random.default_rng(seed)
+        if start_time is None:
+            start_time = np.datetime64("now", "s")
+        self.time = np.datetime64(start_time, "ms")
+        n, rng = num_tanks, self.rng
+
+        # Per-tank constants, so tanks differ but stay within realistic ranges
+        self.peak_lux = rng.uniform(45000, 80000, n)
+        self.mean_ambient = rng.uniform(20, 25, n)
+        self.ambient_swing = rng.uniform(3, 6, n)
+        self.mean_humidity = rng.uniform(55, 70, n)
+        self.aeration = rng.uniform(0.80, 0.95, n)       # fraction of saturation reached
+        self.ration = rng.uniform(60, 90, n)             # grams per feeding
+        self.feed_offset = rng.uniform(-0.25, 0.25, n)   # hours, feeders are not in sync
+        self.setpoint_level = rng.uniform(48, 55, n)
+        self.nominal_flow = rng.uniform(7, 9, n)
+        self.ph_setpoint = rng.uniform(6.9, 7.2, n)
+
+        # State
+        self.ambient_noise = np.zeros(n)
+        self.cloud = np.ones(n)
+        self.water_temp = self.mean_ambient + rng.normal(0, 0.5, n)
+        self.oxygen = self.aeration * oxygen_saturation(self.water_temp)
+        self.ammonia = np.zeros(n)
+        self.nitrite = rng.uniform(0.05, 0.2, n)
+        self.nitrate = rng.uniform(15, 30, n)
+        self.ph = self.ph_setpoint.copy()
+        self.level = self.setpoint_level.copy()
+        self.clogging = rng.uniform(0, 0.5, n)
+        self.last_ration = self.ration.copy()
+        self.digesting = np.zeros(n)                     # respiration load after feeding
+        self.next_feeding = self._next_feeding_time(self._hour_of_day())
+
+    def _hour_of_day(self):
+        seconds = (self.time - self.time.astype("datetime64[D]")) / np.timedelta64(1, "s")
+        return seconds / HOUR
+
+    def _next_feeding_time(self, hour):
+        # Hours until the next scheduled meal of each tank (with its own offset)
+        schedule = FEEDING_HOURS[None, :] + self.feed_offset[:, None]
+        ahead = (schedule - hour) % 24.0
+        ahead[ahead < 1e-9] = 24.0
+        return ahead.min(axis=1)
+
+    def step(self):
+        """Advance one interval; returns ``(timestamp, {column: array per tank})``."""
+        n, rng, dt = self.num_tanks, self.rng, self.interval_s
+        dt_h = dt / HOUR
+        self.time = self.time + np.timedelta64(int(dt * 1000), "ms")
+        hour = self._hour_of_day()
+
+        # Sun and weather: AR(1) cloud cover and ambient temperature noise
+        sun = max(0.0, np.sin(np.pi * (hour - 6.0) / 12.0))
+        persistence = np.exp(-dt_h / 2.0)
+        self.cloud = np.clip(persistence * self.cloud + (1 - persistence) * 0.85
+                             + rng.normal(0, 0.05 * np.sqrt(1 - persistence ** 2), n), 0.3, 1.0)
+        self.ambient_noise = persistence * self.ambient_noise + rng.normal(0, 0.8 * np.sqrt(1 - persistence ** 2), n)
+        light = sun * self.cloud * self.peak_lux
+        ambient = self.mean_ambient + self.ambient_swing * np.sin(2 * np.pi * (hour - 9.0) / 24.0) \
+            + self.ambient_noise + 1.5 * sun * self.cloud
+        humidity = np.clip(self.mean_humidity - 2.5 * (ambient - self.mean_ambient)
+                           + rng.normal(0, 1.0, n), 30, 100)
+
+        # Water temperature follows the air with a ~6 h time constant, heater below 20 °C
+        heater = self.water_temp < 20.0
+        water_target = ambient + 6.0 * 1.5 * heater
+        self.water_temp = water_target + (self.water_temp - water_target) * np.exp(-dt_h / 6.0)
+
+        # Feedings
+        self.next_feeding -= dt_h
+        fed = self.next_feeding <= 0
+        if fed.any():
+            meal = self.ration[fed] * rng.uniform(0.9, 1.1, fed.sum())
+            self.last_ration[fed] = meal
+            self.ammonia[fed] += meal * 0.012
+            self.digesting[fed] += meal / 60.0
+            self.clogging[fed] += meal / 900.0
+            self.next_feeding[fed] = self._next_feeding_time(hour)[fed]
+        self.digesting *= np.exp(-dt_h / 2.0)
+
+        # Oxygen: aeration towards saturation, respiration, photosynthesis
+        saturation = oxygen_saturation(self.water_temp)
+        respiration = 0.35 * (1.0 + self.digesting)
+        oxygen_target = self.aeration * saturation + (0.25 * light / 50000.0 - respiration) / 2.0
+        self.oxygen = np.maximum(oxygen_target + (self.oxygen - oxygen_target) * np.exp(-2.0 * dt_h), 0.0)
+
+        # Nitrogen cycle: ammonia -> nitrite -> nitrate -> plants
+        nitrified_1 = self.ammonia * -np.expm1(-0.9 * dt_h)
+        nitrified_2 = self.nitrite * -np.expm1(-0.5 * dt_h)
+        taken_up = self.nitrate * -np.expm1(-0.04 * dt_h * light / 50000.0)
+        self.ammonia -= nitrified_1
+        self.nitrite += nitrified_1 - nitrified_2
+        self.nitrate += 4.0 * nitrified_2 - taken_up
+
+        # pH: acidified by nitrification, pulled back by the buffer
+        self.ph = self.ph_setpoint + (self.ph - self.ph_setpoint) * np.exp(-0.05 * dt_h) - 0.15 * nitrified_2
+
+        # Water level: evaporation with warm air and light, automatic top-up at -8 cm
+        self.level -= dt_h * (0.05 + 0.01 * np.maximum(ambient - 15.0, 0) + 0.1 * light / 50000.0)
+        refill = self.level < self.setpoint_level - 8.0
+        self.level[refill] = self.setpoint_level[refill]
+
+        # Filter: flow drops as it clogs; operators clean it some hours after the warning
+        needs_cleaning = self.clogging >= 1.0
+        cleaned = needs_cleaning & (rng.random(n) < dt_h / 6.0)
+        self.clogging[cleaned] = rng.uniform(0, 0.1, cleaned.sum())
+        flow = self.nominal_flow * (1.0 - 0.4 * np.minimum(self.clogging, 1.5) / 1.5)
+
+        # Power (kW, i.e. kWh per hour): pump, blower, heater and supplemental lights
+        energy = 0.4 + 0.05 * flow + 2.0 * heater + 1.5 * ((hour > 6) & (hour < 20) & (light < 15000))
+
+        readings = {
+            "nivel_de_oxigeno_agua_mg_L": self.oxygen,
+            "nivel_de_ph": self.ph,
+            "nivel_de_nitratos_ppm": self.nitrate,
+            "nivel_de_nitritos_ppm": self.nitrite,
+            "temperatura_agua_C": self.water_temp,
+            "temperatura_ambiente_C": ambient,
+            "humedad_ambiente_%": humidity,
+            "cantidad_alimento_g": self.last_ration,
+            "flujo_de_agua_L_min": flow,
+            "intensidad_de_luz_lux": light,
+            "nivel_de_agua_cm": self.level,
+            "consumo_energia_kWh": energy,
+        }
+        measured = {
+            column: np.maximum(values + rng.normal(0, SENSOR_NOISE[column], n), 0.0) if SENSOR_NOISE[column] else values.copy()
+            for column, values in readings.items()
+        }
+        measured["estado_filtro"] = needs_cleaning & ~cleaned
+        return self.time, measured
+
+    def run(self, num_steps):
+        """Advance ``num_steps`` intervals; returns a DataFrame ordered by time, then tank."""
+        n = self.num_tanks
+        columns = {column: np.empty((num_steps, n)) for column in SENSOR_COLUMNS}
+        filter_codes = np.empty((num_steps, n), dtype=np.int8)
+        times = np.empty(num_steps, dtype="datetime64[ms]")
+        for i in range(num_steps):
+            times[i], measured = self.step()
+            for column in SENSOR_COLUMNS:
+                columns[column][i] = measured[column]
+            filter_codes[i] = measured["estado_filtro"]
+
+        data = {"marca_de_tiempo": np.repeat(times, n).astype("datetime64[s]")}
+        if n > 1:
+            data["id_tanque"] = np.tile(np.arange(1, n + 1, dtype=np.int32), num_steps)
+        for column in SENSOR_COLUMNS[:-1]:
+            data[column] = np.round(columns[column].ravel(), 2)
+        data["estado_filtro"] = pd.Categorical.from_codes(filter_codes.ravel(), FILTER_STATES)
+        data["consumo_energia_kWh"] = np.round(columns["consumo_energia_kWh"].ravel(), 2)
+        return pd.DataFrame(data)
@@ -0,0 +1,7 @@
+# Make the top-level modules importable when pytest runs from any folder
+import sys
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
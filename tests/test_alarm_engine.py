@@ -0,0 +1,60 @@
+# The vectorized engine returns the same adjustment records, in the same order, as
+# the iterrows loop it replaced, whatever the block size it compares at a time.
+import numpy as np
+import pandas as pd
+
+from alarm_engine import ADJUSTMENT_COLUMNS, compile_ranges, detect_adjustments, find_violations
+from parameter_rules import load_rules
+
+
+def readings(rows=500):
+    rng = np.random.default_rng(11)
+    frame = pd.DataFrame({'marca_de_tiempo': pd.date_range('2024-10-01', periods=rows, freq='15s')})
+    for parameter, limits in load_rules().items():
+        low, high = limits['min'], limits['max']
+        values = rng.uniform(low - (high - low) * 0.3, high + (high - low) * 0.3, rows)
+        values[rng.random(rows) < 0.05] = np.nan
+        # Readings right on the limits are inside the range
+        values[::50] = low
+        values[1::50] = high
+        frame[parameter] = values
+    return frame
+
+
+def iterrows_adjustments(data, parameter_ranges):
+    """The loop of the original report script."""
+    adjustments = []
+    for _, row in data.iterrows():
+        for parameter, limits in parameter_ranges.items():
+            if row[parameter] < limits['min'] or row[parameter] > limits['max']:
+                adjustments.append({
+                    'marca_de_tiempo': row['marca_de_tiempo'],
+                    'parameter': parameter,
+                    'current_value': row[parameter],
+                    'target_value': limits['target'],
+                    'adjustment': limits['adjustment'],
+                })
+    return pd.DataFrame(adjustments, columns=ADJUSTMENT_COLUMNS)
+
+
+def test_matches_iterrows_loop():
+    data, rules = readings(), load_rules()
+    expected = iterrows_adjustments(data, rules)
+    assert len(expected) > 100
+    # From the compiled RuleSet and from a plain dict of ranges
+    pd.testing.assert_frame_equal(detect_adjustments(data, rules), expected, check_dtype=False)
+    pd.testing.assert_frame_equal(detect_adjustments(data, dict(rules)), expected, check_dtype=False)
+
+
+def test_block_size_does_not_change_the_order():
+    data, compiled = readings(), compile_ranges(dict(load_rules()))
+    whole = find_violations(data, compiled)
+    for block_rows in (1, 7, 499):
+        for found, expected in zip(find_violations(data, compiled, block_rows), whole):
+            assert np.array_equal(found, expected)
+
+
+def test_no_violations():
+    data = readings().iloc[::50]
+    found = detect_adjustments(data, load_rules())
+    assert found.empty and list(found.columns) == ADJUSTMENT_COLUMNS
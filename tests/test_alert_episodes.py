@@ -0,0 +1,55 @@
+# The episode detector gives the same episodes, to the last bit of the means, one
+# reading at a time (update), over a whole frame and over any split into chunks.
+import numpy as np
+import pandas as pd
+import pytest
+
+from alert_episodes import AlertEvaluator, detect_episodes, detect_episodes_in_chunks, episodes_frame
+from parameter_rules import load_rules
+
+RULES = load_rules()
+
+
+def readings(rows=3000):
+    rng = np.random.default_rng(3)
+    frame = pd.DataFrame({
+        'marca_de_tiempo': pd.Timestamp('2024-10-01') + pd.to_timedelta(np.arange(rows) // 2 * 10, 's'),
+        'id_tanque': np.arange(rows) % 2 + 1,
+    })
+    for parameter, limits in RULES.items():
+        low, high = limits['min'], limits['max']
+        # Slow swings well past both limits, with noise and missing readings
+        wave = np.sin(np.arange(rows) / 150 + rng.uniform(0, 6)) * (high - low) * 0.8
+        values = (low + high) / 2 + wave + rng.normal(0, (high - low) * 0.02, rows)
+        values[rng.random(rows) < 0.05] = np.nan
+        frame[parameter] = values
+    return frame
+
+
+def streamed(frame):
+    evaluator = AlertEvaluator(RULES)
+    closed = []
+    for row in frame.to_dict('records'):
+        closed.extend(evaluator.update(row['marca_de_tiempo'], row, tank=row['id_tanque']))
+    expected = pd.concat([episodes_frame(closed), evaluator.open_episodes()], ignore_index=True)
+    return expected.sort_values(['start', 'id_tanque', 'parameter'], kind='stable', ignore_index=True)
+
+
+def test_batch_matches_stream():
+    frame = readings()
+    found = detect_episodes(frame, RULES)
+    assert len(found) > 10 and found['end'].isna().any()
+    pd.testing.assert_frame_equal(found, streamed(frame), check_exact=True)
+
+
+@pytest.mark.parametrize('size', [1, 7, 500, 2999])
+def test_chunks_match_whole_frame(size):
+    frame = readings()
+    chunks = (frame.iloc[i:i + size] for i in range(0, len(frame), size))
+    pd.testing.assert_frame_equal(detect_episodes_in_chunks(chunks, RULES), detect_episodes(frame, RULES),
+                                  check_exact=True)
+
+
+def test_no_chunks_give_no_episodes():
+    found = detect_episodes_in_chunks(iter([]), RULES, include_open=False)
+    assert found.empty and list(found.columns) == list(detect_episodes(readings(10), RULES).columns)
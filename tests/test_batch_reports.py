@@ -0,0 +1,35 @@
+# A Parquet sensor store gives one report per tank, or a single report over the
+# whole store when its readings carry no tank ids.
+import numpy as np
+import pandas as pd
+
+from batch_reports import history_jobs, run_batch
+from sensor_schema import SENSOR_COLUMNS
+from sensor_store import write_history
+
+
+def readings(rows=200, tanks=2):
+    position = np.arange(rows)
+    return pd.DataFrame({
+        'marca_de_tiempo': pd.Timestamp('2024-10-01 08:00') + pd.to_timedelta(position // tanks * 15, 's'),
+        'id_tanque': (position % tanks + 1).astype(np.int32),
+        **{column: np.round(10 + 5 * np.sin(position / 20 + i), 2) for i, column in enumerate(SENSOR_COLUMNS)},
+        'estado_filtro': 'Limpio',
+    })
+
+
+def test_one_job_per_tank(tmp_path):
+    root = str(tmp_path / 'historial')
+    write_history(readings(tanks=3), root)
+    assert history_jobs(root) == [(f'tanque_{tank}', root, tank) for tank in (1, 2, 3)]
+
+
+def test_store_without_tanks_is_one_job(tmp_path):
+    root = str(tmp_path / 'historial')
+    write_history(readings().drop(columns='id_tanque'), root)
+    jobs = history_jobs(root)
+    assert jobs == [('historial', root, None)]
+
+    summary_df, _ = run_batch(jobs, str(tmp_path / 'reportes'), workers=1)
+    assert summary_df.loc[0, 'rows'] == 200
+    assert (tmp_path / 'reportes' / 'historial' / 'ajustes.xlsx').exists()
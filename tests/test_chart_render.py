@@ -0,0 +1,57 @@
+# lttb keeps the first and last points and, from every bucket in between, the
+# point of the largest triangle, as the one-bucket-at-a-time algorithm does.
+import numpy as np
+import pytest
+
+from chart_render import lttb
+
+
+def reference_lttb(x, y, max_points):
+    """Largest-Triangle-Three-Buckets one bucket at a time, with the bucket edges of ``lttb``."""
+    n = len(y)
+    edges = np.linspace(1, n - 1, max_points - 1).astype(np.intp)
+    selected, previous = [0], 0
+    for bucket in range(max_points - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        if bucket + 2 < len(edges):
+            following = slice(edges[bucket + 1], edges[bucket + 2])
+            mean_x, mean_y = x[following].mean(), y[following].mean()
+        else:
+            mean_x, mean_y = x[-1], y[-1]
+        best, best_area = start, -1.0
+        for i in range(start, end):
+            area = abs((x[previous] - mean_x) * (y[i] - y[previous]) - (x[previous] - x[i]) * (mean_y - y[previous]))
+            if area > best_area:
+                best, best_area = i, area
+        selected.append(best)
+        previous = best
+    return np.array(selected + [n - 1])
+
+
+@pytest.mark.parametrize('n, max_points', [(10, 3), (1000, 100), (1001, 37), (5000, 999)])
+def test_matches_reference(n, max_points):
+    rng = np.random.default_rng(n)
+    x = np.cumsum(rng.uniform(0.5, 1.5, n))
+    y = np.cumsum(rng.normal(size=n))
+    found = lttb(x, y, max_points)
+    expected = reference_lttb(x, y, max_points)
+    assert len(found) == max_points and found[0] == 0 and found[-1] == n - 1
+    assert np.all(np.diff(found) > 0)
+    assert np.array_equal(found, expected)
+
+
+def test_several_series_share_x():
+    rng = np.random.default_rng(0)
+    x = np.datetime64('2024-10-01T00:00:00', 'ms') + np.arange(2000) * np.timedelta64(3, 's')
+    y = np.cumsum(rng.normal(size=(3, 2000)), axis=1)
+    found = lttb(x, y, 200)
+    assert found.shape == (3, 200)
+    for series in range(3):
+        assert np.array_equal(found[series], lttb(x, y[series], 200))
+
+
+def test_short_series_are_kept_whole():
+    y = np.arange(50.0)
+    assert np.array_equal(lttb(np.arange(50), y, 100), np.arange(50))
+    assert np.array_equal(lttb(np.arange(50), y, None), np.arange(50))
+    assert np.array_equal(lttb(np.arange(50), np.vstack([y, y]), 60), np.tile(np.arange(50), (2, 1)))
@@ -0,0 +1,72 @@
+# Round trip of the xlsx writer: workbooks written through the bulk path (raw row
+# XML on top of xlsxwriter internals) must reopen with the same cells and styles as
+# the ones written with xlsxwriter's public write_* calls.
+import datetime
+
+import numpy as np
+import openpyxl
+import pandas as pd
+import pytest
+
+import excel_export
+from excel_export import EXCEL_MAX_STRING, TableWriter
+
+
+def sample_frame():
+    return pd.DataFrame({
+        'number': [1.5, np.nan, -2.0, 1e-7, 123456789.125],
+        'integer': np.arange(5, dtype=np.int64),
+        'text': ['a<b & "c"', ' leading', 'trailing ', 'control\x01char', 'x' * (EXCEL_MAX_STRING + 10)],
+        'flag': [True, False, True, True, False],
+        'when': pd.to_datetime(['2024-10-01 08:00:00', None, '2024-10-02 23:59:59', '2024-10-03 00:00:00', '2024-10-04 12:30:00']),
+        'state': pd.Categorical(['Clean', 'Needs Cleaning', 'Clean', None, 'Clean']),
+        'mixed': [1, 'a', None, 2.5, True],
+    })
+
+
+def write(path, frame, bulk, monkeypatch, **options):
+    if not bulk:
+        monkeypatch.setattr(excel_export, 'BULK_XLSXWRITER_VERSIONS', set())
+    with TableWriter(path, frame.columns, 'Datos', widths={'text': 30}, **options) as writer:
+        writer.append(frame.iloc[:2])
+        writer.append(frame.iloc[2:])
+    assert writer.bulk is bulk
+    monkeypatch.undo()
+    return writer
+
+
+def cells(path):
+    """Value and style of every cell; blanks by value only (write_blank skips blanks without a format)."""
+    workbook = openpyxl.load_workbook(path)
+    return {sheet.title: [[(cell.value, cell.number_format, cell.border.left.style) if cell.value is not None
+                           else None for cell in row]
+                          for row in sheet.iter_rows()]
+            for sheet in workbook.worksheets}
+
+
+@pytest.mark.parametrize('options', [{}, {'max_rows': 2, 'title': 'Reporte', 'cell_format': {'border': 1},
+                                          'header_format': {'bold': True}}])
+def test_bulk_path_matches_public_writes(tmp_path, monkeypatch, options):
+    frame = sample_frame()
+    write(tmp_path / 'bulk.xlsx', frame, True, monkeypatch, **options)
+    write(tmp_path / 'public.xlsx', frame, False, monkeypatch, **options)
+    assert cells(tmp_path / 'bulk.xlsx') == cells(tmp_path / 'public.xlsx')
+
+
+def test_bulk_round_trip_values(tmp_path, monkeypatch):
+    frame = sample_frame()
+    writer = write(tmp_path / 'bulk.xlsx', frame, True, monkeypatch, max_rows=3)
+    assert writer.sheets == 2
+    workbook = openpyxl.load_workbook(tmp_path / 'bulk.xlsx')
+    assert workbook.sheetnames == ['Datos', 'Datos_2']
+    rows = [row for sheet in workbook.worksheets for row in sheet.iter_rows(min_row=2, values_only=True)]
+    assert [row[0] for row in rows] == [1.5, None, -2.0, 1e-7, 123456789.125]
+    assert [row[1] for row in rows] == [0, 1, 2, 3, 4]
+    assert [row[2] for row in rows[:3]] == ['a<b & "c"', ' leading', 'trailing ']
+    assert len(rows[4][2]) == EXCEL_MAX_STRING
+    assert [row[3] for row in rows] == [True, False, True, True, False]
+    assert rows[0][4] == datetime.datetime(2024, 10, 1, 8) and rows[1][4] is None
+    assert [row[5] for row in rows] == ['Clean', 'Needs Cleaning', 'Clean', None, 'Clean']
+    assert [row[6] for row in rows] == [1, 'a', None, 2.5, True]
+    assert workbook['Datos'].auto_filter.ref == 'A1:G4'
+    assert workbook['Datos'].cell(2, 5).number_format == excel_export.DATETIME_FORMAT
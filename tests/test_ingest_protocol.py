@@ -0,0 +1,108 @@
+# Batches survive the binary and JSON encodings unchanged, invalid rows are
+# dropped and counted, and malformed input raises ProtocolError.
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import ingest_protocol as proto
+from simulation_iot import generate_chunk
+
+
+def readings(rows=50, num_tanks=2):
+    return generate_chunk(np.random.default_rng(1), 0, rows, np.datetime64('2024-10-01'), num_tanks=num_tanks)
+
+
+def assert_same_readings(decoded, sent):
+    assert decoded[proto.TIMESTAMP_FIELD].tolist() == sent[proto.TIMESTAMP_FIELD].tolist()
+    for field in proto.NUMERIC_FIELDS:
+        assert np.array_equal(decoded[field].to_numpy(), sent[field].to_numpy(np.float64)), field
+    assert decoded[proto.FILTER_FIELD].astype(str).tolist() == sent[proto.FILTER_FIELD].astype(str).tolist()
+
+
+@pytest.mark.parametrize('num_tanks', [1, 3])
+def test_binary_round_trip(num_tanks):
+    sent = readings(num_tanks=num_tanks)
+    packet = proto.encode_publish(sent, packet_id=7, topic='acuaponia/tanque')
+    packet_type, body = proto.read_packet_sync(io.BytesIO(packet))
+    topic, packet_id, offset = proto.decode_publish(body)
+    decoded, rejected = proto.decode_batch(body, offset)
+
+    assert (packet_type, topic, packet_id, rejected) == (proto.PUBLISH, 'acuaponia/tanque', 7, 0)
+    assert_same_readings(decoded, sent)
+    if num_tanks > 1:
+        assert decoded[proto.TANK_FIELD].tolist() == sent[proto.TANK_FIELD].tolist()
+    else:
+        assert proto.TANK_FIELD not in decoded
+
+
+def test_json_round_trip():
+    sent = readings()
+    decoded, rejected = proto.decode_json(proto.encode_json(sent))
+    assert rejected == 0
+    assert_same_readings(decoded, sent)
+    # One object per reading decodes to the same batch as the columns
+    rows = sent.assign(marca_de_tiempo=sent['marca_de_tiempo'].astype(str)).to_dict('records')
+    by_rows, _ = proto.decode_json(proto.dumps(rows))
+    pd.testing.assert_frame_equal(by_rows, decoded)
+
+
+def test_invalid_rows_are_dropped_and_counted():
+    sent = readings(10)
+    columns = {field: sent[field].tolist() for field in sent.columns if field != proto.TIMESTAMP_FIELD}
+    columns[proto.TIMESTAMP_FIELD] = sent[proto.TIMESTAMP_FIELD].astype(str).tolist()
+    columns[proto.TIMESTAMP_FIELD][0] = 'ayer'
+    columns['nivel_de_ph'][1] = 15.0
+    columns['temperatura_agua_C'][2] = 'caliente'
+    columns[proto.FILTER_FIELD][3] = 'Roto'
+    columns[proto.TANK_FIELD][4] = -1
+    decoded, rejected = proto.validate_readings(columns)
+    assert rejected == 5
+    assert_same_readings(decoded, sent.iloc[5:])
+
+
+def test_empty_batches():
+    for payload in (b'[]', proto.dumps({field: [] for field in [proto.TIMESTAMP_FIELD, *proto.SENSOR_FIELDS]})):
+        decoded, rejected = proto.decode_json(payload)
+        assert decoded.empty and rejected == 0
+        assert list(decoded.columns) == list(proto.empty_batch().columns)
+
+
+@pytest.mark.parametrize('payload', [
+    b'{"marca_de_tiempo": ',                                # not JSON
+    b'42',                                                  # not readings
+    b'{"marca_de_tiempo": [1, 2], "nivel_de_ph": [7]}',     # ragged columns
+    b'{"marca_de_tiempo": "2024-10-01"}',                   # missing fields
+])
+def test_malformed_json(payload):
+    with pytest.raises(proto.ProtocolError):
+        proto.decode_json(payload)
+
+
+def test_malformed_packets():
+    batch = proto.encode_batch(readings(4))
+    with pytest.raises(proto.ProtocolError):
+        proto.decode_batch(batch[:-1])
+    with pytest.raises(proto.ProtocolError):
+        proto.decode_publish(proto.encode_topic('acuaponia')[:4])
+    # Remaining length over four bytes, and a stream closed inside a packet
+    with pytest.raises(proto.ProtocolError):
+        proto.read_packet_sync(io.BytesIO(bytes([proto.PUBLISH << 4]) + b'\xff' * 5))
+    with pytest.raises(proto.ProtocolError):
+        proto.read_packet_sync(io.BytesIO(proto.encode_packet(proto.PUBLISH, batch)[:-1]))
+
+
+@pytest.mark.parametrize('size', [0, 127, 128, 16_383, 16_384, 2_097_152])
+def test_remaining_length_round_trip(size):
+    # Sizes at the edges of one to four length bytes
+    body = b'x' * size
+    assert proto.read_packet_sync(io.BytesIO(proto.encode_packet(proto.PINGREQ, body))) == (proto.PINGREQ, body)
+
+
+def test_topic_filters():
+    assert proto.topic_matches('#', 'acuaponia/lecturas')
+    assert proto.topic_matches('acuaponia/+', 'acuaponia/lecturas')
+    assert not proto.topic_matches('acuaponia/+', 'acuaponia/lecturas/1')
+    assert proto.topic_matches('acuaponia/#', 'acuaponia/lecturas/1')
+    assert not proto.topic_matches('acuaponia/lecturas', 'acuaponia')
@@ -0,0 +1,76 @@
+# Ingestion server edge cases: a JSON line over the stream limit is rejected and
+# its connection closed without breaking the server, and a group whose history
+# write fails halfway is stored exactly once after the retry.
+import asyncio
+from functools import partial
+
+import numpy as np
+
+import ingest_protocol as proto
+import ingest_server
+import sensor_store
+from ingest_server import IngestServer, store_readings
+from sensor_store import read_history
+from simulation_iot import generate_chunk
+
+
+def json_batch(rows=20):
+    readings = generate_chunk(np.random.default_rng(0), 0, rows, np.datetime64('2024-10-01'), num_tanks=2)
+    return proto.encode_json(readings)
+
+
+async def send_lines(port, *lines):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    writer.write(b''.join(lines))
+    writer.write_eof()
+    await writer.drain()
+    answers = (await reader.read()).splitlines()
+    writer.close()
+    return [proto.loads(answer) for answer in answers]
+
+
+def test_oversized_json_line_is_rejected(monkeypatch):
+    monkeypatch.setattr(ingest_server, 'STREAM_LIMIT', 4096)
+
+    async def scenario():
+        server = IngestServer(flush_interval_s=0.01)
+        await server.start(port=0)
+        rejected = await send_lines(server.port, b'{"x": "' + b'a' * 10_000 + b'"}\n')
+        accepted = await send_lines(server.port, json_batch() + b'\n')
+        await server.close()
+        return rejected, accepted, server.stats
+
+    rejected, accepted, stats = asyncio.run(scenario())
+    assert len(rejected) == 1 and 'error' in rejected[0]
+    assert accepted == [{'aceptadas': 20, 'rechazadas': 0}]
+    assert stats['accepted'] == 20
+
+
+def test_retried_write_is_stored_once(tmp_path, monkeypatch):
+    root = str(tmp_path / 'historial')
+    monkeypatch.setattr(ingest_server, 'RETRY_DELAY_S', 0.01)
+    append_index = sensor_store._append_index
+    calls = []
+
+    def fail_once(*args):
+        # The day files are written, the index entries are not
+        calls.append(args)
+        if len(calls) == 1:
+            raise OSError('disk full')
+        append_index(*args)
+
+    monkeypatch.setattr(sensor_store, '_append_index', fail_once)
+
+    async def scenario():
+        server = IngestServer(partial(store_readings, history_root=root), flush_interval_s=0.01)
+        await server.start(port=0)
+        await send_lines(server.port, json_batch() + b'\n')
+        while not server.stats['written']:
+            await asyncio.sleep(0.01)
+        await server.close()
+        return server.stats
+
+    stats = asyncio.run(scenario())
+    assert stats['write_errors'] == 1 and stats['written'] == 20
+    assert len(read_history(root)) == 20
+    assert len(sensor_store.open_history(root).files) == 1
@@ -0,0 +1,83 @@
+# load_rules picks up edits to the rules file without a restart and keeps the last
+# good rules while the file is invalid or briefly missing.
+import json
+import os
+import shutil
+
+import pytest
+
+from parameter_rules import DEFAULT_RULES_PATH, load_rules, parse_rules
+
+
+@pytest.fixture
+def rules_path(tmp_path):
+    path = tmp_path / 'reglas.json'
+    shutil.copy(DEFAULT_RULES_PATH, path)
+    return str(path)
+
+
+def edit(path, change=None, text=None):
+    """Write ``text``, or the bundled rules after ``change``, over ``path``."""
+    if text is None:
+        with open(DEFAULT_RULES_PATH, encoding='utf-8') as f:
+            document = json.load(f)
+        change(document)
+        text = json.dumps(document)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(text)
+    # A new signature even within the file system's timestamp resolution
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+
+
+def set_ph_max(value):
+    def change(document):
+        next(rule for rule in document['rules'] if rule['column'] == 'nivel_de_ph')['max'] = value
+    return change
+
+
+def test_unchanged_file_is_not_reparsed(rules_path):
+    assert load_rules(rules_path) is load_rules(rules_path)
+
+
+def test_edits_are_picked_up(rules_path):
+    assert load_rules(rules_path)['nivel_de_ph']['max'] == 7.5
+    edit(rules_path, set_ph_max(7.8))
+    rules = load_rules(rules_path)
+    assert rules['nivel_de_ph']['max'] == 7.8
+    assert rules.out_of_range({'nivel_de_ph': 7.7}) == []
+
+
+def test_bad_edits_keep_the_last_good_rules(rules_path):
+    good = load_rules(rules_path)
+    edit(rules_path, text='{"rules": [')
+    assert load_rules(rules_path) is good
+    edit(rules_path, set_ph_max(6.0))   # max below the target
+    assert load_rules(rules_path) is good
+    os.remove(rules_path)
+    assert load_rules(rules_path) is good
+    # Fixed again
+    edit(rules_path, set_ph_max(7.8))
+    assert load_rules(rules_path)['nivel_de_ph']['max'] == 7.8
+
+
+def test_first_load_of_a_bad_file_raises(tmp_path):
+    path = tmp_path / 'reglas.json'
+    path.write_text('{}', encoding='utf-8')
+    with pytest.raises(ValueError):
+        load_rules(str(path))
+    with pytest.raises(OSError):
+        load_rules(str(tmp_path / 'no_existe.json'))
+
+
+@pytest.mark.parametrize('change', [
+    lambda rules: rules[0].pop('target'),
+    lambda rules: rules.append(dict(rules[0])),
+    lambda rules: rules[0].update(min='bajo'),
+])
+def test_invalid_rules(change):
+    with open(DEFAULT_RULES_PATH, encoding='utf-8') as f:
+        document = json.load(f)
+    change(document['rules'])
+    with pytest.raises(ValueError):
+        parse_rules(document)
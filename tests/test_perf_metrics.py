@@ -0,0 +1,43 @@
+# The process memory gauge falls back to getrusage where /proc is missing, in the
+# units of each platform, and is left out where neither exists (Windows).
+import builtins
+import sys
+import types
+
+import perf_metrics
+from perf_metrics import Metrics, process_rss_bytes
+
+
+def without_proc(monkeypatch):
+    real_open = builtins.open
+
+    def fake_open(path, *args, **kwargs):
+        if str(path).startswith('/proc/'):
+            raise FileNotFoundError(path)
+        return real_open(path, *args, **kwargs)
+
+    monkeypatch.setattr(builtins, 'open', fake_open)
+
+
+def fake_resource(maxrss):
+    usage = types.SimpleNamespace(ru_maxrss=maxrss)
+    return types.SimpleNamespace(RUSAGE_SELF=0, getrusage=lambda who: usage)
+
+
+def test_peak_rss_units(monkeypatch):
+    without_proc(monkeypatch)
+    monkeypatch.setitem(sys.modules, 'resource', fake_resource(2048))
+    monkeypatch.setattr(perf_metrics.sys, 'platform', 'linux')
+    assert process_rss_bytes() == 2048 * 1024
+    monkeypatch.setattr(perf_metrics.sys, 'platform', 'darwin')
+    assert process_rss_bytes() == 2048
+
+
+def test_no_rss_without_resource(monkeypatch):
+    without_proc(monkeypatch)
+    # None in sys.modules makes the import raise ImportError
+    monkeypatch.setitem(sys.modules, 'resource', None)
+    assert process_rss_bytes() is None
+    metrics = Metrics()
+    assert 'process_rss_bytes' not in metrics.snapshot()['gauges']
+    assert 'None' not in metrics.prometheus()
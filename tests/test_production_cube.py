@@ -0,0 +1,69 @@
+# The production cube answers the historical page's totals, averages and detail
+# rows as filtering and aggregating the rows would, also after rows are appended.
+import numpy as np
+import pandas as pd
+import pytest
+
+import production_cube
+from production_cube import MEAN_COLUMNS, SUM_COLUMNS, ProductionCube, cube_for
+
+
+def production(rows=400, seed=0):
+    rng = np.random.default_rng(seed)
+    frame = pd.DataFrame({
+        'fecha_año': rng.choice([2023, 2024], rows),
+        'fecha_mes': rng.integers(1, 13, rows),
+        'tipo': rng.choice(['Tilapia', 'Lechuga', 'Albahaca'], rows),
+        **{column: rng.uniform(0, 100, rows) for column in SUM_COLUMNS + MEAN_COLUMNS},
+    })
+    for column in MEAN_COLUMNS:
+        frame.loc[rng.random(rows) < 0.2, column] = np.nan
+    return frame
+
+
+def expected_totals(frame, year, month, tipos):
+    rows = frame[(frame['fecha_año'] == year) & (frame['fecha_mes'] == month) & frame['tipo'].isin(tipos)]
+    return rows, {**{column: rows[column].sum() for column in SUM_COLUMNS},
+                  **{column: rows[column].mean() for column in MEAN_COLUMNS}}
+
+
+@pytest.mark.parametrize('tipos', [['Tilapia'], ['Lechuga', 'Albahaca'], ['Tilapia', 'Lechuga', 'Albahaca']])
+def test_selection_matches_the_rows(tipos):
+    frame = production()
+    cube = ProductionCube.from_frame(frame)
+    for year in cube.years:
+        for month in cube.months:
+            rows, expected = expected_totals(frame, year, month, tipos)
+            totals = ProductionCube.totals(cube.select(year, month, tipos))
+            assert totals == pytest.approx(expected, nan_ok=True)
+            pd.testing.assert_frame_equal(cube.select_rows(frame, year, month, tipos), rows)
+
+
+def test_appended_rows_fold_into_the_groups():
+    frame = pd.concat([production(), production(100, seed=1)], ignore_index=True)
+    cube = ProductionCube.from_frame(frame.iloc[:400])
+    cube.add_rows(frame.iloc[400:])
+    whole = ProductionCube.from_frame(frame)
+    pd.testing.assert_frame_equal(cube.cells, whole.cells)
+    assert (cube.years, cube.months, cube.tipos) == (whole.years, whole.months, whole.tipos)
+    assert cube.tipos == list(frame['tipo'].unique())
+    rows, _ = expected_totals(frame, 2024, 3, ['Tilapia'])
+    pd.testing.assert_frame_equal(cube.select_rows(frame, 2024, 3, ['Tilapia']), rows)
+
+
+def test_cube_for_reuses_the_cube(monkeypatch):
+    monkeypatch.setattr(production_cube, '_cubes', {})
+    frame = production()
+    cube = cube_for(frame)
+    assert cube_for(frame) is cube
+    longer = pd.concat([frame, production(50, seed=2)], ignore_index=True)
+    assert cube_for(longer) is cube and cube.rows == 450
+    # Different rows: built again
+    assert cube_for(production(seed=3)) is not cube
+
+
+def test_empty_selection():
+    cube = ProductionCube.from_frame(production())
+    totals = ProductionCube.totals(cube.select(1999, 1, ['Tilapia']))
+    assert all(totals[column] == 0 for column in SUM_COLUMNS)
+    assert all(np.isnan(totals[column]) for column in MEAN_COLUMNS)
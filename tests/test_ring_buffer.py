@@ -0,0 +1,57 @@
+# The ring buffers hold the latest ``capacity`` values in order, like a bounded
+# deque, and hand out read-only windows.
+from collections import deque
+
+import numpy as np
+import pytest
+
+from ring_buffer import RingBuffer, SensorHistory
+
+
+@pytest.mark.parametrize('capacity', [1, 5, 64])
+def test_matches_a_bounded_deque(capacity):
+    rng = np.random.default_rng(capacity)
+    buffer, expected = RingBuffer(capacity), deque(maxlen=capacity)
+    for step in range(200):
+        if rng.random() < 0.5:
+            value = rng.normal()
+            buffer.append(value)
+            expected.append(value)
+        else:
+            # Batches shorter and longer than the capacity
+            values = rng.normal(size=rng.integers(0, 2 * capacity + 2))
+            buffer.extend(values)
+            expected.extend(values)
+        assert buffer.view().tolist() == list(expected)
+        assert len(buffer) == len(expected)
+        n = int(rng.integers(0, capacity + 2))
+        assert buffer.view(n).tolist() == list(expected)[max(0, len(expected) - n):]
+        assert buffer.last() == (expected[-1] if expected else None)
+        assert buffer.previous() == (expected[-2] if len(expected) > 1 else None)
+
+
+def test_windows_are_read_only_views():
+    buffer = RingBuffer(4)
+    buffer.extend([1.0, 2.0, 3.0])
+    window = buffer.view()
+    with pytest.raises(ValueError):
+        window[0] = 0.0
+    assert buffer.last(default=-1.0) == 3.0 and RingBuffer(2).last(default=-1.0) == -1.0
+    with pytest.raises(ValueError):
+        RingBuffer(0)
+
+
+def test_sensor_history_window_and_resize():
+    history = SensorHistory(['nivel_de_ph', 'temperatura_agua_C'], 10)
+    timestamps = np.datetime64('2024-10-01T00:00:00', 'ms') + np.arange(25) * np.timedelta64(1, 's')
+    history.extend(timestamps[:20], {'nivel_de_ph': np.arange(20.0), 'temperatura_agua_C': -np.arange(20.0)})
+    for i in range(20, 25):
+        history.append(timestamps[i], {'nivel_de_ph': float(i), 'temperatura_agua_C': -float(i)})
+
+    window_times, values = history.window(3)
+    assert window_times.tolist() == timestamps[-3:].tolist()
+    assert values['nivel_de_ph'].tolist() == [22.0, 23.0, 24.0]
+    smaller = history.resized(4)
+    assert len(smaller) == 4 and smaller.window()[1]['temperatura_agua_C'].tolist() == [-21.0, -22.0, -23.0, -24.0]
+    larger = history.resized(40)
+    assert len(larger) == 10 and larger.window()[0].tolist() == timestamps[-10:].tolist()
@@ -0,0 +1,62 @@
+# The anomaly detectors give the same records, bit for bit, one reading at a time
+# (update), over a whole frame and over any split into chunks.
+import numpy as np
+import pandas as pd
+import pytest
+
+from sensor_anomalies import AnomalyDetector, anomalies_frame, detect_anomalies, detect_anomalies_in_chunks
+
+SENSORS = ['nivel_de_ph', 'temperatura_agua_C', 'nivel_de_agua_cm']
+# Short spans so a small frame reaches every detector
+OPTIONS = {'baseline_span': 50, 'variance_span': 200, 'ewma_span': 10, 'warmup': 20, 'stuck_samples': 15,
+           'max_rates': {'temperatura_agua_C': 0.5}}
+
+
+def readings(rows=2000):
+    rng = np.random.default_rng(5)
+    frame = pd.DataFrame({
+        'marca_de_tiempo': pd.Timestamp('2024-10-01') + pd.to_timedelta(np.arange(rows) // 2 * 10, 's'),
+        'id_tanque': np.arange(rows) % 2 + 1,
+        'nivel_de_ph': 7 + rng.normal(0, 0.05, rows),
+        'temperatura_agua_C': 24 + rng.normal(0, 0.2, rows),
+        'nivel_de_agua_cm': 50 + rng.normal(0, 0.5, rows),
+    })
+    frame.loc[:99, 'temperatura_agua_C'] = 24.0                          # steady start
+    frame.loc[300:301, 'nivel_de_ph'] = 9.0                               # spike
+    frame.loc[800:1000, 'temperatura_agua_C'] += np.linspace(0, 3, 201)  # drift
+    frame.loc[1200:1260, 'nivel_de_agua_cm'] = 50.0                      # frozen probe
+    frame.loc[1500, 'temperatura_agua_C'] = 60.0                         # jump
+    frame.loc[np.random.default_rng(6).random(rows) < 0.03, 'nivel_de_ph'] = np.nan
+    return frame
+
+
+def streamed(frame):
+    detector = AnomalyDetector(SENSORS, **OPTIONS)
+    records = []
+    for row in frame.to_dict('records'):
+        records.extend(detector.update(row['marca_de_tiempo'], row, tank=row['id_tanque']))
+    return anomalies_frame(records), detector
+
+
+@pytest.mark.parametrize('rows', [100, 2000])
+def test_batch_matches_stream(rows):
+    frame = readings().iloc[:rows]
+    detector = AnomalyDetector(SENSORS, **OPTIONS)
+    found = detector.update_frame(frame)
+    expected, stream_detector = streamed(frame)
+    pd.testing.assert_frame_equal(found, expected, check_exact=True)
+    # The carried state too, so the next readings are judged the same way
+    for tank, state in detector.tanks.items():
+        assert vars(state) == vars(stream_detector.tanks[tank])
+
+
+def test_every_detector_fires():
+    assert set(detect_anomalies(readings(), SENSORS, **OPTIONS)['kind']) == {'zscore', 'ewma', 'rate', 'stuck'}
+
+
+@pytest.mark.parametrize('size', [7, 33, 1999])
+def test_chunks_match_whole_frame(size):
+    frame = readings()
+    chunks = (frame.iloc[i:i + size] for i in range(0, len(frame), size))
+    pd.testing.assert_frame_equal(detect_anomalies_in_chunks(chunks, SENSORS, **OPTIONS),
+                                  detect_anomalies(frame, SENSORS, **OPTIONS), check_exact=True)
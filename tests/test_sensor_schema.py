@@ -0,0 +1,94 @@
+# Readings off the two-decimal grid of the CSV exports (sensors and the physical
+# simulator report any precision) must reach the alarms and the rollups unchanged
+# through the history, and the CSV loader must only downcast the columns it can
+# widen back exactly. The reports of a CSV export keep its timestamps as text.
+import numpy as np
+import openpyxl
+import pandas as pd
+
+import getInfoRMDesition
+from alarm_engine import detect_adjustments
+from parameter_rules import load_rules
+from sensor_rollups import RollupStore, rebuild_from_history
+from sensor_schema import SENSOR_COLUMNS, read_sensor_csv, timestamp_text
+from sensor_store import read_history, write_history
+
+
+def readings(rows=240):
+    rng = np.random.default_rng(7)
+    frame = pd.DataFrame({
+        'marca_de_tiempo': pd.Timestamp('2024-10-01 08:00') + pd.to_timedelta(np.arange(rows) // 2 * 15, 's'),
+        'id_tanque': (np.arange(rows) % 2 + 1).astype(np.int32),
+        **{column: rng.uniform(10, 20, rows) for column in SENSOR_COLUMNS},
+        'estado_filtro': 'Limpio',
+    })
+    frame['nivel_de_ph'] = 7.0
+    # Above the 7.5 limit, but 7.50 once rounded to two decimals
+    frame.loc[10, 'nivel_de_ph'] = 7.504
+    return frame
+
+
+def ph_adjustments(frame):
+    report = detect_adjustments(frame, load_rules())
+    return report.loc[report['parameter'] == 'nivel_de_ph', 'current_value'].tolist()
+
+
+def test_history_keeps_readings_off_the_grid(tmp_path):
+    root = str(tmp_path / 'historial')
+    frame = readings()
+    write_history(frame, root)
+    history = read_history(root)
+
+    assert history['nivel_de_ph'].dtype == np.float64
+    assert history['nivel_de_ph'].max() == 7.504
+    assert ph_adjustments(history) == [7.504]
+
+
+def test_live_and_rebuilt_rollups_agree(tmp_path):
+    root = str(tmp_path / 'historial')
+    frame = readings()
+    write_history(frame, root)
+    live = RollupStore(str(tmp_path / 'vivo'))
+    live.update(frame)
+    rebuild_from_history(root, str(tmp_path / 'reconstruido'))
+    rebuilt = RollupStore(str(tmp_path / 'reconstruido'))
+
+    for tier in live.tiers:
+        pd.testing.assert_frame_equal(live.read(tier), rebuilt.read(tier))
+
+
+def test_csv_downcasts_only_exact_columns(tmp_path):
+    path = tmp_path / 'sensores.csv'
+    frame = readings().round(2)
+    frame['nivel_de_ph'] = readings()['nivel_de_ph']
+    frame['intensidad_de_luz_lux'] = 199999.99
+    frame.to_csv(path, index=False)
+    loaded = read_sensor_csv(path)
+
+    assert loaded['nivel_de_oxigeno_agua_mg_L'].dtype == np.float32
+    # Three decimals, and a value float32 cannot hold to the second decimal
+    assert loaded['nivel_de_ph'].dtype == np.float64
+    assert loaded['intensidad_de_luz_lux'].dtype == np.float64
+    assert ph_adjustments(loaded) == [7.504]
+
+
+def test_csv_timestamps_back_to_text():
+    text = ['2024-10-01 08:00:00', '2024-12-31 23:59:59']
+    assert timestamp_text(pd.to_datetime(text)).tolist() == text
+    # Fractions of a second, as pandas writes them to the CSV
+    fractional = pd.Series(pd.to_datetime(['2024-10-01 08:00:00.500', '2024-10-01 08:00:01.000']))
+    assert timestamp_text(fractional).tolist() == fractional.to_csv(index=False).splitlines()[1:]
+
+
+def test_csv_reports_keep_text_timestamps(tmp_path, monkeypatch):
+    path = tmp_path / 'sensores.csv'
+    readings().round(2).to_csv(path, index=False)
+    expected = pd.read_csv(path)['marca_de_tiempo'][10]
+    for threshold in (None, 0):
+        if threshold is not None:
+            # The chunked branch of large exports
+            monkeypatch.setattr(getInfoRMDesition, 'STREAMING_THRESHOLD_BYTES', threshold)
+        adjustments_path, _ = getInfoRMDesition.write_reports(str(path), str(tmp_path / 'reportes'), load_rules())
+        cells = [row[0] for row in openpyxl.load_workbook(adjustments_path).active.iter_rows(min_row=2)]
+        assert all(cell.data_type == 's' for cell in cells)
+        assert expected in [cell.value for cell in cells]
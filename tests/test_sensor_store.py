@@ -0,0 +1,72 @@
+# Many small appends (one per ingestion batch) must keep the block index and the
+# reads exact while compact_history merges part files and index fragments, and
+# files written without footer statistics must still be indexed.
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+
+import sensor_store
+from history_scan import history_chunks
+from sensor_schema import SENSOR_COLUMNS
+from sensor_store import MAX_INDEX_FRAGMENTS, build_index, load_index, open_history, read_history, write_history
+
+
+def batch(number, rows=50):
+    position = np.arange(number * rows, (number + 1) * rows)
+    return pd.DataFrame({
+        'marca_de_tiempo': pd.Timestamp('2024-10-01 23:50') + pd.to_timedelta(position // 2 * 10, 's'),
+        'id_tanque': (position % 2 + 1).astype(np.int32),
+        **{column: np.round(np.sin(position + i), 2) for i, column in enumerate(SENSOR_COLUMNS)},
+        'estado_filtro': np.where(position % 3, 'Clean', 'Needs Cleaning'),
+    })
+
+
+def test_small_writes_are_compacted(tmp_path):
+    root = str(tmp_path / 'historial')
+    writes = 2 * MAX_INDEX_FRAGMENTS + 5
+    for number in range(writes):
+        write_history(batch(number), root)
+
+    fragments = [name for name in os.listdir(root) if name.startswith('_index~')]
+    assert len(fragments) < MAX_INDEX_FRAGMENTS
+    parts = sum(len(files) for _, _, files in os.walk(root)) - len(fragments) - 1
+    assert parts < writes / 2
+
+    expected = pd.concat([batch(number) for number in range(writes)], ignore_index=True)
+    found = read_history(root, ['nivel_de_ph'], tanks=[2])
+    expected = expected[expected['id_tanque'] == 2]
+    assert found['marca_de_tiempo'].tolist() == expected['marca_de_tiempo'].tolist()
+    assert np.array_equal(found['nivel_de_ph'].to_numpy(np.float64).round(2), expected['nivel_de_ph'].to_numpy())
+
+    # A new process sees the same index as the writer's cache
+    blocks = len(load_index(root))
+    sensor_store._INDEX_CACHE.clear()
+    assert len(load_index(root)) == blocks
+
+
+def test_files_without_statistics_are_indexed(tmp_path):
+    root = str(tmp_path / 'historial')
+    frame = pd.concat([batch(number) for number in range(4)], ignore_index=True)
+    write_history(frame, root)
+    # As written by a tool that leaves the statistics out of the footer
+    for path in open_history(root).files:
+        pq.write_table(pq.read_table(path, partitioning=None), path, row_group_size=60, write_statistics=False)
+    build_index(root)
+
+    start, end = frame['marca_de_tiempo'].iloc[[50, 150]]
+    found = read_history(root, ['nivel_de_ph'], start, end, tanks=[2])
+    expected = frame[(frame['marca_de_tiempo'] >= start) & (frame['marca_de_tiempo'] < end) & (frame['id_tanque'] == 2)]
+    assert found['marca_de_tiempo'].tolist() == expected['marca_de_tiempo'].tolist()
+
+
+def test_history_chunks_find_tanks_stored_after_the_first_file(tmp_path):
+    root = str(tmp_path / 'historial')
+    # A first day from an installation without tank ids, then a day with them
+    write_history(batch(0).drop(columns='id_tanque'), root)
+    write_history(batch(10), root)
+
+    chunks = list(history_chunks(root, ['nivel_de_ph']))
+    assert len(chunks) == 2 and 'id_tanque' not in chunks[0]
+    assert chunks[1]['id_tanque'].astype(int).tolist() == batch(10)['id_tanque'].tolist()
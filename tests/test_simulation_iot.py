@@ -0,0 +1,19 @@
+# The simulator's CSV goes through Arrow's writer for speed, but external
+# consumers of datos_simulados_sistema_acuaponico.csv expect the bytes pandas
+# wrote: unquoted header, whole numbers as 67.0 and missing readings as blanks.
+import numpy as np
+import pandas as pd
+import pytest
+
+from simulation_iot import generate_dataset, write_dataset
+
+
+@pytest.mark.parametrize('model', ['uniforme', 'fisico'])
+def test_csv_matches_pandas(tmp_path, model):
+    chunks = list(generate_dataset(5_000, num_tanks=3, seed=1, model=model, chunk_rows=2_000))
+    chunks[0].iloc[3, 3] = np.nan
+    chunks[0].iloc[4, 4] = 5.0
+    write_dataset(iter(chunks), csv_path=tmp_path / 'arrow.csv')
+    pd.concat(chunks, ignore_index=True).to_csv(tmp_path / 'pandas.csv', index=False)
+
+    assert (tmp_path / 'arrow.csv').read_bytes() == (tmp_path / 'pandas.csv').read_bytes()